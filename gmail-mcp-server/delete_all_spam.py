@@ -5,6 +5,7 @@ import asyncio
 import sys
 from gmail_mcp.auth import GmailAuth
 from gmail_mcp.gmail_client import GmailClient
+from gmail_mcp.ids import IdSet
 
 
 async def delete_all_spam():
@@ -17,7 +18,8 @@ async def delete_all_spam():
         
         print("📧 Fetching spam messages...")
         
-        all_spam_ids = []
+        # Packed 8-byte ids; a plain list of strings gets expensive at mailbox scale
+        all_spam_ids = IdSet()
         page_token = None
         total_pages = 0
         
@@ -37,7 +39,7 @@ async def delete_all_spam():
             messages = result.get('messages', [])
             if messages:
                 spam_ids = [msg['id'] for msg in messages]
-                all_spam_ids.extend(spam_ids)
+                all_spam_ids.update(spam_ids)
                 print(f"  Found {len(spam_ids)} spam messages on this page")
             
             # Check if there are more pages
@@ -59,14 +61,13 @@ async def delete_all_spam():
         
         print("\n🚮 Deleting spam messages...")
         
-        # Delete in batches (Gmail API supports up to 1000 per batch)
-        batch_size = 50  # Conservative batch size
+        # Progress is reported per 1000 ids; the client sizes the API calls
+        # themselves and backs off when Gmail rate limits them
+        batch_size = 1000
         total_deleted = 0
+        total_batches = (len(all_spam_ids) + batch_size - 1) // batch_size
         
-        for i in range(0, len(all_spam_ids), batch_size):
-            batch = all_spam_ids[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            total_batches = (len(all_spam_ids) + batch_size - 1) // batch_size
+        for batch_num, batch in enumerate(all_spam_ids.chunks(batch_size), 1):
             
             print(f"  Deleting batch {batch_num}/{total_batches} ({len(batch)} messages)...")
             
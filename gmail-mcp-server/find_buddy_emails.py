@@ -1,122 +1,73 @@
 #!/usr/bin/env python3
-"""Find communications with buddy@loser.com by checking recent messages"""
+"""Find communications with buddy@loser.com"""
 
-import json
-from datetime import datetime
 from gmail_mcp.auth import GmailAuth
 from gmail_mcp.gmail_client import GmailClient
+from gmail_mcp.pipeline import Pipeline
+from gmail_mcp.query import MessageFilter
+
+ADDRESS = 'buddy@loser.com'
+HEADERS = ['From', 'To', 'Cc', 'Subject', 'Date']
+
+
+def direction(message):
+    headers = message['headers']
+    if ADDRESS in headers.get('from', '').lower():
+        return 'FROM'
+    if ADDRESS in headers.get('to', '').lower() or ADDRESS in headers.get('cc', '').lower():
+        return 'TO'
+    return None
 
 
 def find_buddy_emails():
-    print("🔍 Searching for communications with buddy@loser.com...")
+    print(f"🔍 Searching for communications with {ADDRESS}...")
     print("=" * 50)
-    
+
     try:
-        # Initialize authentication and client
-        auth = GmailAuth()
-        client = GmailClient(auth)
-        
-        print("\n📧 Fetching recent messages to search...")
-        
-        # Get recent messages
-        all_messages = []
-        page_token = None
-        pages_to_check = 5  # Check 5 pages (500 messages)
-        
-        for page in range(pages_to_check):
-            print(f"Checking page {page + 1}...")
-            result = client.list_messages(
-                max_results=100,
-                page_token=page_token
-            )
-            
-            messages = result.get('messages', [])
-            if messages:
-                all_messages.extend(messages)
-            
-            page_token = result.get('nextPageToken')
-            if not page_token:
-                break
-        
-        print(f"\n🔍 Checking {len(all_messages)} messages for buddy@loser.com...")
-        
-        buddy_messages = []
-        from_buddy = []
-        to_buddy = []
-        
-        # Check each message
-        for i, msg in enumerate(all_messages):
-            if i % 50 == 0:
-                print(f"  Processed {i}/{len(all_messages)} messages...")
-            
-            try:
-                # Get message content
-                message_data = client.get_message_content(msg['id'])
-                headers = message_data.get('headers', {})
-                
-                from_addr = headers.get('from', '').lower()
-                to_addr = headers.get('to', '').lower()
-                cc_addr = headers.get('cc', '').lower()
-                
-                # Check if buddy@loser.com is involved
-                if 'buddy@loser.com' in from_addr:
-                    from_buddy.append((msg['id'], message_data))
-                    buddy_messages.append((msg['id'], message_data, 'FROM'))
-                elif 'buddy@loser.com' in to_addr or 'buddy@loser.com' in cc_addr:
-                    to_buddy.append((msg['id'], message_data))
-                    buddy_messages.append((msg['id'], message_data, 'TO'))
-                    
-            except Exception as e:
-                # Skip messages that can't be read
-                pass
-        
-        print(f"\n✅ Search complete!")
-        
+        client = GmailClient(GmailAuth())
+
+        # Gmail only returns messages involving the address, inbox and sent alike
+        print("\n📧 Fetching matching messages...")
+        result = (
+            Pipeline(client)
+            .enumerate(MessageFilter(participants=[ADDRESS]))
+            .fetch(metadata_headers=HEADERS, parse=True)
+            .filter(direction)
+            .run_sync()
+        )
+        buddy_messages = result['items']
+        from_buddy = [m for m in buddy_messages if direction(m) == 'FROM']
+
+        print(f"\n✅ Search complete! ({result['stats'].get('fetched', 0)} messages checked)")
+
         # Display results
         print(f"\n📊 Results Summary:")
         print("=" * 50)
-        print(f"Total messages with buddy@loser.com: {len(buddy_messages)}")
-        print(f"  - FROM buddy@loser.com: {len(from_buddy)}")
-        print(f"  - TO buddy@loser.com: {len(to_buddy)}")
-        
-        if buddy_messages:
-            print(f"\n📧 Message Details:")
-            print("-" * 50)
-            
-            # Sort by date (most recent first)
-            for msg_id, msg_data, direction in buddy_messages[:20]:  # Show up to 20
-                headers = msg_data.get('headers', {})
-                
-                subject = headers.get('subject', 'No subject')
-                from_addr = headers.get('from', 'Unknown')
-                to_addr = headers.get('to', 'Unknown')
-                date = headers.get('date', 'Unknown date')
-                snippet = msg_data.get('snippet', '')
-                
-                print(f"\n[{direction}] Message ID: {msg_id}")
-                print(f"  Date: {date}")
-                print(f"  From: {from_addr}")
-                print(f"  To: {to_addr}")
-                print(f"  Subject: {subject}")
-                if snippet:
-                    print(f"  Preview: {snippet[:150]}...")
-            
-            if len(buddy_messages) > 20:
-                print(f"\n... and {len(buddy_messages) - 20} more messages")
-                
-            # Get thread information
-            thread_ids = set()
-            for msg_id, msg_data, _ in buddy_messages:
-                thread_id = msg_data.get('threadId')
-                if thread_id:
-                    thread_ids.add(thread_id)
-            
-            print(f"\n📑 Conversation threads: {len(thread_ids)}")
-            
-        else:
-            print("\n❌ No communications found with buddy@loser.com in recent messages")
-            print("   (Checked the most recent 500 messages)")
-            
+        print(f"Total messages with {ADDRESS}: {len(buddy_messages)}")
+        print(f"  - FROM {ADDRESS}: {len(from_buddy)}")
+        print(f"  - TO {ADDRESS}: {len(buddy_messages) - len(from_buddy)}")
+
+        if not buddy_messages:
+            print(f"\n❌ No communications found with {ADDRESS}")
+            return
+
+        print(f"\n📧 Message Details:")
+        print("-" * 50)
+        for msg_data in buddy_messages[:20]:  # Show up to 20
+            headers = msg_data['headers']
+            print(f"\n[{direction(msg_data)}] Message ID: {msg_data['id']}")
+            print(f"  Date: {headers.get('date', 'Unknown date')}")
+            print(f"  From: {headers.get('from', 'Unknown')}")
+            print(f"  To: {headers.get('to', 'Unknown')}")
+            print(f"  Subject: {headers.get('subject', 'No subject')}")
+            if msg_data.get('snippet'):
+                print(f"  Preview: {msg_data['snippet'][:150]}...")
+
+        if len(buddy_messages) > 20:
+            print(f"\n... and {len(buddy_messages) - 20} more messages")
+
+        print(f"\n📑 Conversation threads: {len({m['threadId'] for m in buddy_messages})}")
+
     except Exception as e:
         print(f"\n❌ Error: {str(e)}")
         import traceback
@@ -124,4 +75,4 @@ def find_buddy_emails():
 
 
 if __name__ == "__main__":
-    find_buddy_emails()
\ No newline at end of file
+    find_buddy_emails()
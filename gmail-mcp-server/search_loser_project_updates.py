@@ -1,10 +1,9 @@
 #!/usr/bin/env python3
 """Search for project updates from buddy@loser.com and brian@loser.com"""
 
-import json
-from datetime import datetime
 from gmail_mcp.auth import GmailAuth
 from gmail_mcp.gmail_client import GmailClient
+from gmail_mcp.pipeline import Pipeline
 
 
 def search_project_updates():
@@ -28,31 +27,30 @@ def search_project_updates():
         for query, description in searches:
             print(f"\n📧 Searching for {description}...")
             try:
-                result = client.list_messages(query=query, max_results=50)
-                messages = result.get('messages', [])
+                # Up to 50 matches, full bodies fetched in batches and parsed as they arrive
+                result = (
+                    Pipeline(client)
+                    .enumerate(query=query, max_results=50)
+                    .fetch(format='full', parse=True)
+                    .run_sync()
+                )
                 
-                if messages:
-                    print(f"✅ Found {len(messages)} messages")
-                    all_messages[description] = []
-                    
-                    # Get details for each message
-                    for msg in messages:
-                        try:
-                            content = client.get_message_content(msg['id'])
-                            headers = content.get('headers', {})
-                            
-                            msg_data = {
-                                'id': msg['id'],
-                                'subject': headers.get('subject', 'No subject'),
-                                'from': headers.get('from', 'Unknown'),
-                                'to': headers.get('to', 'Unknown'),
-                                'date': headers.get('date', 'Unknown'),
-                                'snippet': content.get('snippet', ''),
-                                'body': content.get('body', {})
-                            }
-                            all_messages[description].append(msg_data)
-                        except Exception as e:
-                            print(f"   ⚠️ Could not read message {msg['id']}: {str(e)}")
+                if result['items']:
+                    print(f"✅ Found {len(result['items'])} messages")
+                    all_messages[description] = [
+                        {
+                            'id': content['id'],
+                            'subject': content['headers'].get('subject', 'No subject'),
+                            'from': content['headers'].get('from', 'Unknown'),
+                            'to': content['headers'].get('to', 'Unknown'),
+                            'date': content['headers'].get('date', 'Unknown'),
+                            'snippet': content.get('snippet') or '',
+                            'body': content.get('body') or {}
+                        }
+                        for content in result['items']
+                    ]
+                    for message_id, error in result['errors'].items():
+                        print(f"   ⚠️ Could not read message {message_id}: {error}")
                 else:
                     print(f"❌ No messages found")
                     
@@ -16,6 +16,10 @@ setup(
         "pydantic",
         "httpx",
     ],
+    extras_require={
+        "zstd": ["zstandard"],
+        "stats": ["numpy"],
+    },
     entry_points={
         "console_scripts": [
             "gmail-mcp=gmail_mcp.server:main",
@@ -0,0 +1,130 @@
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+# A batch taking longer than this is treated as a sign of congestion
+TARGET_LATENCY = 4.0
+
+# Share of a batch failing with server errors that counts as congestion
+FAILURE_RATIO = 0.1
+
+BASE_BACKOFF = 0.5
+MAX_BACKOFF = 32.0
+
+CONGESTION_STATUSES = (500, 502, 503, 504)
+
+
+def _status(error: BaseException) -> Optional[int]:
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    return int(status) if status is not None else None
+
+
+def is_throttled(error: BaseException) -> bool:
+    # Gmail signals rate limits with 429, or 403 with a rateLimitExceeded reason
+    status = _status(error)
+    if status == 429:
+        return True
+    return status == 403 and 'ratelimitexceeded' in str(error).lower()
+
+
+def is_congestion(error: BaseException) -> bool:
+    return is_throttled(error) or _status(error) in CONGESTION_STATUSES
+
+
+class BatchController:
+    # Additive increase, multiplicative decrease of a window of requests in
+    # flight, which is cut into batches of at most `maximum` requests. Every
+    # caller sharing a client feeds the same controller, so a rate limit seen
+    # by one slows all of them down.
+    def __init__(
+        self,
+        initial: int,
+        minimum: int = 1,
+        maximum: int = 100,
+        max_concurrency: int = 4,
+        increase: int = 5,
+        decrease: float = 0.5,
+        target_latency: float = TARGET_LATENCY
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.max_concurrency = max(1, max_concurrency)
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self._window = float(self._clamp(initial))
+        self._streak = 0
+        self._decreased_at = 0.0
+        self._lock = threading.Lock()
+        self.counts = {'batches': 0, 'items': 0, 'throttled': 0, 'failed': 0, 'slow': 0, 'backoff_seconds': 0.0}
+
+    @classmethod
+    def fixed(cls, size: int) -> 'BatchController':
+        # An explicit batch size still backs off on rate limits but never changes
+        return cls(size, minimum=size, maximum=size, max_concurrency=1)
+
+    def _clamp(self, window: float) -> float:
+        return min(max(window, self.minimum), self.maximum * self.max_concurrency)
+
+    def _batches(self) -> int:
+        return min(self.max_concurrency, -(-int(self._window) // self.maximum))
+
+    def _size(self) -> int:
+        return max(self.minimum, int(self._window) // self._batches())
+
+    @property
+    def concurrency(self) -> int:
+        with self._lock:
+            return self._batches()
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return self._size()
+
+    def _shrink(self, started: float) -> bool:
+        # Batches already in flight when the window last shrank report the
+        # same congestion, so it shrinks at most once per round trip
+        if started < self._decreased_at:
+            return False
+        self._window = self._clamp(self._window * self.decrease)
+        self._decreased_at = time.monotonic()
+        return True
+
+    def record(self, size: int, elapsed: float, throttled: int = 0, failed: int = 0) -> float:
+        # Returns how long the caller should wait before sending more
+        started = time.monotonic() - elapsed
+        with self._lock:
+            self.counts['batches'] += 1
+            self.counts['items'] += size
+            self.counts['throttled'] += throttled
+            self.counts['failed'] += failed
+
+            if throttled:
+                if not self._shrink(started):
+                    return 0.0
+                backoff = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** self._streak) * random.uniform(0.5, 1.0)
+                self._streak += 1
+                self.counts['backoff_seconds'] += backoff
+                return backoff
+
+            self._streak = 0
+            if failed > size * FAILURE_RATIO or elapsed > self.target_latency:
+                if not failed:
+                    self.counts['slow'] += 1
+                self._shrink(started)
+            elif size >= self._size():
+                # Only full batches say anything about whether a bigger window fits
+                self._window = self._clamp(self._window + self.increase)
+            return 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.counts,
+                'backoff_seconds': round(self.counts['backoff_seconds'], 2),
+                'size': self._size(),
+                'concurrency': self._batches(),
+            }
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from .auth import TOKEN_PATH
+
+
+ATTACHMENTS_DIR = TOKEN_PATH.parent / 'attachments'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS refs (
+    message_id TEXT NOT NULL,
+    attachment_id TEXT NOT NULL,
+    digest TEXT NOT NULL REFERENCES blobs(digest) ON DELETE CASCADE,
+    PRIMARY KEY (message_id, attachment_id)
+);
+CREATE INDEX IF NOT EXISTS blobs_last_used ON blobs(last_used);
+'''
+
+
+class AttachmentStore:
+    def __init__(self, root: Union[str, Path] = ATTACHMENTS_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root / 'index.sqlite3'), check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA foreign_keys = ON')
+        self._db.executescript(_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.root / 'blobs' / digest[:2] / digest
+
+    def _touch(self, digest: str) -> None:
+        self._db.execute('UPDATE blobs SET last_used = ? WHERE digest = ?', (time.time(), digest))
+
+    def _lookup(self, message_id: str, attachment_id: str) -> Optional[Path]:
+        row = self._db.execute(
+            'SELECT digest FROM refs WHERE message_id = ? AND attachment_id = ?',
+            (message_id, attachment_id)
+        ).fetchone()
+        if row is not None:
+            path = self._blob_path(row[0])
+            if path.exists():
+                self._touch(row[0])
+                self.hits += 1
+                return path
+            # The blob was removed behind our back; forget it
+            self._db.execute('DELETE FROM blobs WHERE digest = ?', (row[0],))
+        self.misses += 1
+        return None
+
+    def read(self, message_id: str, attachment_id: str) -> Optional[bytes]:
+        # Read under the lock so eviction cannot remove the blob in between
+        with self._lock:
+            path = self._lookup(message_id, attachment_id)
+            return path.read_bytes() if path is not None else None
+
+    def copy_to(self, message_id: str, attachment_id: str, target: Union[str, Path]) -> Optional[Path]:
+        target = Path(target)
+        with self._lock:
+            path = self._lookup(message_id, attachment_id)
+            if path is None:
+                return None
+            target.parent.mkdir(parents=True, exist_ok=True)
+            partial = target.with_name(f'.{target.name}.{uuid.uuid4().hex}.part')
+            # A copy, not a link: the saved file is the caller's to edit or delete
+            shutil.copyfile(path, partial)
+            os.replace(partial, target)
+        return target
+
+    def put(self, message_id: str, attachment_id: str, data: bytes) -> Path:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        with self._lock:
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                partial = path.with_name(f'{digest}.{uuid.uuid4().hex}.part')
+                with open(partial, 'wb') as f:
+                    f.write(data)
+                # Blobs are content addressed, so nobody may edit them in place
+                os.chmod(partial, 0o444)
+                os.replace(partial, path)
+            self._db.execute(
+                'INSERT INTO blobs (digest, size, last_used) VALUES (?, ?, ?) '
+                'ON CONFLICT(digest) DO UPDATE SET last_used = excluded.last_used',
+                (digest, len(data), time.time())
+            )
+            self._db.execute(
+                'INSERT OR REPLACE INTO refs (message_id, attachment_id, digest) VALUES (?, ?, ?)',
+                (message_id, attachment_id, digest)
+            )
+            self._evict(keep=digest)
+        return path
+
+    def _evict(self, keep: str) -> None:
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for digest, size in self._db.execute(
+            'SELECT digest, size FROM blobs WHERE digest != ? ORDER BY last_used', (keep,)
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._blob_path(digest).unlink(missing_ok=True)
+            self._db.execute('DELETE FROM blobs WHERE digest = ?', (digest,))
+            total -= size
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            blobs, size = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs').fetchone()
+            refs = self._db.execute('SELECT COUNT(*) FROM refs').fetchone()[0]
+        return {
+            'blobs': blobs,
+            'references': refs,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            shutil.rmtree(self.root / 'blobs', ignore_errors=True)
+            self._db.execute('DELETE FROM blobs')
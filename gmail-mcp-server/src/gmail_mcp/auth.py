@@ -5,7 +5,11 @@ from typing import Optional
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+import httplib2
+
+from .cassette import Cassette, RecordingHttp, ReplayHttp
 
 SCOPES = [
     'https://mail.google.com/',  # Full Gmail access - includes all operations
@@ -16,10 +20,11 @@ CREDENTIALS_PATH = Path.home() / '.gmail-mcp' / 'credentials.json'
 
 
 class GmailAuth:
-    def __init__(self, credentials_path: Optional[str] = None):
+    def __init__(self, credentials_path: Optional[str] = None, cassette: Optional[Cassette] = None):
         self.credentials_path = Path(credentials_path) if credentials_path else CREDENTIALS_PATH
         self.token_path = TOKEN_PATH
         self.creds: Optional[Credentials] = None
+        self.cassette = cassette
         
     def authenticate(self) -> Credentials:
         if self.creds and self.creds.valid:
@@ -51,5 +56,10 @@ class GmailAuth:
         return self.creds
         
     def get_service(self):
+        if self.cassette is not None and self.cassette.mode == 'replay':
+            # Replays never touch the network, so no credentials are needed
+            return build('gmail', 'v1', http=ReplayHttp(self.cassette))
         creds = self.authenticate()
+        if self.cassette is not None:
+            return build('gmail', 'v1', http=RecordingHttp(AuthorizedHttp(creds, http=httplib2.Http()), self.cassette))
         return build('gmail', 'v1', credentials=creds)
\ No newline at end of file
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+class JobContext:
+    def __init__(self, job: 'BackgroundJob', loop: asyncio.AbstractEventLoop):
+        self._job = job
+        self._loop = loop
+
+    @property
+    def cancelled(self) -> bool:
+        return self._job.cancel_event.is_set()
+
+    @property
+    def cancel_event(self) -> threading.Event:
+        return self._job.cancel_event
+
+    def report(self, progress: float, total: Optional[float] = None, message: Optional[str] = None) -> None:
+        # Called from the worker thread; waiters live on the event loop
+        self._job.progress = progress
+        if total is not None:
+            self._job.total = total
+        if message is not None:
+            self._job.message = message
+        self._loop.call_soon_threadsafe(self._job._notify)
+
+
+class BackgroundJob:
+    def __init__(self, name: str):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.status = 'running'
+        self.progress: float = 0
+        self.total: Optional[float] = None
+        self.message: Optional[str] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self.task: Optional[asyncio.Task] = None
+        self._waiters: List[asyncio.Future] = []
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    def _notify(self) -> None:
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def wait_for_change(self, timeout: Optional[float]) -> bool:
+        if self.done:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'name': self.name,
+            'status': self.status,
+            'progress': self.progress,
+            'total': self.total,
+            'message': self.message,
+            'error': self.error,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'elapsed': (self.finished_at or time.time()) - self.started_at,
+        }
+
+
+class JobManager:
+    def __init__(self, max_workers: int = 4, max_finished: int = 100):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gmail-job')
+        self._jobs: 'OrderedDict[str, BackgroundJob]' = OrderedDict()
+        self.max_finished = max_finished
+
+    def start(self, name: str, func: Callable[[JobContext], Any]) -> BackgroundJob:
+        loop = asyncio.get_running_loop()
+        job = BackgroundJob(name)
+        context = JobContext(job, loop)
+
+        async def run():
+            try:
+                job.result = await loop.run_in_executor(self._executor, func, context)
+                job.status = 'cancelled' if job.cancel_event.is_set() else 'completed'
+            except Exception as e:
+                job.error = str(e)
+                job.status = 'cancelled' if job.cancel_event.is_set() else 'failed'
+            finally:
+                job.finished_at = time.time()
+                job._notify()
+                self._prune()
+
+        job.task = loop.create_task(run())
+        self._jobs[job.job_id] = job
+        return job
+
+    def get(self, job_id: str) -> BackgroundJob:
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"Unknown job: {job_id}")
+        return job
+
+    def cancel(self, job_id: str) -> BackgroundJob:
+        job = self.get(job_id)
+        if not job.done:
+            # Cooperative: the worker checks the event between chunks
+            job.cancel_event.set()
+            job.status = 'cancelling'
+            job._notify()
+        return job
+
+    def list(self) -> List[BackgroundJob]:
+        return list(self._jobs.values())
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        for job in self._jobs.values():
+            job.cancel_event.set()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,291 @@
+import json
+import os
+import threading
+import uuid
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from .auth import TOKEN_PATH
+from .gmail_client import BATCH_SIZE, GmailClient
+from .ids import IdSet, decode_ids, encode_ids
+
+
+JOBS_DIR = TOKEN_PATH.parent / 'jobs'
+
+# Largest chunk each operation's API call accepts
+CHUNK_SIZES = {
+    'trash': BATCH_SIZE,
+    'delete': 1000,
+    'modify': 1000,
+    'custom': BATCH_SIZE,
+}
+
+ChunkHandler = Callable[[List[str]], Dict[str, str]]
+
+# Spec fields holding label lists, where order and repeats make no difference
+LABEL_FIELDS = ('label_ids', 'add_labels', 'remove_labels')
+
+
+def _spec_value(name: str, value: Any) -> Any:
+    if name in LABEL_FIELDS:
+        # None and [] both mean no labels
+        return sorted(set(value or ()))
+    return value
+
+
+class JobJournal:
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def append(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def rewrite(self, records: List[Dict[str, Any]]) -> None:
+        partial = self.path.with_name(self.path.name + '.part')
+        with self._lock:
+            with open(partial, 'w') as f:
+                for record in records:
+                    f.write(json.dumps(record, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(partial, self.path)
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        if not self.path.exists():
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-write leaves at most one torn line at the end
+                    break
+
+
+class BulkJob:
+    def __init__(
+        self,
+        client: GmailClient,
+        job_id: Optional[str] = None,
+        operation: str = 'trash',
+        query: str = "",
+        label_ids: Optional[List[str]] = None,
+        include_spam_trash: bool = False,
+        add_labels: Optional[List[str]] = None,
+        remove_labels: Optional[List[str]] = None,
+        chunk_size: Optional[int] = None,
+        handler: Optional[ChunkHandler] = None,
+        journal_dir: Union[str, Path] = JOBS_DIR
+    ):
+        if operation not in CHUNK_SIZES:
+            raise ValueError(f"Unknown bulk operation: {operation}")
+        if operation == 'custom' and handler is None:
+            raise ValueError("A custom bulk operation needs a handler")
+
+        self.client = client
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.handler = handler
+        self.journal = JobJournal(Path(journal_dir) / f'{self.job_id}.jsonl')
+        self.cancel_event = threading.Event()
+        self.spec = {
+            'operation': operation,
+            'query': query,
+            'label_ids': label_ids,
+            'include_spam_trash': include_spam_trash,
+            'add_labels': add_labels,
+            'remove_labels': remove_labels,
+            'chunk_size': chunk_size or CHUNK_SIZES[operation],
+        }
+
+        # Listing order matters (chunks are numbered by position), so ids are
+        # kept as a packed array rather than a list of strings.
+        self.ids = array('Q')
+        self.next_page_token: Optional[str] = None
+        self.listing_done = False
+        self.done_chunks: set = set()
+        self.failed_chunks: Dict[int, Dict[str, Any]] = {}
+        self.finished = False
+        self._load()
+
+    @classmethod
+    def resume(
+        cls,
+        client: GmailClient,
+        job_id: str,
+        handler: Optional[ChunkHandler] = None,
+        journal_dir: Union[str, Path] = JOBS_DIR
+    ) -> 'BulkJob':
+        journal = JobJournal(Path(journal_dir) / f'{job_id}.jsonl')
+        start = next(journal.replay(), None)
+        if start is None or start.get('type') != 'start':
+            raise FileNotFoundError(f"No journal found for job {job_id}")
+        spec = dict(start['spec'])
+        return cls(client, job_id=job_id, handler=handler, journal_dir=journal_dir, **spec)
+
+    def _load(self) -> None:
+        records = self.journal.replay()
+        first = next(records, None)
+        if first is None:
+            self.journal.append({'type': 'start', 'spec': self.spec})
+            return
+        changed = sorted(
+            name for name in self.spec
+            if _spec_value(name, first['spec'].get(name)) != _spec_value(name, self.spec[name])
+        )
+        if changed:
+            raise ValueError(f"Job {self.job_id} already exists with a different {', '.join(changed)}; use a new job_id")
+
+        for record in records:
+            kind = record['type']
+            if kind == 'page':
+                self.ids.extend(encode_ids(record['ids']))
+                self.next_page_token = record.get('next_page_token')
+                self.listing_done = self.next_page_token is None
+            elif kind == 'chunk_done':
+                self.done_chunks.add(record['chunk'])
+                self.failed_chunks.pop(record['chunk'], None)
+            elif kind == 'chunk_failed':
+                self.failed_chunks[record['chunk']] = {'ids': record['ids'], 'error': record['error']}
+            elif kind == 'finished':
+                self.finished = True
+
+    @property
+    def total_chunks(self) -> int:
+        size = self.spec['chunk_size']
+        return (len(self.ids) + size - 1) // size
+
+    def status(self) -> Dict[str, Any]:
+        size = self.spec['chunk_size']
+        failed_ids = sum(len(failure['ids']) for failure in self.failed_chunks.values())
+        processed = sum(min(size, len(self.ids) - index * size) for index in self.done_chunks)
+        return {
+            'job_id': self.job_id,
+            'operation': self.spec['operation'],
+            'journal': str(self.journal.path),
+            'listing_done': self.listing_done,
+            'listed': len(self.ids),
+            'total_chunks': self.total_chunks,
+            'done_chunks': len(self.done_chunks),
+            'failed_chunks': sorted(self.failed_chunks),
+            'processed': processed,
+            'failed': failed_ids,
+            'finished': self.finished,
+        }
+
+    def _list(self, progress: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+        seen = IdSet(self.ids)
+        resumed_token = self.next_page_token
+        while not self.listing_done and not self.cancel_event.is_set():
+            try:
+                result = self.client.list_messages(
+                    query=self.spec['query'],
+                    max_results=500,
+                    page_token=self.next_page_token,
+                    label_ids=self.spec['label_ids'],
+                    include_spam_trash=self.spec['include_spam_trash']
+                )
+            except Exception:
+                if self.next_page_token is None or self.next_page_token != resumed_token:
+                    raise
+                # Page tokens from an earlier run can expire; relist from the
+                # start and let the seen-set drop what the journal already has.
+                self.next_page_token = resumed_token = None
+                continue
+            page_ids = [m['id'] for m in result.get('messages', []) if m['id'] not in seen]
+            seen.update(page_ids)
+            next_page_token = result.get('nextPageToken')
+
+            self.journal.append({'type': 'page', 'ids': page_ids, 'next_page_token': next_page_token})
+            self.ids.extend(encode_ids(page_ids))
+            self.next_page_token = next_page_token
+            self.listing_done = next_page_token is None
+            if progress:
+                progress(self.status())
+
+    def _apply(self, message_ids: List[str]) -> Dict[str, str]:
+        operation = self.spec['operation']
+        if operation == 'trash':
+            return self.client.batch_trash_messages(message_ids)['errors']
+        if operation == 'delete':
+            self.client.batch_delete_messages(message_ids)
+        elif operation == 'modify':
+            self.client.batch_modify_messages(
+                message_ids,
+                add_labels=self.spec['add_labels'],
+                remove_labels=self.spec['remove_labels']
+            )
+        else:
+            return self.handler(message_ids)
+        return {}
+
+    def _process(self, chunk: int, message_ids: List[str]) -> None:
+        try:
+            errors = self._apply(message_ids)
+        except Exception as e:
+            errors = {message_id: str(e) for message_id in message_ids}
+
+        if errors:
+            failed_ids = [message_id for message_id in message_ids if message_id in errors]
+            error = next(iter(errors.values()))
+            self.journal.append({'type': 'chunk_failed', 'chunk': chunk, 'ids': failed_ids, 'error': error})
+            self.failed_chunks[chunk] = {'ids': failed_ids, 'error': error}
+        else:
+            self.journal.append({'type': 'chunk_done', 'chunk': chunk})
+            self.done_chunks.add(chunk)
+            self.failed_chunks.pop(chunk, None)
+
+    def run(
+        self,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        retry_failed: bool = True
+    ) -> Dict[str, Any]:
+        if self.finished:
+            return self.status()
+
+        self._list(progress)
+
+        size = self.spec['chunk_size']
+        for chunk in range(self.total_chunks):
+            if self.cancel_event.is_set():
+                break
+            if chunk in self.done_chunks:
+                continue
+            if chunk in self.failed_chunks:
+                if not retry_failed:
+                    continue
+                # Only the ids that failed last time are retried
+                message_ids = self.failed_chunks[chunk]['ids']
+            else:
+                message_ids = decode_ids(self.ids[chunk * size:(chunk + 1) * size])
+            self._process(chunk, message_ids)
+            if progress:
+                progress(self.status())
+
+        if self.listing_done and not self.failed_chunks and len(self.done_chunks) == self.total_chunks:
+            self.journal.append({'type': 'finished'})
+            self.finished = True
+
+        return self.status()
+
+    def retry_failed(self, progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        for chunk in sorted(self.failed_chunks):
+            if self.cancel_event.is_set():
+                break
+            self._process(chunk, self.failed_chunks[chunk]['ids'])
+            if progress:
+                progress(self.status())
+        return self.run(progress, retry_failed=False)
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
@@ -0,0 +1,268 @@
+import base64
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import deque
+from email.parser import FeedParser
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import httplib2
+
+
+CASSETTE_MODES = ('record', 'replay')
+CASSETTE_VERSION = 1
+
+# Never written to a cassette, wherever they appear
+REDACTED_PARAMS = ('access_token', 'key', 'oauth_token')
+_SECRET_FIELDS = re.compile(r'"(access_token|refresh_token|id_token|client_secret)"\s*:\s*"[^"]*"')
+
+# Response headers replay needs; everything else (cookies, auth) is dropped
+KEPT_HEADERS = ('content-type', 'location', 'range', 'x-goog-upload-status')
+
+_BLANK_LINE = re.compile(r'\r?\n\r?\n')
+REPLAY_BOUNDARY = 'batch_replay'
+
+Key = Tuple[str, str, str]
+
+
+def _normalize_path(uri: str) -> str:
+    parsed = urlparse(uri)
+    query = sorted((name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True) if name not in REDACTED_PARAMS)
+    return parsed.path + ('?' + urlencode(query) if query else '')
+
+
+def _as_bytes(body: Union[str, bytes, None]) -> bytes:
+    if body is None:
+        return b''
+    return body.encode('utf-8') if isinstance(body, str) else body
+
+
+def _key(method: str, path: str, body: bytes) -> Key:
+    return (method.upper(), path, hashlib.sha1(body).hexdigest() if body else '')
+
+
+def _redact(text: str) -> str:
+    return _SECRET_FIELDS.sub(lambda m: f'"{m.group(1)}": "REDACTED"', text)
+
+
+def _split_http(text: str) -> Tuple[str, Dict[str, str], str]:
+    # An application/http payload: start line, headers, blank line, body
+    parts = _BLANK_LINE.split(text, maxsplit=1)
+    lines = parts[0].splitlines()
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return lines[0] if lines else '', headers, parts[1] if len(parts) > 1 else ''
+
+
+def _parse_multipart(content_type: str, body: str) -> List[Any]:
+    parser = FeedParser()
+    parser.feed(f'content-type: {content_type}\r\n\r\n{body}')
+    message = parser.close()
+    return message.get_payload() if message.is_multipart() else []
+
+
+class Cassette:
+    # Gmail API traffic as gzipped JSON lines. HTTP batches are stored per
+    # sub-request, so a replay does not depend on how requests were batched.
+    def __init__(self, path: Union[str, Path], mode: str = 'replay', latency: bool = True):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._file = None
+        self._interactions: Dict[Key, Deque[Dict[str, Any]]] = {}
+        self._last: Dict[Key, Dict[str, Any]] = {}
+        self.counts = {'recorded': 0, 'replayed': 0, 'misses': 0}
+
+        if mode == 'record':
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+            self._file.write(json.dumps({'version': CASSETTE_VERSION, 'recorded_at': time.time()}) + '\n')
+        else:
+            self._load()
+
+    def _load(self) -> None:
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('version') != CASSETTE_VERSION:
+                raise ValueError(f"Unsupported cassette version: {header.get('version')}")
+            for line in f:
+                interaction = json.loads(line)
+                key = (interaction['method'], interaction['path'], interaction['body_sha1'])
+                self._interactions.setdefault(key, deque()).append(interaction)
+
+    # Recording
+
+    def record(
+        self,
+        method: str,
+        uri: str,
+        body: Union[str, bytes, None],
+        status: int,
+        headers: Dict[str, str],
+        content: bytes,
+        elapsed: float,
+        batched: bool = False
+    ) -> None:
+        path = _normalize_path(uri)
+        method, _, body_sha1 = _key(method, path, _as_bytes(body))
+        interaction = {
+            'method': method,
+            'path': path,
+            'body_sha1': body_sha1,
+            'status': status,
+            'headers': {name: value for name, value in headers.items() if name.lower() in KEPT_HEADERS},
+            'elapsed': round(elapsed, 4),
+            'batched': batched,
+        }
+        try:
+            interaction['content'] = _redact(content.decode('utf-8'))
+        except UnicodeDecodeError:
+            interaction['content_b64'] = base64.b64encode(content).decode('ascii')
+        line = json.dumps(interaction, separators=(',', ':')) + '\n'
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self.counts['recorded'] += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # Replay
+
+    def lookup(self, method: str, uri: str, body: Union[str, bytes, None]) -> Optional[Dict[str, Any]]:
+        # Recorded responses are served in order; once used up the last one repeats
+        key = _key(method, _normalize_path(uri), _as_bytes(body))
+        with self._lock:
+            queue = self._interactions.get(key)
+            if queue:
+                interaction = self._last[key] = queue.popleft()
+            else:
+                interaction = self._last.get(key)
+            self.counts['replayed' if interaction else 'misses'] += 1
+            return interaction
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'path': str(self.path), 'mode': self.mode, 'latency': self.latency, **self.counts}
+
+
+def _content(interaction: Dict[str, Any]) -> bytes:
+    if 'content_b64' in interaction:
+        return base64.b64decode(interaction['content_b64'])
+    return interaction['content'].encode('utf-8')
+
+
+def _miss(method: str, uri: str) -> Dict[str, Any]:
+    message = f"No recorded response for {method} {_normalize_path(uri)}"
+    return {
+        'status': 404,
+        'headers': {'content-type': 'application/json; charset=UTF-8'},
+        'content': json.dumps({'error': {'code': 404, 'message': message, 'status': 'NOT_FOUND'}}),
+        'elapsed': 0.0,
+    }
+
+
+def _batch_requests(headers: Dict[str, str], body: Union[str, bytes, None]) -> List[Tuple[str, str, str, str]]:
+    # (Content-ID, method, uri, body) for every sub-request; their headers,
+    # which carry the bearer token, are never looked at again
+    content_type = {name.lower(): value for name, value in (headers or {}).items()}.get('content-type', '')
+    text = _as_bytes(body).decode('utf-8')
+    requests = []
+    for part in _parse_multipart(content_type, text):
+        start, _, sub_body = _split_http(part.get_payload())
+        method, _, rest = start.partition(' ')
+        requests.append((part['Content-ID'], method, rest.rsplit(' ', 1)[0], sub_body))
+    return requests
+
+
+class RecordingHttp:
+    # Wraps the authorized http object a service sends everything through
+    def __init__(self, http, cassette: Cassette):
+        self.http = http
+        self.cassette = cassette
+
+    @property
+    def credentials(self):
+        # googleapiclient reads these to refresh tokens and sign batch parts
+        return getattr(self.http, 'credentials', None)
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        started = time.monotonic()
+        response, content = self.http.request(uri, method=method, body=body, headers=headers, **kwargs)
+        elapsed = time.monotonic() - started
+
+        if urlparse(uri).path.startswith('/batch') and response.status < 300:
+            requests = {content_id: (sub_method, sub_uri, sub_body) for content_id, sub_method, sub_uri, sub_body in _batch_requests(headers, body)}
+            for part in _parse_multipart(response['content-type'], content.decode('utf-8')):
+                status_line, part_headers, part_body = _split_http(part.get_payload())
+                # Responses echo the request's Content-ID with a "response-" prefix
+                content_id = (part['Content-ID'] or '').replace('<response-', '<', 1)
+                if content_id not in requests:
+                    continue
+                sub_method, sub_uri, sub_body = requests[content_id]
+                self.cassette.record(
+                    sub_method, sub_uri, sub_body, int(status_line.split()[1]), part_headers,
+                    part_body.encode('utf-8'), elapsed, batched=True
+                )
+        else:
+            self.cassette.record(method, uri, body, response.status, dict(response), content, elapsed)
+        return response, content
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+
+class ReplayHttp:
+    # Stands in for the network: every response comes from the cassette
+    credentials = None
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    def _sleep(self, elapsed: float) -> None:
+        if self.cassette.latency and elapsed > 0:
+            time.sleep(elapsed)
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        if urlparse(uri).path.startswith('/batch'):
+            return self._batch(headers, body)
+        interaction = self.cassette.lookup(method, uri, body) or _miss(method, uri)
+        self._sleep(interaction['elapsed'])
+        response = httplib2.Response({'status': str(interaction['status']), **interaction['headers']})
+        return response, _content(interaction)
+
+    def _batch(self, headers: Dict[str, str], body: Union[str, bytes, None]) -> Tuple[httplib2.Response, bytes]:
+        parts = []
+        elapsed = 0.0
+        for content_id, method, uri, sub_body in _batch_requests(headers, body):
+            interaction = self.cassette.lookup(method, uri, sub_body) or _miss(method, uri)
+            # A batch took as long as its slowest recorded part
+            elapsed = max(elapsed, interaction['elapsed'])
+            part_headers = ''.join(f'{name}: {value}\r\n' for name, value in interaction['headers'].items())
+            parts.append(
+                f'--{REPLAY_BOUNDARY}\r\n'
+                'Content-Type: application/http\r\n'
+                f'Content-ID: {content_id.replace("<", "<response-", 1)}\r\n\r\n'
+                f'HTTP/1.1 {interaction["status"]} Replayed\r\n{part_headers}\r\n'
+                f'{_content(interaction).decode("utf-8", errors="replace")}\r\n'
+            )
+        self._sleep(elapsed)
+        response = httplib2.Response({
+            'status': '200',
+            'content-type': f'multipart/mixed; boundary={REPLAY_BOUNDARY}',
+        })
+        return response, (''.join(parts) + f'--{REPLAY_BOUNDARY}--\r\n').encode('utf-8')
@@ -0,0 +1,420 @@
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import random
+from datetime import datetime, timezone
+from email import message_from_bytes, policy
+from email.message import Message
+from email.mime.application import MIMEApplication
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import format_datetime, formataddr
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+from .export import mbox_entry
+
+
+CORPUS_FORMATS = ('full', 'raw', 'mbox', 'eml')
+
+# Knobs for the size and shape distributions; sizes are log-normal around the
+# median, counts geometric around the mean, rates are per-message probabilities
+PROFILES: Dict[str, Dict[str, Any]] = {
+    'small': {
+        'html_kb_median': 2, 'html_kb_sigma': 0.8, 'max_html_kb': 64,
+        'attachment_rate': 0.05, 'attachments_mean': 1.2, 'max_attachments': 3,
+        'attachment_kb_median': 8, 'attachment_kb_sigma': 1.0, 'max_attachment_kb': 256,
+        'inline_image_rate': 0.02, 'charset_rate': 0.05, 'plain_only_rate': 0.3, 'html_only_rate': 0.1,
+        'reply_rate': 0.4, 'long_thread_rate': 0.0, 'long_thread_length': (100, 150),
+    },
+    'default': {
+        'html_kb_median': 12, 'html_kb_sigma': 1.2, 'max_html_kb': 2048,
+        'attachment_rate': 0.15, 'attachments_mean': 1.8, 'max_attachments': 30,
+        'attachment_kb_median': 80, 'attachment_kb_sigma': 1.5, 'max_attachment_kb': 10240,
+        'inline_image_rate': 0.1, 'charset_rate': 0.1, 'plain_only_rate': 0.2, 'html_only_rate': 0.1,
+        'reply_rate': 0.5, 'long_thread_rate': 0.002, 'long_thread_length': (100, 300),
+    },
+    'heavy': {
+        'html_kb_median': 60, 'html_kb_sigma': 1.5, 'max_html_kb': 8192,
+        'attachment_rate': 0.4, 'attachments_mean': 4.0, 'max_attachments': 100,
+        'attachment_kb_median': 300, 'attachment_kb_sigma': 1.8, 'max_attachment_kb': 20480,
+        'inline_image_rate': 0.3, 'charset_rate': 0.2, 'plain_only_rate': 0.05, 'html_only_rate': 0.25,
+        'reply_rate': 0.6, 'long_thread_rate': 0.01, 'long_thread_length': (100, 500),
+    },
+}
+
+# Text each charset can actually encode, so the bytes on the wire are real
+CHARSET_SAMPLES = {
+    'iso-8859-1': 'Café, crème brûlée et déjà vu à Genève.',
+    'iso-8859-2': 'Zażółć gęślą jaźń, příliš žluťoučký kůň.',
+    'windows-1252': '“Smart quotes” – dashes — and the € sign…',
+    'koi8-r': 'Привет! Отчёт за квартал готов, смотрите вложение.',
+    'shift_jis': 'こんにちは。会議の資料を添付します。よろしくお願いします。',
+    'gb2312': '你好，请查收附件中的季度报告。谢谢！',
+    'big5': '您好，附件是本季度的報告，請查收。',
+    'euc-kr': '안녕하세요. 회의 자료를 첨부합니다.',
+}
+
+ATTACHMENT_TYPES = [
+    ('application', 'pdf', 'pdf'),
+    ('application', 'zip', 'zip'),
+    ('text', 'csv', 'csv'),
+    ('application', 'vnd.openxmlformats-officedocument.wordprocessingml.document', 'docx'),
+    ('application', 'vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    ('image', 'png', 'png'),
+    ('image', 'jpeg', 'jpg'),
+]
+FILE_STEMS = ['report', 'invoice', 'Résumé', 'scan_0042', '季度报告', 'Präsentation', 'notes', 'photo', 'contract draft']
+
+LABELS = ['INBOX', 'UNREAD', 'IMPORTANT', 'STARRED', 'CATEGORY_PERSONAL', 'CATEGORY_UPDATES',
+          'CATEGORY_PROMOTIONS', 'CATEGORY_SOCIAL', 'CATEGORY_FORUMS', 'SENT']
+LABEL_WEIGHTS = [0.6, 0.3, 0.2, 0.05, 0.3, 0.25, 0.2, 0.1, 0.05, 0.1]
+
+WORDS = (
+    'the project meeting update please review attached report budget quarter team schedule deadline '
+    'client proposal draft feedback invoice payment shipping order account security notice weekly '
+    'summary agenda notes follow up call tomorrow thanks regards question issue release version '
+    'server deploy test results migration plan design document approval contract renewal travel'
+).split()
+NAMES = ['Alice Chen', 'Bob Müller', 'Carla Díaz', 'Dmitri Ivanov', 'Emi Tanaka', 'Farah Haddad',
+         'George Brown', 'Hana Kim', 'Ivan Petrov', 'Julia Rossi', 'Kwame Mensah', 'Li Wei']
+DOMAINS = ['example.com', 'example.org', 'corp.example.net', 'mail.example.co.jp', 'shop.example.de']
+
+START_MS = 1420070400000  # 2015-01-01
+
+# Headers are built already encoded, so the costly modern policy refolding is skipped
+_WIRE_POLICY = policy.compat32.clone(linesep='\r\n')
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+class _Thread:
+    def __init__(self, thread_id: str, subject: str, participants: List[str], length: int):
+        self.thread_id = thread_id
+        self.subject = subject
+        self.participants = participants
+        self.length = length
+        self.message_ids: List[str] = []
+
+    @property
+    def done(self) -> bool:
+        return len(self.message_ids) >= self.length
+
+
+class CorpusGenerator:
+    # Seeded, streaming generator of Gmail-shaped mail: every message exists
+    # as RFC 822 bytes and as the format=full / format=raw API resources.
+    def __init__(self, seed: int = 0, profile: str = 'default', **overrides: Any):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown corpus profile: {profile}")
+        unknown = set(overrides) - set(PROFILES[profile])
+        if unknown:
+            raise ValueError(f"Unknown corpus settings: {', '.join(sorted(unknown))}")
+        self.seed = seed
+        self.settings = {**PROFILES[profile], **overrides}
+        self.random = random.Random(seed)
+        self.clock_ms = START_MS
+        self.count = 0
+        self.history_id = 1000
+        self._threads: List[_Thread] = []
+
+    # Distributions
+
+    def _lognormal_bytes(self, median_kb: float, sigma: float, max_kb: float) -> int:
+        return int(min(max_kb, self.random.lognormvariate(0, sigma) * median_kb) * 1024)
+
+    def _geometric(self, mean: float, maximum: int) -> int:
+        count = 1
+        while count < maximum and self.random.random() > 1 / mean:
+            count += 1
+        return count
+
+    def _sentence(self, words: int) -> str:
+        text = ' '.join(self.random.choice(WORDS) for _ in range(words))
+        return text[:1].upper() + text[1:] + '.'
+
+    def _text(self, size: int) -> str:
+        paragraphs = []
+        length = 0
+        while length < size:
+            paragraph = ' '.join(self._sentence(self.random.randint(6, 18)) for _ in range(self.random.randint(2, 6)))
+            paragraphs.append(paragraph)
+            length += len(paragraph) + 2
+        return '\n\n'.join(paragraphs)
+
+    def _html(self, size: int, text: str, images: List[str]) -> str:
+        # Table-heavy markup with inline styles, like most newsletters
+        rows = []
+        length = 0
+        while length < size:
+            row = (
+                f'<tr><td style="padding:8px;font-family:Arial,sans-serif;color:#333">'
+                f'<p>{self._sentence(self.random.randint(8, 24))}</p></td></tr>'
+            )
+            rows.append(row)
+            length += len(row)
+        images_html = ''.join(f'<img src="cid:{cid}" width="600" alt="">' for cid in images)
+        paragraphs = ''.join(f'<p>{paragraph}</p>' for paragraph in text.split('\n\n'))
+        return (
+            '<!DOCTYPE html><html><head><style>td{font-size:14px}</style></head><body>'
+            f'{paragraphs}{images_html}<table width="100%" cellpadding="0">{"".join(rows)}</table>'
+            '<p style="font-size:11px">You are receiving this because you subscribed. '
+            '<a href="https://example.com/unsubscribe">Unsubscribe</a></p></body></html>'
+        )
+
+    def _address(self) -> str:
+        name = self.random.choice(NAMES)
+        local = name.split()[0].lower().encode('ascii', 'ignore').decode() or 'user'
+        # Non-ASCII display names are RFC 2047 encoded
+        return formataddr((name, f'{local}{self.random.randint(1, 99)}@{self.random.choice(DOMAINS)}'), charset='utf-8')
+
+    # Structure
+
+    def _multipart(self, subtype: str) -> MIMEMultipart:
+        # The email package draws boundaries from the global random state
+        return MIMEMultipart(subtype, boundary=f'=_corpus_{self.random.getrandbits(64):016x}')
+
+    def _body(self) -> Message:
+        settings = self.settings
+        charset = 'utf-8'
+        text = self._text(self.random.randint(200, 3000))
+        if self.random.random() < settings['charset_rate']:
+            charset = self.random.choice(list(CHARSET_SAMPLES))
+            text = CHARSET_SAMPLES[charset] + '\n\n' + text
+
+        roll = self.random.random()
+        if roll < settings['plain_only_rate']:
+            return MIMEText(text, 'plain', charset)
+
+        images = []
+        if self.random.random() < settings['inline_image_rate']:
+            images = [f'{self.random.getrandbits(64):016x}@corpus.example' for _ in range(self.random.randint(1, 4))]
+        html_size = self._lognormal_bytes(settings['html_kb_median'], settings['html_kb_sigma'], settings['max_html_kb'])
+        html = MIMEText(self._html(html_size, text, images), 'html', charset)
+
+        if images:
+            # multipart/related keeps the HTML next to the images it references
+            related = self._multipart('related')
+            related.attach(html)
+            for index, cid in enumerate(images):
+                image = MIMEImage(self.random.randbytes(self._lognormal_bytes(20, 1.0, 512)), 'png')
+                image.add_header('Content-ID', f'<{cid}>')
+                image.add_header('Content-Disposition', 'inline', filename=f'image{index:03d}.png')
+                related.attach(image)
+            html = related
+
+        if roll < settings['plain_only_rate'] + settings['html_only_rate']:
+            return html
+        alternative = self._multipart('alternative')
+        alternative.attach(MIMEText(text, 'plain', charset))
+        alternative.attach(html)
+        return alternative
+
+    def _attachments(self) -> List[Message]:
+        settings = self.settings
+        if self.random.random() >= settings['attachment_rate']:
+            return []
+        parts = []
+        for index in range(self._geometric(settings['attachments_mean'], settings['max_attachments'])):
+            major, minor, extension = self.random.choice(ATTACHMENT_TYPES)
+            size = self._lognormal_bytes(
+                settings['attachment_kb_median'], settings['attachment_kb_sigma'], settings['max_attachment_kb']
+            )
+            if major == 'text':
+                part = MIMEText(self._text(size), minor, 'utf-8')
+            elif major == 'image':
+                part = MIMEImage(self.random.randbytes(size), minor)
+            else:
+                part = MIMEApplication(self.random.randbytes(size), minor)
+            filename = f'{self.random.choice(FILE_STEMS)}_{index}.{extension}'
+            # Non-ASCII names go out RFC 2231 encoded, as real clients send them
+            part.add_header('Content-Disposition', 'attachment', filename=('utf-8', '', filename) if not filename.isascii() else filename)
+            parts.append(part)
+        return parts
+
+    def _thread_for_message(self) -> Tuple[Optional[_Thread], bool]:
+        settings = self.settings
+        self._threads = [thread for thread in self._threads if not thread.done]
+        if self._threads and self.random.random() < settings['reply_rate']:
+            # Long threads are few but get most of the replies while they last
+            weights = [thread.length for thread in self._threads]
+            return self.random.choices(self._threads, weights)[0], True
+        return None, False
+
+    # Messages
+
+    def message(self) -> Dict[str, Any]:
+        # One message as {'raw': bytes, 'full': resource, 'resource_raw': resource}
+        self.clock_ms += int(self.random.expovariate(1 / 600000))
+        self.history_id += self.random.randint(1, 5)
+        message_id = f'{(self.clock_ms << 20) | (self.count & 0xFFFFF):x}'
+        self.count += 1
+
+        thread, reply = self._thread_for_message()
+        if thread is None:
+            settings = self.settings
+            if self.random.random() < settings['long_thread_rate']:
+                length = self.random.randint(*settings['long_thread_length'])
+            else:
+                length = self._geometric(1.6, 20)
+            participants = [self._address() for _ in range(self.random.randint(2, 6))]
+            thread = _Thread(message_id, self._sentence(self.random.randint(3, 8))[:-1], participants, length)
+            if length > 1:
+                self._threads.append(thread)
+
+        body = self._body()
+        attachments = self._attachments()
+        if attachments:
+            root = self._multipart('mixed')
+            root.attach(body)
+            for part in attachments:
+                root.attach(part)
+        else:
+            root = body
+
+        sender = self.random.choice(thread.participants)
+        root['From'] = sender
+        root['To'] = ', '.join(p for p in thread.participants if p != sender) or sender
+        root['Subject'] = ('Re: ' if reply else '') + thread.subject
+        root['Date'] = format_datetime(datetime.fromtimestamp(self.clock_ms / 1000, timezone.utc))
+        header_id = f'<{message_id}.{self.seed}@corpus.example>'
+        root['Message-ID'] = header_id
+        if reply and thread.message_ids:
+            root['In-Reply-To'] = thread.message_ids[-1]
+            root['References'] = ' '.join(thread.message_ids[-20:])
+        thread.message_ids.append(header_id)
+
+        raw = root.as_bytes(policy=_WIRE_POLICY)
+        labels = [label for label, weight in zip(LABELS, LABEL_WEIGHTS) if self.random.random() < weight]
+        snippet = ' '.join(self._snippet_source(root).split())[:140]
+        common = {
+            'id': message_id,
+            'threadId': thread.thread_id,
+            'labelIds': labels,
+            'snippet': snippet,
+            'historyId': str(self.history_id),
+            'internalDate': str(self.clock_ms),
+            'sizeEstimate': len(raw),
+        }
+        return {
+            'raw': raw,
+            # Built from the wire bytes so line endings and encodings match raw
+            'full': {**common, 'payload': self._payload(message_from_bytes(raw, policy=_WIRE_POLICY), '', message_id)},
+            'resource_raw': {**common, 'raw': _b64url(raw)},
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        while True:
+            yield self.message()
+
+    @staticmethod
+    def _snippet_source(root: Message) -> str:
+        for part in root.walk():
+            if part.get_content_type() == 'text/plain' and not part.get_filename():
+                return (part.get_payload(decode=True) or b'').decode(part.get_content_charset() or 'utf-8', 'replace')
+        return ''
+
+    def _payload(self, part: Message, part_id: str, message_id: str) -> Dict[str, Any]:
+        # The format=full tree Gmail builds from the same MIME structure
+        payload: Dict[str, Any] = {
+            'partId': part_id,
+            'mimeType': part.get_content_type(),
+            'filename': part.get_filename() or '',
+            # Gmail unfolds and RFC 2047 decodes header values
+            'headers': [{'name': name, 'value': str(policy.default.header_fetch_parse(name, str(value)))} for name, value in part.items()],
+        }
+        if part.is_multipart():
+            payload['body'] = {'size': 0}
+            payload['parts'] = [
+                self._payload(child, f'{part_id}.{index}' if part_id else str(index), message_id)
+                for index, child in enumerate(part.get_payload())
+            ]
+            return payload
+        data = part.get_payload(decode=True) or b''
+        if payload['filename']:
+            digest = hashlib.sha1(f'{message_id}/{part_id}'.encode()).digest()
+            payload['body'] = {'attachmentId': 'ANGjdJ' + _b64url(digest * 3).rstrip('='), 'size': len(data)}
+        else:
+            if part.get_content_maintype() == 'text':
+                # Text bodies come back as UTF-8 whatever their declared charset
+                data = data.decode(part.get_content_charset() or 'utf-8', 'replace').encode('utf-8')
+            payload['body'] = {'size': len(data), 'data': _b64url(data)}
+        return payload
+
+
+def _open(path: Path) -> BinaryIO:
+    return gzip.open(path, 'wb') if path.suffix == '.gz' else open(path, 'wb')
+
+
+def write_corpus(
+    path: Union[str, Path],
+    count: int,
+    format: str = 'full',
+    seed: int = 0,
+    profile: str = 'default',
+    **overrides: Any
+) -> Dict[str, Any]:
+    # full/raw write one API resource per JSON line, mbox a Takeout-style
+    # mailbox the importer reads back, eml a directory of message files
+    if format not in CORPUS_FORMATS:
+        raise ValueError(f"Unknown corpus format: {format}")
+    path = Path(path)
+    generator = CorpusGenerator(seed=seed, profile=profile, **overrides)
+    stats = {'path': str(path), 'format': format, 'messages': 0, 'raw_bytes': 0, 'threads': 0}
+    threads = set()
+
+    if format == 'eml':
+        path.mkdir(parents=True, exist_ok=True)
+        out = None
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        out = _open(path)
+    try:
+        for _ in range(count):
+            message = generator.message()
+            full = message['full']
+            if format == 'full':
+                out.write(json.dumps(full, separators=(',', ':')).encode('utf-8') + b'\n')
+            elif format == 'raw':
+                out.write(json.dumps(message['resource_raw'], separators=(',', ':')).encode('utf-8') + b'\n')
+            elif format == 'mbox':
+                out.write(mbox_entry(message['raw'], full['internalDate'], full['labelIds']))
+            else:
+                (path / f"{full['id']}.eml").write_bytes(message['raw'])
+            stats['messages'] += 1
+            stats['raw_bytes'] += len(message['raw'])
+            threads.add(full['threadId'])
+    finally:
+        if out is not None:
+            out.close()
+    stats['threads'] = len(threads)
+    return stats
+
+
+def iter_corpus(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    # Reads back a full or raw corpus written by write_corpus
+    path = Path(path)
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic Gmail corpus for scale testing")
+    parser.add_argument('path')
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--format', choices=CORPUS_FORMATS, default='full')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='default')
+    args = parser.parse_args()
+    print(json.dumps(write_corpus(args.path, args.count, args.format, args.seed, args.profile)))
+
+
+if __name__ == '__main__':
+    main()
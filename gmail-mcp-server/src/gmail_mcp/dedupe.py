@@ -0,0 +1,287 @@
+import hashlib
+import re
+import threading
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .gmail_client import BATCH_SIZE, GmailClient
+
+
+DEFAULT_NUM_PERM = 64
+DEFAULT_THRESHOLD = 0.8
+SHINGLE_WORDS = 5
+
+# Bodies shorter than this ("Thanks!", "See you then") say nothing about
+# duplication, so they only ever match on Message-ID.
+MIN_WORDS = 10
+MAX_WORDS = 5000
+
+_WORD = re.compile(r'\w+')
+_EMPTY = 0xFFFFFFFF
+_MASK = (1 << 64) - 1
+
+
+def words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def shingles(tokens: List[str], size: int = SHINGLE_WORDS) -> List[Tuple[str, ...]]:
+    if len(tokens) < size:
+        return [tuple(tokens)] if tokens else []
+    return list(zip(*(tokens[offset:] for offset in range(size))))
+
+
+def minhash(features: List[Any], num_perm: int = DEFAULT_NUM_PERM) -> array:
+    # One-permutation hashing: each feature is hashed once and only updates the
+    # bin its low bits select, so the cost is O(features) rather than
+    # O(features * num_perm). Python's str hash is randomised per process, so
+    # signatures are only comparable within one run.
+    signature = array('I', [_EMPTY]) * num_perm
+    for feature in set(features):
+        value = hash(feature) & _MASK
+        slot = value % num_perm
+        low = value >> 32
+        if low < signature[slot]:
+            signature[slot] = low
+    # Empty bins borrow from the next filled bin (rotation densification)
+    filled = [slot for slot in range(num_perm) if signature[slot] != _EMPTY]
+    if filled and len(filled) < num_perm:
+        following = filled[0]
+        for slot in range(num_perm - 1, -1, -1):
+            if signature[slot] != _EMPTY:
+                following = slot
+            else:
+                distance = (following - slot) % num_perm
+                signature[slot] = (signature[following] + distance * 0x9E3779B1) & 0xFFFFFFFE
+    return signature
+
+
+def similarity(left: array, right: array) -> float:
+    return sum(map(int.__eq__, left, right)) / len(left)
+
+
+def lsh_params(num_perm: int, threshold: float) -> Tuple[int, int]:
+    # Pick bands * rows = num_perm whose S-curve midpoint (1/b)^(1/r) is the
+    # closest one at or below the threshold; candidates are verified anyway.
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent: List[int] = []
+
+    def add(self) -> int:
+        self.parent.append(len(self.parent))
+        return len(self.parent) - 1
+
+    def find(self, index: int) -> int:
+        parent = self.parent
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    def union(self, left: int, right: int) -> bool:
+        left, right = self.find(left), self.find(right)
+        if left == right:
+            return False
+        if left > right:
+            left, right = right, left
+        self.parent[right] = left
+        return True
+
+
+class DuplicateFinder:
+    def __init__(
+        self,
+        client: GmailClient,
+        query: str = "",
+        label_ids: Optional[List[str]] = None,
+        include_spam_trash: bool = False,
+        threshold: float = DEFAULT_THRESHOLD,
+        num_perm: int = DEFAULT_NUM_PERM,
+        max_messages: Optional[int] = None,
+        batch_size: int = BATCH_SIZE,
+        concurrency: int = 4
+    ):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Similarity threshold must be in (0, 1]: {threshold}")
+        self.client = client
+        self.query = query
+        self.label_ids = label_ids
+        self.include_spam_trash = include_spam_trash
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = lsh_params(num_perm, threshold)
+        self.max_messages = max_messages
+        self.batch_size = batch_size
+        self.concurrency = max(1, concurrency)
+        self.cancel_event = threading.Event()
+        self.stats = {'listed': 0, 'scanned': 0, 'compared': 0}
+        self.errors: Dict[str, str] = {}
+
+        # Per message state is kept small: 100k messages is a few tens of MB
+        self.messages: List[Tuple[str, int, str, str]] = []
+        self.signatures: List[Optional[array]] = []
+        self._keys: List[Tuple[str, str]] = []
+        self.groups = _UnionFind()
+        self.reasons: Dict[int, set] = {}
+        self._exact: Dict[Tuple[str, str], int] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+
+    def _batches(self) -> Iterator[List[str]]:
+        batch: List[str] = []
+        for message_id in self.client.iter_message_ids(
+            query=self.query,
+            label_ids=self.label_ids,
+            include_spam_trash=self.include_spam_trash
+        ):
+            if self.cancel_event.is_set() or (self.max_messages is not None and self.stats['listed'] >= self.max_messages):
+                break
+            self.stats['listed'] += 1
+            batch.append(message_id)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _link(self, left: int, right: int, reason: str) -> None:
+        root_left, root_right = self.groups.find(left), self.groups.find(right)
+        reasons = self.reasons.pop(root_left, set()) | self.reasons.pop(root_right, set())
+        self.groups.union(left, right)
+        reasons.add(reason)
+        self.reasons[self.groups.find(left)] = reasons
+
+    def _match_exact(self, index: int, kind: str, key: Optional[str]) -> None:
+        if not key:
+            return
+        other = self._exact.setdefault((kind, key), index)
+        if other != index:
+            self._link(other, index, kind)
+
+    def add(self, message: Dict[str, Any]) -> None:
+        headers = {h['name'].lower(): h['value'] for h in message.get('payload', {}).get('headers', [])}
+        parsed = GmailClient.parse_message_content(message, include_html=False)
+        text = parsed['body']['text'] or ''
+
+        index = self.groups.add()
+        self.messages.append((
+            message['id'],
+            int(message.get('internalDate', 0)),
+            headers.get('subject', ''),
+            headers.get('from', '')
+        ))
+        message_key = headers.get('message-id', '').strip().lower()
+        self._match_exact(index, 'message_id', message_key)
+
+        body_words = words(text)
+        if len(body_words) < MIN_WORDS:
+            self._keys.append((message_key, ''))
+            self.signatures.append(None)
+            return
+        body_key = hashlib.sha1(' '.join(body_words).encode()).hexdigest()
+        self._keys.append((message_key, body_key))
+        self._match_exact(index, 'body', body_key)
+
+        signature = minhash(shingles(body_words[:MAX_WORDS]), self.num_perm)
+        self.signatures.append(signature)
+        rows = self.rows
+        for band in range(self.bands):
+            bucket = self._buckets.setdefault((band, signature[band * rows:(band + 1) * rows].tobytes()), [])
+            if bucket:
+                # Checking against the first and latest member keeps each
+                # bucket linear; union-find closes the rest transitively, and
+                # clusters() re-checks members against the copy it keeps.
+                for other in {bucket[0], bucket[-1]}:
+                    if self.groups.find(other) == self.groups.find(index):
+                        continue
+                    self.stats['compared'] += 1
+                    if similarity(self.signatures[other], signature) >= self.threshold:
+                        self._link(other, index, 'similar')
+            bucket.append(index)
+
+    def run(self, progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        def fetch(message_ids: List[str]) -> Dict[str, Any]:
+            return self.client.get_messages_batch(message_ids, format='full')
+
+        in_flight: deque = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='gmail-dedupe') as pool:
+            batches = self._batches()
+            while True:
+                while len(in_flight) < self.concurrency and not self.cancel_event.is_set():
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                    in_flight.append(pool.submit(fetch, batch))
+                if not in_flight:
+                    break
+
+                result = in_flight.popleft().result()
+                self.errors.update(result['errors'])
+                for message in result['messages']:
+                    self.add(message)
+                    self.stats['scanned'] += 1
+                if progress:
+                    progress(self.status())
+
+        # Buckets are only needed while adding
+        self._buckets.clear()
+        return {**self.status(), **self.clusters()}
+
+    def _duplicate_of(self, keep: int, index: int) -> bool:
+        # A cluster can chain A~B~C without A~C, so only members that match
+        # the kept copy itself count as its duplicates
+        if any(key and key == other for key, other in zip(self._keys[keep], self._keys[index])):
+            return True
+        left, right = self.signatures[keep], self.signatures[index]
+        return left is not None and right is not None and similarity(left, right) >= self.threshold
+
+    def clusters(self) -> Dict[str, Any]:
+        members: Dict[int, List[int]] = {}
+        for index in range(len(self.messages)):
+            members.setdefault(self.groups.find(index), []).append(index)
+
+        clusters = []
+        duplicate_ids = []
+        for root, indices in members.items():
+            if len(indices) < 2:
+                continue
+            # The earliest copy is the one to keep
+            indices.sort(key=lambda index: self.messages[index][1])
+            keep = self.messages[indices[0]]
+            duplicates, related = [], []
+            for index in indices[1:]:
+                (duplicates if self._duplicate_of(indices[0], index) else related).append(self.messages[index][0])
+            duplicate_ids.extend(duplicates)
+            clusters.append({
+                'keep': keep[0],
+                'duplicates': duplicates,
+                'related': related,
+                'subject': keep[2],
+                'from': keep[3],
+                'reasons': sorted(self.reasons.get(root, ())),
+            })
+        clusters.sort(key=lambda cluster: -len(cluster['duplicates']))
+        return {'clusters': clusters, 'duplicate_ids': duplicate_ids}
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'threshold': self.threshold,
+            'failed': len(self.errors),
+            'errors': dict(list(self.errors.items())[:20]),
+            'cancelled': self.cancel_event.is_set(),
+        }
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
@@ -0,0 +1,257 @@
+import base64
+import gzip
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Union
+
+from .bulk import JobJournal
+from .gmail_client import BATCH_SIZE, GmailClient
+from .ids import IdSet
+
+
+EXPORT_FORMATS = ('mbox', 'eml')
+COMPRESSION_SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+_FROM_LINE = re.compile(rb'^(>*From )', re.MULTILINE)
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd compression needs the 'zstandard' package (pip install gmail-mcp-server[zstd])")
+    return zstandard
+
+
+def decode_raw(raw: str) -> bytes:
+    # Gmail sometimes drops the base64 padding
+    return base64.urlsafe_b64decode(raw + '=' * (-len(raw) % 4))
+
+
+def mbox_entry(message: bytes, internal_date_ms: Optional[str] = None, labels: Optional[List[str]] = None) -> bytes:
+    stamp = time.gmtime(int(internal_date_ms) / 1000) if internal_date_ms else time.gmtime()
+    header = f"From MAILER-DAEMON {time.asctime(stamp)}\n".encode()
+    if labels:
+        # Same header Google Takeout writes, so other tools can read the labels back
+        header += b'X-Gmail-Labels: ' + ','.join(labels).encode() + b'\n'
+    body = message.replace(b'\r\n', b'\n')
+    # mboxrd quoting keeps body lines that start with "From " from splitting the message
+    body = _FROM_LINE.sub(rb'>\1', body)
+    if not body.endswith(b'\n'):
+        body += b'\n'
+    return header + body + b'\n'
+
+
+class _Frame:
+    # One independently decodable compressed frame; gzip members and zstd
+    # frames can be concatenated, so resumed exports simply append more.
+    def __init__(self, fileobj: BinaryIO, compression: Optional[str]):
+        self._fileobj = fileobj
+        if compression == 'gzip':
+            self._writer = gzip.GzipFile(fileobj=fileobj, mode='wb')
+        elif compression == 'zstd':
+            self._writer = _zstd().ZstdCompressor().stream_writer(fileobj, closefd=False)
+        else:
+            self._writer = None
+
+    def write(self, data: bytes) -> None:
+        (self._writer or self._fileobj).write(data)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+class MailboxExporter:
+    def __init__(
+        self,
+        client: GmailClient,
+        path: Union[str, Path],
+        format: str = 'mbox',
+        compression: Optional[str] = None,
+        query: str = "",
+        label_ids: Optional[List[str]] = None,
+        include_spam_trash: bool = False,
+        batch_size: int = BATCH_SIZE,
+        concurrency: int = 4,
+        label_headers: bool = True
+    ):
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {format}")
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == 'zstd':
+            _zstd()
+
+        self.client = client
+        self.path = Path(path)
+        suffix = COMPRESSION_SUFFIXES[compression]
+        if format == 'mbox' and suffix and self.path.suffix != suffix:
+            # Readers, the importer included, go by the file name
+            self.path = self.path.with_name(self.path.name + suffix)
+        self.format = format
+        self.compression = compression
+        self.batch_size = batch_size
+        self.concurrency = max(1, concurrency)
+        self.label_headers = label_headers
+        self.cancel_event = threading.Event()
+        self.spec = {
+            'format': format,
+            'compression': compression,
+            'query': query,
+            'label_ids': label_ids,
+            'include_spam_trash': include_spam_trash,
+        }
+        # EML exports resume from the files on disk; mbox needs a journal of
+        # committed offsets because a crash can leave a partial message behind.
+        self.journal = JobJournal(self.path.with_name(self.path.name + '.journal')) if format == 'mbox' else None
+        self.stats = {'listed': 0, 'exported': 0, 'skipped': 0, 'bytes': 0}
+        self.errors: Dict[str, str] = {}
+        self._label_map: Optional[Dict[str, str]] = None
+
+    def _resume_mbox(self) -> IdSet:
+        records = self.journal.replay()
+        first = next(records, None)
+        if first is None:
+            if self.path.exists() and self.path.stat().st_size:
+                raise ValueError(f"{self.path} already exists and has no export journal")
+            self.journal.append({'type': 'start', 'spec': self.spec})
+            return IdSet()
+        if first['spec'] != self.spec:
+            raise ValueError(f"{self.path} was exported with different settings")
+
+        # Packed ids keep resuming a multi-million message export cheap
+        exported = IdSet()
+        offset = 0
+        for record in records:
+            if record['type'] == 'checkpoint':
+                exported.update(record['ids'])
+                offset = record['offset']
+        # Drop anything written after the last checkpoint
+        if self.path.exists() and self.path.stat().st_size > offset:
+            with open(self.path, 'r+b') as f:
+                f.truncate(offset)
+        return exported
+
+    def _eml_path(self, message_id: str) -> Path:
+        return self.path / f'{message_id}.eml{COMPRESSION_SUFFIXES[self.compression]}'
+
+    def _pending_batches(self, exported: IdSet) -> Iterator[List[str]]:
+        batch: List[str] = []
+        for message_id in self.client.iter_message_ids(
+            query=self.spec['query'],
+            label_ids=self.spec['label_ids'],
+            include_spam_trash=self.spec['include_spam_trash']
+        ):
+            if self.cancel_event.is_set():
+                break
+            self.stats['listed'] += 1
+            if message_id in exported or (self.format == 'eml' and self._eml_path(message_id).exists()):
+                self.stats['skipped'] += 1
+                continue
+            batch.append(message_id)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _label_names(self, label_ids: List[str]) -> List[str]:
+        if self._label_map is None:
+            self._label_map = {label['id']: label['name'] for label in self.client.labels.all()}
+        return [self._label_map.get(label_id, label_id) for label_id in label_ids]
+
+    def _render(self, message: Dict[str, Any]) -> bytes:
+        data = decode_raw(message['raw'])
+        if self.format == 'eml':
+            return data
+        labels = self._label_names(message.get('labelIds', [])) if self.label_headers else None
+        return mbox_entry(data, message.get('internalDate'), labels)
+
+    def _write_mbox(self, fileobj: BinaryIO, messages: List[Dict[str, Any]]) -> None:
+        frame = _Frame(fileobj, self.compression)
+        size = 0
+        for message in messages:
+            entry = self._render(message)
+            frame.write(entry)
+            size += len(entry)
+        frame.close()
+        fileobj.flush()
+        os.fsync(fileobj.fileno())
+        self.journal.append({'type': 'checkpoint', 'offset': fileobj.tell(), 'ids': [m['id'] for m in messages]})
+        self.stats['bytes'] += size
+
+    def _write_eml(self, messages: List[Dict[str, Any]]) -> None:
+        for message in messages:
+            target = self._eml_path(message['id'])
+            partial = target.with_name(target.name + '.part')
+            data = self._render(message)
+            with open(partial, 'wb') as f:
+                frame = _Frame(f, self.compression)
+                frame.write(data)
+                frame.close()
+            # Rename last so an existing file is always a complete message
+            os.replace(partial, target)
+            self.stats['bytes'] += len(data)
+
+    def run(self, progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        if self.format == 'mbox':
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            exported = self._resume_mbox()
+            fileobj: Optional[BinaryIO] = open(self.path, 'ab')
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            exported = IdSet()
+            fileobj = None
+
+        def fetch(message_ids: List[str]) -> Dict[str, Any]:
+            return self.client.get_messages_batch(message_ids, format='raw')
+
+        # At most `concurrency` batches are in flight, and they are written in
+        # listing order, so memory stays flat however large the mailbox is.
+        in_flight: deque = deque()
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='gmail-export') as pool:
+                batches = self._pending_batches(exported)
+                while True:
+                    while len(in_flight) < self.concurrency and not self.cancel_event.is_set():
+                        batch = next(batches, None)
+                        if batch is None:
+                            break
+                        in_flight.append(pool.submit(fetch, batch))
+                    if not in_flight:
+                        break
+
+                    result = in_flight.popleft().result()
+                    self.errors.update(result['errors'])
+                    if result['messages']:
+                        if fileobj is not None:
+                            self._write_mbox(fileobj, result['messages'])
+                        else:
+                            self._write_eml(result['messages'])
+                        self.stats['exported'] += len(result['messages'])
+                    if progress:
+                        progress(self.status())
+        finally:
+            if fileobj is not None:
+                fileobj.close()
+
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'path': str(self.path),
+            **self.spec,
+            **self.stats,
+            'failed': len(self.errors),
+            'errors': dict(list(self.errors.items())[:20]),
+            'cancelled': self.cancel_event.is_set(),
+        }
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
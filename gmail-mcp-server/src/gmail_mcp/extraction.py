@@ -0,0 +1,185 @@
+import json
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Union
+
+from .gmail_client import BATCH_SIZE, GmailClient
+from .mime import parse_raw_message, pool_context
+
+
+# Bullet points, numbered lists and TODO:/TASK: lines, anchored at line start
+TASK_LINE_PATTERN = re.compile(
+    r'^[ \t]*(?:[-•*]|\d+[.)]|todo:?|task:?)[ \t]*(.+)$',
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+class KeywordMatcher:
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        self.categories: Dict[str, Set[str]] = {}
+        keyword_categories: Dict[str, Set[str]] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                keyword_categories.setdefault(keyword, set()).add(category)
+            self.categories[category] = {keyword.lower() for keyword in keywords}
+
+        self._keyword_categories = keyword_categories
+        # One alternation for every keyword, longest first so "complete by" wins
+        # over any shorter keyword sharing its prefix; matched in a single scan.
+        alternation = '|'.join(
+            re.escape(keyword)
+            for keyword in sorted(keyword_categories, key=len, reverse=True)
+        )
+        self.pattern = re.compile(rf'\b(?:{alternation})\b', re.IGNORECASE) if alternation else None
+
+    def keywords(self, text: str) -> Set[str]:
+        if not text or self.pattern is None:
+            return set()
+        return {match.group(0).lower() for match in self.pattern.finditer(text)}
+
+    def match(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        for keyword in self.keywords(text):
+            found |= self._keyword_categories[keyword]
+        return found
+
+    def matches_any(self, text: str, category: str) -> bool:
+        return bool(self.keywords(text) & self.categories.get(category, set()))
+
+
+_worker_matcher: Optional[KeywordMatcher] = None
+_worker_task_category: Optional[str] = None
+
+
+def _init_worker(matcher: KeywordMatcher, task_category: Optional[str]) -> None:
+    global _worker_matcher, _worker_task_category
+    _worker_matcher = matcher
+    _worker_task_category = task_category
+
+
+def analyze_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    matcher = _worker_matcher
+    content = parse_raw_message(message) if 'raw' in message else GmailClient.parse_message_content(message)
+    headers = content['headers']
+    body = content['body'] or {}
+
+    subject = headers.get('subject', '')
+    text_body = body.get('text') or body.get('html') or ''
+    combined_text = f"{subject}\n{text_body}"
+
+    tasks = []
+    if _worker_task_category:
+        for line_match in TASK_LINE_PATTERN.finditer(combined_text):
+            line = line_match.group(1).strip()
+            if matcher.matches_any(line, _worker_task_category):
+                tasks.append(line)
+
+    return {
+        'id': content['id'],
+        'threadId': content['threadId'],
+        'subject': subject,
+        'from': headers.get('from', ''),
+        'date': headers.get('date', ''),
+        'snippet': content.get('snippet') or '',
+        'content': text_body[:1000],
+        'categories': sorted(matcher.match(combined_text)),
+        'tasks': tasks
+    }
+
+
+class TaskExtractor:
+    def __init__(
+        self,
+        client: GmailClient,
+        categories: Dict[str, Iterable[str]],
+        task_category: Optional[str] = 'task',
+        workers: Optional[int] = None,
+        batch_size: int = BATCH_SIZE
+    ):
+        self.client = client
+        self.matcher = KeywordMatcher(categories)
+        self.task_category = task_category if task_category in self.matcher.categories else None
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.batch_size = batch_size
+        self.errors: Dict[str, str] = {}
+
+    def _fetch(self, chunk: List[str]) -> List[Dict[str, Any]]:
+        result = self.client.get_messages_batch(chunk, format='raw')
+        self.errors.update(result['errors'])
+        return result['messages']
+
+    def _batches(self, message_ids: Iterator[str]) -> Iterator[List[Dict[str, Any]]]:
+        chunk: List[str] = []
+        for message_id in message_ids:
+            chunk.append(message_id)
+            if len(chunk) == self.batch_size:
+                yield self._fetch(chunk)
+                chunk = []
+        if chunk:
+            yield self._fetch(chunk)
+
+    def iter_records(
+        self,
+        query: str = "",
+        label_ids: Optional[List[str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        self.errors = {}
+        batches = self._batches(self.client.iter_message_ids(query=query, label_ids=label_ids))
+
+        if self.workers <= 1:
+            _init_worker(self.matcher, self.task_category)
+            for messages in batches:
+                yield from map(analyze_message, messages)
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=pool_context(),
+            initializer=_init_worker,
+            initargs=(self.matcher, self.task_category)
+        ) as executor:
+            # Parse batch N in the pool while batch N+1 is being fetched
+            pending = None
+            for messages in batches:
+                submitted = executor.map(analyze_message, messages, chunksize=max(1, len(messages) // self.workers))
+                if pending is not None:
+                    yield from pending
+                pending = submitted
+            if pending is not None:
+                yield from pending
+
+    def run(
+        self,
+        output_path: Union[str, Path],
+        query: str = "",
+        label_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        total = 0
+        total_tasks = 0
+        category_counts: Counter = Counter()
+
+        with open(output_path, 'w') as f:
+            for record in self.iter_records(query=query, label_ids=label_ids):
+                f.write(json.dumps(record) + '\n')
+                total += 1
+                total_tasks += len(record['tasks'])
+                category_counts.update(record['categories'])
+
+        return {
+            'extraction_date': str(datetime.now()),
+            'query': query,
+            'output_path': str(output_path),
+            'total_messages_analyzed': total,
+            'total_tasks': total_tasks,
+            'categories': dict(category_counts),
+            'failed': len(self.errors),
+            'errors': dict(list(self.errors.items())[:20])
+        }
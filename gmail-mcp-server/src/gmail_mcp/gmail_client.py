@@ -1,20 +1,92 @@
 import base64
-import email
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
 from pathlib import Path
+import io
 import mimetypes
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+from googleapiclient.http import MediaIoBaseUpload
+
+from .adaptive import BatchController, is_congestion, is_throttled
+from .attachments import AttachmentStore
 from .auth import GmailAuth
+from .html_text import message_text
+from .labels import LabelCache
+from .mime import parse_raw_messages
+from .prefetch import Prefetcher
+from .singleflight import SingleFlight
+
+# Gmail accepts up to 100 calls per HTTP batch but starts rate limiting well before that
+BATCH_SIZE = 50
+MAX_BATCH_SIZE = 100
+
+# batchModify and batchDelete accept up to 1000 ids per call
+BULK_WRITE_SIZE = 500
+MAX_BULK_WRITE_SIZE = 1000
+
+# Rate-limited requests are sent at most this many times
+MAX_BATCH_ATTEMPTS = 5
+
+# Messages larger than this are uploaded on their own with resumable media upload
+RESUMABLE_UPLOAD_THRESHOLD = 5 * 1024 * 1024
+
+IMPORT_MODES = ('import', 'insert')
+
+# Headers fetched when multi_search hydrates its results
+SUMMARY_HEADERS = ['From', 'To', 'Subject', 'Date']
+
+
+def _request_key(method: str, params: Dict[str, Any]) -> Tuple:
+    return (method,) + tuple(sorted((name, tuple(value) if isinstance(value, list) else value) for name, value in params.items()))
 
 
 class GmailClient:
-    def __init__(self, auth: GmailAuth):
+    def __init__(self, auth: GmailAuth, attachments: Optional[AttachmentStore] = None):
         self.auth = auth
-        self.service = auth.get_service()
+        self._local = threading.local()
+        self._local.service = auth.get_service()
+        self.labels = LabelCache(self._fetch_labels)
+        self.attachments = attachments
+        self.flights = SingleFlight()
+        self.prefetcher: Optional[Prefetcher] = None
+        self.batching = BatchController(BATCH_SIZE, minimum=5, maximum=MAX_BATCH_SIZE)
+        self.bulk_batching = BatchController(BULK_WRITE_SIZE, minimum=50, maximum=MAX_BULK_WRITE_SIZE, increase=50, max_concurrency=1)
+        # Long-lived so each worker keeps its thread's service object
+        self._batch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='gmail-batch')
+        
+    @property
+    def service(self):
+        # httplib2 connections are not thread-safe, so every worker thread that
+        # talks to Gmail gets its own service object.
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._local.service = self.auth.get_service()
+        return service
+        
+    def _read(self, key: Tuple, request) -> Any:
+        # An identical read already in flight is joined instead of sent again
+        return self.flights.do(key, request.execute)
+        
+    def _write(self, request) -> Any:
+        try:
+            return request.execute()
+        finally:
+            self._forget_reads()
+            
+    def _forget_reads(self) -> None:
+        # Reads issued after a write must not join one that started before it,
+        # nor be served from a prefetch that did
+        self.flights.forget()
+        if self.prefetcher is not None:
+            self.prefetcher.clear()
         
     def list_messages(
         self, 
@@ -36,26 +108,299 @@ class GmailClient:
             if page_token:
                 params['pageToken'] = page_token
             if label_ids:
-                params['labelIds'] = label_ids
+                params['labelIds'] = self.labels.resolve(label_ids)
                 
-            results = self.service.users().messages().list(**params).execute()
+            results = self._read(_request_key('messages.list', params), self.service.users().messages().list(**params))
             return results
         except Exception as e:
             raise Exception(f"Failed to list messages: {str(e)}")
             
     def get_message(self, message_id: str, format: str = 'full') -> Dict[str, Any]:
+        if self.prefetcher is not None:
+            message = self.prefetcher.take('message', message_id, format)
+            if message is not None:
+                return message
         try:
-            message = self.service.users().messages().get(
+            message = self._read(('messages.get', message_id, format), self.service.users().messages().get(
                 userId='me',
                 id=message_id,
                 format=format
-            ).execute()
+            ))
             return message
         except Exception as e:
             raise Exception(f"Failed to get message {message_id}: {str(e)}")
             
-    def get_message_content(self, message_id: str) -> Dict[str, Any]:
+    def get_message_content(self, message_id: str, include_html: bool = True) -> Dict[str, Any]:
         message = self.get_message(message_id)
+        return self.parse_message_content(message, include_html)
+        
+    def iter_message_ids(
+        self,
+        query: str = "",
+        label_ids: Optional[List[str]] = None,
+        include_spam_trash: bool = False,
+        page_size: int = 500
+    ) -> Iterator[str]:
+        page_token = None
+        while True:
+            result = self.list_messages(
+                query=query,
+                max_results=page_size,
+                page_token=page_token,
+                label_ids=label_ids,
+                include_spam_trash=include_spam_trash
+            )
+            for message in result.get('messages', []):
+                yield message['id']
+                
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                break
+                
+    def get_messages_batch(
+        self,
+        message_ids: List[str],
+        format: str = 'full',
+        metadata_headers: Optional[List[str]] = None,
+        batch_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        requests = []
+        for message_id in dict.fromkeys(message_ids):
+            params = {'userId': 'me', 'id': message_id, 'format': format}
+            if metadata_headers and format == 'metadata':
+                params['metadataHeaders'] = metadata_headers
+            requests.append((message_id, self.service.users().messages().get(**params)))
+            
+        responses, errors = self._execute_batch(requests, batch_size)
+        return {
+            'messages': [responses[message_id] for message_id in dict.fromkeys(message_ids) if message_id in responses],
+            'errors': {message_id: str(error) for message_id, error in errors.items()}
+        }
+        
+    def get_messages_content(
+        self,
+        message_ids: List[str],
+        include_html: bool = True,
+        batch_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        # format=raw is much smaller than format=full's JSON tree, and the MIME
+        # parsing it needs runs in worker processes
+        result = self.get_messages_batch(message_ids, format='raw', batch_size=batch_size)
+        return {
+            'messages': parse_raw_messages(result['messages'], include_html),
+            'errors': result['errors']
+        }
+        
+    def multi_search(
+        self,
+        queries: List[str],
+        max_results: Optional[int] = None,
+        label_ids: Optional[List[str]] = None,
+        include_spam_trash: bool = False,
+        annotate: bool = True,
+        hydrate: bool = False,
+        metadata_headers: Optional[List[str]] = None,
+        concurrency: int = 4
+    ) -> Dict[str, Any]:
+        # Queries are listed concurrently and their ids merged as pages arrive.
+        # With hydrate, metadata for new ids is fetched while listing goes on,
+        # and a message matched by several queries is fetched once.
+        queries = list(dict.fromkeys(queries))
+        pages: queue.Queue = queue.Queue()
+        
+        def search(index: int) -> None:
+            page_token = None
+            remaining = max_results
+            try:
+                while remaining is None or remaining > 0:
+                    result = self.list_messages(
+                        query=queries[index],
+                        max_results=500 if remaining is None else min(500, remaining),
+                        page_token=page_token,
+                        label_ids=label_ids,
+                        include_spam_trash=include_spam_trash
+                    )
+                    messages = result.get('messages', [])
+                    pages.put((index, messages, None))
+                    if remaining is not None:
+                        remaining -= len(messages)
+                    page_token = result.get('nextPageToken')
+                    if not page_token:
+                        break
+            except Exception as e:
+                pages.put((index, None, e))
+            finally:
+                pages.put((index, None, None))
+                
+        def fetch(message_ids: List[str]) -> Dict[str, Any]:
+            return self.get_messages_batch(message_ids, format='metadata', metadata_headers=metadata_headers or SUMMARY_HEADERS)
+            
+        found: Dict[str, Dict[str, Any]] = {}
+        matched: Dict[str, List[str]] = {}
+        counts = {query: 0 for query in queries}
+        query_errors: Dict[str, str] = {}
+        fetches = []
+        pending: List[str] = []
+        
+        search_pool = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(queries))), thread_name_prefix='gmail-search')
+        fetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='gmail-search-fetch') if hydrate else None
+        try:
+            for index in range(len(queries)):
+                search_pool.submit(search, index)
+            running = len(queries)
+            while running:
+                index, messages, error = pages.get()
+                if messages is None:
+                    if error is not None:
+                        query_errors[queries[index]] = str(error)
+                    else:
+                        running -= 1
+                    continue
+                    
+                counts[queries[index]] += len(messages)
+                for message in messages:
+                    message_id = message['id']
+                    if message_id not in found:
+                        found[message_id] = {'id': message_id, 'threadId': message.get('threadId')}
+                        matched[message_id] = []
+                        pending.append(message_id)
+                    matched[message_id].append(queries[index])
+                while fetch_pool is not None and len(pending) >= MAX_BATCH_SIZE:
+                    fetches.append(fetch_pool.submit(fetch, pending[:MAX_BATCH_SIZE]))
+                    pending = pending[MAX_BATCH_SIZE:]
+            if fetch_pool is not None and pending:
+                fetches.append(fetch_pool.submit(fetch, pending))
+                
+            errors: Dict[str, str] = {}
+            for future in fetches:
+                result = future.result()
+                errors.update(result['errors'])
+                for message in result['messages']:
+                    found[message['id']] = self._message_summary(message)
+        finally:
+            search_pool.shutdown(wait=False)
+            if fetch_pool is not None:
+                fetch_pool.shutdown(wait=False)
+                
+        messages = list(found.values())
+        if hydrate:
+            # Messages whose fetch failed are listed under errors and keep an
+            # empty headers dict, so every result has the same shape
+            for message in messages:
+                message.setdefault('headers', {})
+            # Listing order only holds within one query; dates order the union
+            messages.sort(key=lambda message: int(message.get('internalDate') or 0), reverse=True)
+        if annotate:
+            for message in messages:
+                message['queries'] = matched[message['id']]
+        return {
+            'messages': messages,
+            'total': len(messages),
+            'counts': counts,
+            'errors': errors,
+            'query_errors': query_errors
+        }
+        
+    @staticmethod
+    def _message_summary(message: Dict[str, Any]) -> Dict[str, Any]:
+        headers = message.get('payload', {}).get('headers', [])
+        return {
+            'id': message['id'],
+            'threadId': message.get('threadId'),
+            'labelIds': message.get('labelIds', []),
+            'snippet': message.get('snippet'),
+            'internalDate': message.get('internalDate'),
+            'headers': {header['name'].lower(): header['value'] for header in headers},
+        }
+        
+    def _execute_batch(
+        self,
+        requests: List[Tuple[str, Any]],
+        batch_size: Optional[int] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+        # Without an explicit batch_size, batch size and the number of batches
+        # in flight follow the client's shared controller. Rate-limited items
+        # are requeued; nothing else is retried since writes may have applied.
+        control = self.batching if batch_size is None else BatchController.fixed(batch_size)
+        responses: Dict[str, Any] = {}
+        errors: Dict[str, Exception] = {}
+        attempts: Dict[str, int] = {}
+        pending = deque(requests)
+        in_flight = set()
+        
+        while pending or in_flight:
+            while pending and len(in_flight) < control.concurrency:
+                chunk = [pending.popleft() for _ in range(min(control.size, len(pending)))]
+                in_flight.add(self._batch_pool.submit(self._send_batch, chunk))
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            
+            backoff = 0.0
+            for future in done:
+                chunk, chunk_responses, chunk_errors, elapsed = future.result()
+                responses.update(chunk_responses)
+                throttled = [
+                    request for request in chunk
+                    if request[0] in chunk_errors and is_throttled(chunk_errors[request[0]])
+                ]
+                failed = sum(1 for error in chunk_errors.values() if is_congestion(error) and not is_throttled(error))
+                backoff = max(backoff, control.record(len(chunk), elapsed, len(throttled), failed))
+                errors.update(chunk_errors)
+                for request in throttled:
+                    attempts[request[0]] = attempts.get(request[0], 0) + 1
+                    if attempts[request[0]] < MAX_BATCH_ATTEMPTS:
+                        del errors[request[0]]
+                        pending.append(request)
+            if backoff:
+                time.sleep(backoff)
+                
+        return responses, errors
+        
+    def _send_batch(self, chunk: List[Tuple[str, Any]]) -> Tuple[List[Tuple[str, Any]], Dict[str, Any], Dict[str, Exception], float]:
+        responses: Dict[str, Any] = {}
+        errors: Dict[str, Exception] = {}
+        
+        def callback(request_id, response, exception):
+            if exception is not None:
+                errors[request_id] = exception
+            else:
+                responses[request_id] = response
+                
+        service = self.service
+        batch = service.new_batch_http_request(callback=callback)
+        for request_id, request in chunk:
+            batch.add(request, request_id=request_id)
+        started = time.monotonic()
+        try:
+            # Requests may have been built on another thread; send them over this one's connection
+            batch.execute(http=service._http)
+        except Exception as e:
+            for request_id, _ in chunk:
+                if request_id not in responses:
+                    errors.setdefault(request_id, e)
+        return chunk, responses, errors, time.monotonic() - started
+        
+    def _bulk_write(self, message_ids: List[str], send) -> None:
+        # batchModify and batchDelete take up to 1000 ids per call; chunks
+        # follow the bulk controller and rate-limited ones are sent again.
+        pending = deque(dict.fromkeys(message_ids))
+        attempts = 0
+        while pending:
+            chunk = [pending.popleft() for _ in range(min(self.bulk_batching.size, len(pending)))]
+            started = time.monotonic()
+            try:
+                self._write(send(chunk))
+            except Exception as e:
+                if not is_throttled(e) or attempts + 1 >= MAX_BATCH_ATTEMPTS:
+                    raise
+                attempts += 1
+                pending.extendleft(reversed(chunk))
+                time.sleep(self.bulk_batching.record(len(chunk), time.monotonic() - started, throttled=len(chunk)))
+                continue
+            attempts = 0
+            self.bulk_batching.record(len(chunk), time.monotonic() - started)
+            
+    @staticmethod
+    def parse_message_content(message: Dict[str, Any], include_html: bool = True) -> Dict[str, Any]:
         result = {
             'id': message['id'],
             'threadId': message.get('threadId'),
@@ -74,14 +419,20 @@ class GmailClient:
                     result['headers'][name] = header['value']
                     
         # Extract body
-        result['body'] = self._extract_body(message.get('payload', {}))
+        result['body'] = GmailClient._extract_body(message.get('payload', {}))
+        if result['body']['text'] is None and result['body']['html']:
+            # HTML-only mail: give callers readable text instead of markup
+            result['body']['text'] = message_text(message.get('id'), result['body']['html'])
+        if not include_html:
+            del result['body']['html']
         
         # Extract attachments info
-        result['attachments'] = self._extract_attachments_info(message.get('payload', {}))
+        result['attachments'] = GmailClient._extract_attachments_info(message.get('payload', {}))
         
         return result
         
-    def _extract_body(self, payload: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    @staticmethod
+    def _extract_body(payload: Dict[str, Any]) -> Dict[str, Optional[str]]:
         body = {'text': None, 'html': None}
         
         if 'parts' in payload:
@@ -96,7 +447,7 @@ class GmailClient:
                     if data:
                         body['html'] = base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
                 elif 'parts' in part:
-                    nested_body = self._extract_body(part)
+                    nested_body = GmailClient._extract_body(part)
                     if not body['text'] and nested_body['text']:
                         body['text'] = nested_body['text']
                     if not body['html'] and nested_body['html']:
@@ -113,7 +464,8 @@ class GmailClient:
                     
         return body
         
-    def _extract_attachments_info(self, payload: Dict[str, Any], attachments: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _extract_attachments_info(payload: Dict[str, Any], attachments: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         if attachments is None:
             attachments = []
             
@@ -124,27 +476,104 @@ class GmailClient:
                         'filename': part['filename'],
                         'mimeType': part.get('mimeType'),
                         'size': part.get('body', {}).get('size', 0),
-                        'attachmentId': part.get('body', {}).get('attachmentId')
+                        'attachmentId': part.get('body', {}).get('attachmentId'),
+                        'partId': part.get('partId')
                     }
                     attachments.append(attachment)
                 elif 'parts' in part:
-                    self._extract_attachments_info(part, attachments)
+                    GmailClient._extract_attachments_info(part, attachments)
                     
         return attachments
         
     def get_attachment(self, message_id: str, attachment_id: str) -> bytes:
+        if self.attachments is not None:
+            data = self.attachments.read(message_id, attachment_id)
+            if data is not None:
+                return data
+        data = self._download_attachment(message_id, attachment_id)
+        if self.attachments is not None:
+            self.attachments.put(message_id, attachment_id, data)
+        return data
+        
+    def _download_attachment(self, message_id: str, attachment_id: str) -> bytes:
         try:
-            attachment = self.service.users().messages().attachments().get(
+            attachment = self._read(('attachments.get', message_id, attachment_id), self.service.users().messages().attachments().get(
                 userId='me',
                 messageId=message_id,
                 id=attachment_id
-            ).execute()
+            ))
             
             data = attachment['data']
             return base64.urlsafe_b64decode(data)
         except Exception as e:
             raise Exception(f"Failed to get attachment: {str(e)}")
             
+    def save_attachment(self, message_id: str, attachment_id: str, save_path: str) -> Path:
+        if self.attachments is not None:
+            saved = self.attachments.copy_to(message_id, attachment_id, save_path)
+            if saved is not None:
+                return saved
+                
+        data = self._download_attachment(message_id, attachment_id)
+        if self.attachments is not None:
+            self.attachments.put(message_id, attachment_id, data)
+        target = Path(save_path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        return target
+        
+    @staticmethod
+    def attachment_part(file_path: str) -> MIMEBase:
+        path = Path(file_path)
+        if not path.exists():
+            raise FileNotFoundError(f"Attachment not found: {file_path}")
+            
+        mime_type, _ = mimetypes.guess_type(file_path)
+        if mime_type is None:
+            mime_type = 'application/octet-stream'
+            
+        main_type, sub_type = mime_type.split('/', 1)
+        
+        with open(file_path, 'rb') as f:
+            attachment = MIMEBase(main_type, sub_type)
+            attachment.set_payload(f.read())
+            
+        encoders.encode_base64(attachment)
+        attachment.add_header(
+            'Content-Disposition',
+            f'attachment; filename="{path.name}"'
+        )
+        return attachment
+        
+    @staticmethod
+    def build_message(
+        to: List[str],
+        subject: str,
+        body: str,
+        cc: Optional[List[str]] = None,
+        bcc: Optional[List[str]] = None,
+        attachments: Optional[List[Union[str, MIMEBase]]] = None,
+        html: bool = False
+    ) -> Union[MIMEText, MIMEMultipart]:
+        message = MIMEMultipart() if attachments else MIMEText(body, 'html' if html else 'plain')
+        
+        if isinstance(message, MIMEMultipart):
+            message.attach(MIMEText(body, 'html' if html else 'plain'))
+        
+        message['to'] = ', '.join(to)
+        message['subject'] = subject
+        
+        if cc:
+            message['cc'] = ', '.join(cc)
+        if bcc:
+            message['bcc'] = ', '.join(bcc)
+            
+        # Already encoded parts can be shared between messages as-is
+        for attachment in attachments or []:
+            message.attach(attachment if isinstance(attachment, MIMEBase) else GmailClient.attachment_part(attachment))
+            
+        return message
+        
     def send_message(
         self,
         to: List[str],
@@ -156,53 +585,28 @@ class GmailClient:
         html: bool = False
     ) -> Dict[str, Any]:
         try:
-            message = MIMEMultipart() if attachments else MIMEText(body, 'html' if html else 'plain')
-            
-            if isinstance(message, MIMEMultipart):
-                message.attach(MIMEText(body, 'html' if html else 'plain'))
-            
-            message['to'] = ', '.join(to)
-            message['subject'] = subject
-            
-            if cc:
-                message['cc'] = ', '.join(cc)
-            if bcc:
-                message['bcc'] = ', '.join(bcc)
-                
-            if attachments:
-                for file_path in attachments:
-                    path = Path(file_path)
-                    if not path.exists():
-                        raise FileNotFoundError(f"Attachment not found: {file_path}")
-                        
-                    mime_type, _ = mimetypes.guess_type(file_path)
-                    if mime_type is None:
-                        mime_type = 'application/octet-stream'
-                        
-                    main_type, sub_type = mime_type.split('/', 1)
-                    
-                    with open(file_path, 'rb') as f:
-                        attachment = MIMEBase(main_type, sub_type)
-                        attachment.set_payload(f.read())
-                        
-                    encoders.encode_base64(attachment)
-                    attachment.add_header(
-                        'Content-Disposition',
-                        f'attachment; filename="{path.name}"'
-                    )
-                    message.attach(attachment)
-                    
+            message = self.build_message(to, subject, body, cc, bcc, attachments, html)
             raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
             
-            result = self.service.users().messages().send(
+            result = self._write(self.service.users().messages().send(
                 userId='me',
                 body={'raw': raw_message}
-            ).execute()
+            ))
             
             return result
         except Exception as e:
             raise Exception(f"Failed to send message: {str(e)}")
             
+    def send_raw_message(self, raw: bytes, thread_id: Optional[str] = None) -> Dict[str, Any]:
+        try:
+            body = {'raw': base64.urlsafe_b64encode(raw).decode()}
+            if thread_id:
+                body['threadId'] = thread_id
+            return self._write(self.service.users().messages().send(userId='me', body=body))
+        except Exception as e:
+            # Chained so callers can still tell rate limits from other errors
+            raise Exception(f"Failed to send message: {str(e)}") from e
+            
     def create_draft(
         self,
         to: List[str],
@@ -214,74 +618,68 @@ class GmailClient:
         html: bool = False
     ) -> Dict[str, Any]:
         try:
-            message = MIMEMultipart() if attachments else MIMEText(body, 'html' if html else 'plain')
-            
-            if isinstance(message, MIMEMultipart):
-                message.attach(MIMEText(body, 'html' if html else 'plain'))
-            
-            message['to'] = ', '.join(to)
-            message['subject'] = subject
-            
-            if cc:
-                message['cc'] = ', '.join(cc)
-            if bcc:
-                message['bcc'] = ', '.join(bcc)
-                
-            if attachments:
-                for file_path in attachments:
-                    path = Path(file_path)
-                    if not path.exists():
-                        raise FileNotFoundError(f"Attachment not found: {file_path}")
-                        
-                    mime_type, _ = mimetypes.guess_type(file_path)
-                    if mime_type is None:
-                        mime_type = 'application/octet-stream'
-                        
-                    main_type, sub_type = mime_type.split('/', 1)
-                    
-                    with open(file_path, 'rb') as f:
-                        attachment = MIMEBase(main_type, sub_type)
-                        attachment.set_payload(f.read())
-                        
-                    encoders.encode_base64(attachment)
-                    attachment.add_header(
-                        'Content-Disposition',
-                        f'attachment; filename="{path.name}"'
-                    )
-                    message.attach(attachment)
-                    
+            message = self.build_message(to, subject, body, cc, bcc, attachments, html)
             raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
             
-            draft = self.service.users().drafts().create(
+            draft = self._write(self.service.users().drafts().create(
                 userId='me',
                 body={'message': {'raw': raw_message}}
-            ).execute()
+            ))
             
             return draft
         except Exception as e:
             raise Exception(f"Failed to create draft: {str(e)}")
             
+    def create_drafts(self, drafts: List[Dict[str, Any]], batch_size: Optional[int] = None) -> Dict[str, Any]:
+        # Each entry takes the same keys as create_draft; results keep input order
+        requests = []
+        errors: Dict[int, str] = {}
+        for index, draft in enumerate(drafts):
+            try:
+                message = self.build_message(**draft)
+            except Exception as e:
+                errors[index] = str(e)
+                continue
+            raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
+            requests.append((str(index), self.service.users().drafts().create(
+                userId='me',
+                body={'message': {'raw': raw_message}}
+            )))
+            
+        responses, batch_errors = self._execute_batch(requests, batch_size)
+        self._forget_reads()
+        errors.update((int(index), str(error)) for index, error in batch_errors.items())
+        return {
+            'drafts': [responses.get(str(index)) for index in range(len(drafts))],
+            'errors': {str(index): error for index, error in sorted(errors.items())}
+        }
+        
     def update_draft(self, draft_id: str, message: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            draft = self.service.users().drafts().update(
+            draft = self._write(self.service.users().drafts().update(
                 userId='me',
                 id=draft_id,
                 body={'message': message}
-            ).execute()
+            ))
             return draft
         except Exception as e:
             raise Exception(f"Failed to update draft: {str(e)}")
             
     def delete_draft(self, draft_id: str) -> None:
         try:
-            self.service.users().drafts().delete(
+            self._write(self.service.users().drafts().delete(
                 userId='me',
                 id=draft_id
-            ).execute()
+            ))
         except Exception as e:
             raise Exception(f"Failed to delete draft: {str(e)}")
             
-    def list_drafts(self, max_results: int = 10, page_token: Optional[str] = None) -> Dict[str, Any]:
+    def list_drafts(
+        self,
+        max_results: int = 10,
+        page_token: Optional[str] = None,
+        hydrate: bool = False
+    ) -> Dict[str, Any]:
         try:
             params = {
                 'userId': 'me',
@@ -291,46 +689,77 @@ class GmailClient:
                 params['pageToken'] = page_token
                 
             results = self.service.users().drafts().list(**params).execute()
-            return results
         except Exception as e:
             raise Exception(f"Failed to list drafts: {str(e)}")
             
+        if hydrate and results.get('drafts'):
+            # One batch round trip for the headers instead of a get per draft
+            fetched = self.get_drafts([draft['id'] for draft in results['drafts']], format='metadata')
+            results['drafts'] = [self._draft_summary(draft) for draft in fetched['drafts']]
+            if fetched['errors']:
+                results['errors'] = fetched['errors']
+        return results
+        
+    @staticmethod
+    def _draft_summary(draft: Dict[str, Any]) -> Dict[str, Any]:
+        message = GmailClient.parse_message_content(draft['message'])
+        return {
+            'id': draft['id'],
+            'messageId': message['id'],
+            'threadId': message['threadId'],
+            'subject': message['headers'].get('subject'),
+            'to': message['headers'].get('to'),
+            'cc': message['headers'].get('cc'),
+            'snippet': message['snippet'],
+        }
+            
     def get_draft(self, draft_id: str) -> Dict[str, Any]:
         try:
-            draft = self.service.users().drafts().get(
+            draft = self._read(('drafts.get', draft_id), self.service.users().drafts().get(
                 userId='me',
                 id=draft_id
-            ).execute()
+            ))
             return draft
         except Exception as e:
             raise Exception(f"Failed to get draft: {str(e)}")
             
+    def get_drafts(self, draft_ids: List[str], format: str = 'full', batch_size: Optional[int] = None) -> Dict[str, Any]:
+        requests = [
+            (draft_id, self.service.users().drafts().get(userId='me', id=draft_id, format=format))
+            for draft_id in dict.fromkeys(draft_ids)
+        ]
+        responses, errors = self._execute_batch(requests, batch_size)
+        return {
+            'drafts': [responses[draft_id] for draft_id, _ in requests if draft_id in responses],
+            'errors': {draft_id: str(error) for draft_id, error in errors.items()}
+        }
+        
     def trash_message(self, message_id: str) -> Dict[str, Any]:
         try:
-            result = self.service.users().messages().trash(
+            result = self._write(self.service.users().messages().trash(
                 userId='me',
                 id=message_id
-            ).execute()
+            ))
             return result
         except Exception as e:
             raise Exception(f"Failed to trash message: {str(e)}")
             
     def untrash_message(self, message_id: str) -> Dict[str, Any]:
         try:
-            result = self.service.users().messages().untrash(
+            result = self._write(self.service.users().messages().untrash(
                 userId='me',
                 id=message_id
-            ).execute()
+            ))
             return result
         except Exception as e:
             raise Exception(f"Failed to untrash message: {str(e)}")
             
     def delete_message(self, message_id: str) -> None:
         try:
-            self.service.users().messages().delete(
+            self._write(self.service.users().messages().delete(
                 userId='me',
                 id=message_id
-            ).execute()
+            ))
         except Exception as e:
             raise Exception(f"Failed to delete message: {str(e)}")
             
@@ -343,26 +772,36 @@ class GmailClient:
         try:
             body = {}
             if add_labels:
-                body['addLabelIds'] = add_labels
+                body['addLabelIds'] = self.labels.resolve(add_labels)
             if remove_labels:
-                body['removeLabelIds'] = remove_labels
+                body['removeLabelIds'] = self.labels.resolve(remove_labels)
                 
-            result = self.service.users().messages().modify(
+            result = self._write(self.service.users().messages().modify(
                 userId='me',
                 id=message_id,
                 body=body
-            ).execute()
+            ))
             return result
         except Exception as e:
             raise Exception(f"Failed to modify message: {str(e)}")
             
-    def list_labels(self) -> List[Dict[str, Any]]:
+    def _fetch_labels(self) -> List[Dict[str, Any]]:
         try:
-            results = self.service.users().labels().list(userId='me').execute()
+            results = self._read(('labels.list',), self.service.users().labels().list(userId='me'))
             return results.get('labels', [])
         except Exception as e:
             raise Exception(f"Failed to list labels: {str(e)}")
             
+    def list_labels(self, refresh: bool = False) -> List[Dict[str, Any]]:
+        if refresh:
+            # Concurrent refreshes share one reload
+            return self.flights.do(('labels.refresh',), self._reload_labels)
+        return self.labels.all()
+        
+    def _reload_labels(self) -> List[Dict[str, Any]]:
+        self.labels.invalidate()
+        return self.labels.all()
+            
     def create_label(
         self,
         name: str,
@@ -376,20 +815,22 @@ class GmailClient:
                 'messageListVisibility': message_list_visibility
             }
             
-            label = self.service.users().labels().create(
+            label = self._write(self.service.users().labels().create(
                 userId='me',
                 body=label_object
-            ).execute()
+            ))
+            self.labels.put(label)
             return label
         except Exception as e:
             raise Exception(f"Failed to create label: {str(e)}")
             
     def delete_label(self, label_id: str) -> None:
         try:
-            self.service.users().labels().delete(
+            self._write(self.service.users().labels().delete(
                 userId='me',
                 id=label_id
-            ).execute()
+            ))
+            self.labels.remove(label_id)
         except Exception as e:
             raise Exception(f"Failed to delete label: {str(e)}")
             
@@ -397,28 +838,66 @@ class GmailClient:
         try:
             label_object = {'name': new_name}
             
-            label = self.service.users().labels().update(
+            label = self._write(self.service.users().labels().update(
                 userId='me',
                 id=label_id,
                 body=label_object
-            ).execute()
+            ))
+            self.labels.put(label)
             return label
         except Exception as e:
             raise Exception(f"Failed to update label: {str(e)}")
             
     def get_label(self, label_id: str) -> Dict[str, Any]:
         try:
-            label = self.service.users().labels().get(
+            label = self._read(('labels.get', label_id), self.service.users().labels().get(
                 userId='me',
                 id=label_id
-            ).execute()
+            ))
             return label
         except Exception as e:
             raise Exception(f"Failed to get label: {str(e)}")
             
+    def list_history(
+        self,
+        start_history_id: str,
+        history_types: Optional[List[str]] = None,
+        label_id: Optional[str] = None,
+        max_results: int = 100,
+        page_token: Optional[str] = None
+    ) -> Dict[str, Any]:
+        try:
+            params = {
+                'userId': 'me',
+                'startHistoryId': start_history_id,
+                'maxResults': max_results
+            }
+            if history_types:
+                params['historyTypes'] = history_types
+            if label_id:
+                params['labelId'] = self.labels.resolve([label_id])[0]
+            if page_token:
+                params['pageToken'] = page_token
+                
+            results = self.service.users().history().list(**params).execute()
+        except Exception as e:
+            raise Exception(f"Failed to list history: {str(e)}")
+            
+        # Any label id we have never seen means labels changed behind our back
+        seen_label_ids = set()
+        for record in results.get('history', []):
+            for key in ('messagesAdded', 'labelsAdded', 'labelsRemoved'):
+                for change in record.get(key, []):
+                    seen_label_ids.update(change.get('labelIds', []))
+                    seen_label_ids.update(change.get('message', {}).get('labelIds', []))
+        if not self.labels.knows(seen_label_ids):
+            self.labels.invalidate()
+            
+        return results
+        
     def get_profile(self) -> Dict[str, Any]:
         try:
-            profile = self.service.users().getProfile(userId='me').execute()
+            profile = self._read(('getProfile',), self.service.users().getProfile(userId='me'))
             return profile
         except Exception as e:
             raise Exception(f"Failed to get profile: {str(e)}")
@@ -432,26 +911,119 @@ class GmailClient:
         try:
             body = {'ids': message_ids}
             if add_labels:
-                body['addLabelIds'] = add_labels
+                body['addLabelIds'] = self.labels.resolve(add_labels)
             if remove_labels:
-                body['removeLabelIds'] = remove_labels
+                body['removeLabelIds'] = self.labels.resolve(remove_labels)
                 
-            self.service.users().messages().batchModify(
+            self._bulk_write(message_ids, lambda chunk: self.service.users().messages().batchModify(
                 userId='me',
-                body=body
-            ).execute()
+                body={**body, 'ids': chunk}
+            ))
         except Exception as e:
             raise Exception(f"Failed to batch modify messages: {str(e)}")
             
     def batch_delete_messages(self, message_ids: List[str]) -> None:
         try:
-            self.service.users().messages().batchDelete(
+            self._bulk_write(message_ids, lambda chunk: self.service.users().messages().batchDelete(
                 userId='me',
-                body={'ids': message_ids}
-            ).execute()
+                body={'ids': chunk}
+            ))
         except Exception as e:
             raise Exception(f"Failed to batch delete messages: {str(e)}")
             
+    def batch_trash_messages(self, message_ids: List[str], batch_size: Optional[int] = None) -> Dict[str, Any]:
+        requests = [
+            (message_id, self.service.users().messages().trash(userId='me', id=message_id))
+            for message_id in dict.fromkeys(message_ids)
+        ]
+        responses, errors = self._execute_batch(requests, batch_size)
+        self._forget_reads()
+        return {
+            'trashed': [message_id for message_id, _ in requests if message_id in responses],
+            'errors': {message_id: str(error) for message_id, error in errors.items()}
+        }
+            
+    def _import_request(
+        self,
+        raw: bytes,
+        label_ids: Optional[List[str]],
+        mode: str,
+        internal_date_source: str,
+        never_mark_spam: bool,
+        resumable: bool
+    ):
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"Unknown import mode: {mode}")
+        messages = self.service.users().messages()
+        params: Dict[str, Any] = {'userId': 'me', 'internalDateSource': internal_date_source}
+        if mode == 'import':
+            params['neverMarkSpam'] = never_mark_spam
+            params['processForCalendar'] = False
+        method = messages.import_ if mode == 'import' else messages.insert
+        
+        body: Dict[str, Any] = {'labelIds': label_ids or []}
+        if resumable:
+            media = MediaIoBaseUpload(io.BytesIO(raw), mimetype='message/rfc822', resumable=True)
+            return method(body=body, media_body=media, **params)
+        body['raw'] = base64.urlsafe_b64encode(raw).decode()
+        return method(body=body, **params)
+        
+    def import_message(
+        self,
+        raw: bytes,
+        label_ids: Optional[List[str]] = None,
+        mode: str = 'import',
+        internal_date_source: str = 'dateHeader',
+        never_mark_spam: bool = True
+    ) -> Dict[str, Any]:
+        try:
+            resumable = len(raw) > RESUMABLE_UPLOAD_THRESHOLD
+            request = self._import_request(
+                raw, self.labels.resolve(label_ids), mode, internal_date_source, never_mark_spam, resumable
+            )
+            if not resumable:
+                return self._write(request)
+            response = None
+            while response is None:
+                _, response = request.next_chunk()
+            self._forget_reads()
+            return response
+        except Exception as e:
+            raise Exception(f"Failed to {mode} message: {str(e)}")
+            
+    def import_messages_batch(
+        self,
+        messages: List[Tuple[str, bytes, Optional[List[str]]]],
+        mode: str = 'import',
+        internal_date_source: str = 'dateHeader',
+        never_mark_spam: bool = True,
+        batch_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        # messages are (key, raw RFC 822 bytes, label ids); large ones cannot
+        # go through an HTTP batch and are uploaded one by one instead.
+        imported: Dict[str, str] = {}
+        errors: Dict[str, str] = {}
+        requests = []
+        for key, raw, label_ids in messages:
+            if len(raw) > RESUMABLE_UPLOAD_THRESHOLD:
+                try:
+                    imported[key] = self.import_message(raw, label_ids, mode, internal_date_source, never_mark_spam)['id']
+                except Exception as e:
+                    errors[key] = str(e)
+                continue
+            try:
+                requests.append((key, self._import_request(
+                    raw, self.labels.resolve(label_ids), mode, internal_date_source, never_mark_spam, False
+                )))
+            except Exception as e:
+                errors[key] = str(e)
+                
+        responses, batch_errors = self._execute_batch(requests, batch_size)
+        self._forget_reads()
+        imported.update((key, response['id']) for key, response in responses.items())
+        errors.update((key, str(error)) for key, error in batch_errors.items())
+        return {'imported': imported, 'errors': errors}
+        
     def list_threads(
         self,
         query: str = "",
@@ -472,49 +1044,70 @@ class GmailClient:
             if page_token:
                 params['pageToken'] = page_token
             if label_ids:
-                params['labelIds'] = label_ids
+                params['labelIds'] = self.labels.resolve(label_ids)
                 
-            results = self.service.users().threads().list(**params).execute()
+            results = self._read(_request_key('threads.list', params), self.service.users().threads().list(**params))
             return results
         except Exception as e:
             raise Exception(f"Failed to list threads: {str(e)}")
             
-    def get_thread(self, thread_id: str) -> Dict[str, Any]:
+    def get_thread(self, thread_id: str, format: str = 'full') -> Dict[str, Any]:
+        if self.prefetcher is not None:
+            thread = self.prefetcher.take('thread', thread_id, format)
+            if thread is not None:
+                return thread
         try:
-            thread = self.service.users().threads().get(
+            thread = self._read(('threads.get', thread_id, format), self.service.users().threads().get(
                 userId='me',
-                id=thread_id
-            ).execute()
+                id=thread_id,
+                format=format
+            ))
             return thread
         except Exception as e:
             raise Exception(f"Failed to get thread: {str(e)}")
             
+    def get_threads_batch(
+        self,
+        thread_ids: List[str],
+        format: str = 'full',
+        batch_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        requests = [
+            (thread_id, self.service.users().threads().get(userId='me', id=thread_id, format=format))
+            for thread_id in dict.fromkeys(thread_ids)
+        ]
+        responses, errors = self._execute_batch(requests, batch_size)
+        return {
+            'threads': [responses[thread_id] for thread_id, _ in requests if thread_id in responses],
+            'errors': {thread_id: str(error) for thread_id, error in errors.items()}
+        }
+        
     def trash_thread(self, thread_id: str) -> Dict[str, Any]:
         try:
-            result = self.service.users().threads().trash(
+            result = self._write(self.service.users().threads().trash(
                 userId='me',
                 id=thread_id
-            ).execute()
+            ))
             return result
         except Exception as e:
             raise Exception(f"Failed to trash thread: {str(e)}")
             
     def untrash_thread(self, thread_id: str) -> Dict[str, Any]:
         try:
-            result = self.service.users().threads().untrash(
+            result = self._write(self.service.users().threads().untrash(
                 userId='me',
                 id=thread_id
-            ).execute()
+            ))
             return result
         except Exception as e:
             raise Exception(f"Failed to untrash thread: {str(e)}")
             
     def delete_thread(self, thread_id: str) -> None:
         try:
-            self.service.users().threads().delete(
+            self._write(self.service.users().threads().delete(
                 userId='me',
                 id=thread_id
-            ).execute()
+            ))
         except Exception as e:
             raise Exception(f"Failed to delete thread: {str(e)}")
             
@@ -527,15 +1120,15 @@ class GmailClient:
         try:
             body = {}
             if add_labels:
-                body['addLabelIds'] = add_labels
+                body['addLabelIds'] = self.labels.resolve(add_labels)
             if remove_labels:
-                body['removeLabelIds'] = remove_labels
+                body['removeLabelIds'] = self.labels.resolve(remove_labels)
                 
-            result = self.service.users().threads().modify(
+            result = self._write(self.service.users().threads().modify(
                 userId='me',
                 id=thread_id,
                 body=body
-            ).execute()
+            ))
             return result
         except Exception as e:
             raise Exception(f"Failed to modify thread: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,242 @@
+import re
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+
+# Output beyond this is cut off; newsletters rarely carry more real text
+DEFAULT_MAX_CHARS = 50_000
+CHUNK_SIZE = 64 * 1024
+
+SKIP_TAGS = frozenset(['script', 'style', 'head', 'title', 'noscript', 'template', 'svg', 'math', 'iframe', 'object'])
+BLOCK_TAGS = frozenset([
+    'p', 'div', 'br', 'tr', 'table', 'section', 'article', 'header', 'footer', 'blockquote', 'pre',
+    'hr', 'ul', 'ol', 'dl', 'dt', 'dd', 'center', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+])
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr',
+])
+
+# Any other tag implicitly ends an unclosed head
+HEAD_TAGS = frozenset(['title', 'meta', 'link', 'style', 'script', 'base', 'noscript', 'template'])
+
+# Elements whose end tag may be left out, and the start tags that end them
+_P_CLOSERS = (BLOCK_TAGS - {'br'}) | {'li', 'dt', 'dd', 'td', 'th', 'aside', 'nav', 'main', 'figure', 'address', 'fieldset', 'menu'}
+CLOSED_BY_START = {
+    'p': _P_CLOSERS,
+    'li': frozenset(['li']),
+    'dt': frozenset(['dt', 'dd']),
+    'dd': frozenset(['dt', 'dd']),
+    'td': frozenset(['td', 'th', 'tr']),
+    'th': frozenset(['td', 'th', 'tr']),
+    'tr': frozenset(['tr']),
+}
+# ...and the end tags of their parents, which end them too
+CLOSED_BY_END = {
+    'p': _P_CLOSERS | {'body', 'html'},
+    'li': frozenset(['ul', 'ol', 'menu']),
+    'dt': frozenset(['dl']),
+    'dd': frozenset(['dl']),
+    'td': frozenset(['tr', 'table']),
+    'th': frozenset(['tr', 'table']),
+    'tr': frozenset(['table', 'tbody', 'thead', 'tfoot']),
+    'head': frozenset(['html']),
+}
+
+_HIDDEN_STYLE = re.compile(
+    r'display\s*:\s*none|visibility\s*:\s*hidden|(?:max-height|font-size)\s*:\s*0(?:px|pt|em|%)?\s*(?:[;!]|$)',
+    re.IGNORECASE
+)
+_SPACES = re.compile(r'[ \t\r\f\v\u00a0\u200b\u200c\u034f\ufeff]+')
+_BLANK_LINES = re.compile(r'\n\s*\n+')
+
+
+class _TextExtractor(HTMLParser):
+    # Single pass over the markup; text inside skipped or hidden elements is
+    # never collected, so tracking pixels and preheader padding cost nothing.
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts: List[str] = []
+        self.size = 0
+        self.truncated = False
+        self._skip_tag: Optional[str] = None
+        # Elements opened inside the skipped one and not closed yet
+        self._skip_stack: List[str] = []
+        # Text of a hidden element, shown if the document ends before it does
+        self._skipped: List[str] = []
+        self._skipped_size = 0
+        self._pre = 0
+
+    def _emit(self, text: str) -> None:
+        if self.size >= self.max_chars:
+            self.truncated = True
+            return
+        self.parts.append(text)
+        self.size += len(text)
+
+    def _closes(self, tag: str, start: bool) -> bool:
+        # Whether this tag implicitly ends the skipped element
+        if self._skip_tag == 'head':
+            if start:
+                return tag == 'body' or (not self._skip_stack and tag not in HEAD_TAGS)
+            return not self._skip_stack and tag in CLOSED_BY_END['head']
+        if self._skip_stack:
+            return False
+        closers = CLOSED_BY_START if start else CLOSED_BY_END
+        return tag in closers.get(self._skip_tag, ())
+
+    def _end_skip(self) -> None:
+        self._skip_tag = None
+        self._skip_stack = []
+        self._skipped = []
+        self._skipped_size = 0
+
+    def _record(self, text: str) -> None:
+        # Raw text elements (scripts, styles) never make it into the fallback
+        if self._skip_tag == 'head' or self._skip_tag not in SKIP_TAGS:
+            if self._skipped_size < self.max_chars and not SKIP_TAGS.intersection(self._skip_stack):
+                self._skipped.append(text)
+                self._skipped_size += len(text)
+
+    def _boundary(self, tag: str, start: bool) -> Optional[str]:
+        if start and tag == 'li':
+            return '\n- '
+        if start and tag in ('td', 'th'):
+            return ' '
+        if tag in BLOCK_TAGS:
+            return '\n'
+        return None
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if self._skip_tag is not None:
+            if not self._closes(tag, start=True):
+                if tag not in VOID_TAGS:
+                    stack = self._skip_stack
+                    while stack and tag in CLOSED_BY_START.get(stack[-1], ()):
+                        stack.pop()
+                    stack.append(tag)
+                boundary = self._boundary(tag, start=True)
+                if boundary:
+                    self._record(boundary)
+                return
+            self._end_skip()
+        if tag not in VOID_TAGS:
+            attributes = dict(attrs)
+            if tag in SKIP_TAGS or 'hidden' in attributes or _HIDDEN_STYLE.search(attributes.get('style') or ''):
+                self._skip_tag = tag
+                boundary = self._boundary(tag, start=True)
+                if boundary:
+                    self._record(boundary)
+                return
+        if tag == 'pre':
+            self._pre += 1
+        boundary = self._boundary(tag, start=True)
+        if boundary:
+            self._emit(boundary)
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if self._skip_tag is None and tag in BLOCK_TAGS:
+            self._emit('\n')
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._skip_tag is not None:
+            stack = self._skip_stack
+            if tag in stack:
+                del stack[len(stack) - 1 - stack[::-1].index(tag):]
+                if tag in BLOCK_TAGS:
+                    self._record('\n')
+                return
+            if tag == self._skip_tag:
+                self._end_skip()
+                return
+            if not self._closes(tag, start=False):
+                return
+            self._end_skip()
+        if tag == 'pre' and self._pre:
+            self._pre -= 1
+        if tag in BLOCK_TAGS:
+            self._emit('\n')
+
+    def handle_data(self, data: str) -> None:
+        if self._skip_tag == 'head' and not self._skip_stack and data.strip():
+            # Text can't live in head, so it starts an implied body
+            self._end_skip()
+        if self._skip_tag is not None:
+            self._record(_SPACES.sub(' ', data.replace('\n', ' ')))
+            return
+        self._emit(data if self._pre else _SPACES.sub(' ', data.replace('\n', ' ')))
+
+    def close(self) -> None:
+        super().close()
+        if self._skip_tag is not None:
+            # The document ended inside an element that was never closed;
+            # rather than lose the rest of the message, show its text
+            for text in self._skipped:
+                self._emit(text)
+            self._end_skip()
+
+    def text(self) -> str:
+        text = ''.join(self.parts)
+        text = '\n'.join(line.strip() for line in text.split('\n'))
+        text = _BLANK_LINES.sub('\n\n', text).strip()
+        if self.truncated:
+            text = text[:self.max_chars] + '\n[truncated]'
+        return text
+
+
+def html_to_text(html: str, max_chars: int = DEFAULT_MAX_CHARS) -> str:
+    parser = _TextExtractor(max_chars)
+    # Fed in chunks so a huge message stops being parsed once the cap is hit
+    for start in range(0, len(html), CHUNK_SIZE):
+        parser.feed(html[start:start + CHUNK_SIZE])
+        if parser.truncated:
+            break
+    else:
+        parser.close()
+    return parser.text()
+
+
+class TextCache:
+    # Message bodies never change for a given id, so the id alone is the key
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key: str, text: str) -> None:
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+text_cache = TextCache()
+
+
+def message_text(message_id: Optional[str], html: str, max_chars: int = DEFAULT_MAX_CHARS) -> str:
+    if message_id is None:
+        return html_to_text(html, max_chars)
+    key = f'{message_id}:{max_chars}'
+    text = text_cache.get(key)
+    if text is None:
+        text = html_to_text(html, max_chars)
+        text_cache.put(key, text)
+    return text
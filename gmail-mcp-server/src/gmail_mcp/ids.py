@@ -0,0 +1,176 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, List, Set, Union
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Gmail message and thread ids are 64-bit integers written in hex, so they fit
+# in 8 bytes instead of the ~60 a Python str costs.
+IdLike = Union[str, int]
+
+# Adds are buffered and merged into the sorted array once this many are pending
+PENDING_LIMIT = 65536
+
+
+def encode_id(message_id: IdLike) -> int:
+    if isinstance(message_id, int):
+        value = message_id
+    else:
+        if message_id[:1] == '0' and len(message_id) > 1:
+            # A leading zero would not survive the round trip back to hex
+            raise ValueError(f"Not a canonical Gmail id: {message_id}")
+        try:
+            value = int(message_id, 16)
+        except ValueError:
+            raise ValueError(f"Not a Gmail id: {message_id}")
+    if not 0 <= value < 1 << 64:
+        raise ValueError(f"Not a 64-bit Gmail id: {message_id}")
+    return value
+
+
+def decode_id(value: int) -> str:
+    return format(value, 'x')
+
+
+def encode_ids(message_ids: Iterable[IdLike]) -> array:
+    return array('Q', (encode_id(message_id) for message_id in message_ids))
+
+
+def decode_ids(values: Iterable[int]) -> List[str]:
+    return [format(value, 'x') for value in values]
+
+
+def _sorted_unique(values: Iterable[int]) -> array:
+    if np is not None:
+        data = values if isinstance(values, array) else array('Q', values)
+        return array('Q', np.unique(np.frombuffer(data, dtype=np.uint64)).tobytes()) if data else array('Q')
+    result = array('Q')
+    previous = None
+    for value in sorted(values):
+        if value != previous:
+            result.append(value)
+            previous = value
+    return result
+
+
+def _merge(left: array, right: array) -> array:
+    if np is not None:
+        merged = np.union1d(np.frombuffer(left, dtype=np.uint64), np.frombuffer(right, dtype=np.uint64))
+        return array('Q', merged.tobytes())
+    result = array('Q')
+    previous = None
+    for value in heapq.merge(left, right):
+        if value != previous:
+            result.append(value)
+            previous = value
+    return result
+
+
+class IdSet:
+    def __init__(self, message_ids: Iterable[IdLike] = ()):
+        self._pending: Set[int] = set()
+        if isinstance(message_ids, array):
+            # Already encoded: sort once instead of adding one at a time
+            self._sorted = _sorted_unique(message_ids)
+        else:
+            self._sorted = array('Q')
+            self.update(message_ids)
+
+    @classmethod
+    def _from_sorted(cls, values: array) -> 'IdSet':
+        id_set = cls()
+        id_set._sorted = values
+        return id_set
+
+    def _compact(self) -> array:
+        if self._pending:
+            self._sorted = _merge(self._sorted, _sorted_unique(self._pending))
+            self._pending = set()
+        return self._sorted
+
+    def _has(self, value: int) -> bool:
+        if value in self._pending:
+            return True
+        index = bisect_left(self._sorted, value)
+        return index < len(self._sorted) and self._sorted[index] == value
+
+    def add(self, message_id: IdLike) -> None:
+        self._pending.add(encode_id(message_id))
+        # Values already in the sorted array are dropped by the merge
+        if len(self._pending) >= max(PENDING_LIMIT, len(self._sorted) // 8):
+            self._compact()
+
+    def update(self, message_ids: Iterable[IdLike]) -> None:
+        for message_id in message_ids:
+            self.add(message_id)
+
+    def __contains__(self, message_id: object) -> bool:
+        try:
+            return self._has(encode_id(message_id))
+        except (TypeError, ValueError):
+            return False
+
+    def __len__(self) -> int:
+        return len(self._compact())
+
+    def __iter__(self) -> Iterator[str]:
+        # Sorted by numeric value, which is also Gmail's chronological order
+        for value in self._compact():
+            yield format(value, 'x')
+
+    def chunks(self, size: int) -> Iterator[List[str]]:
+        values = self._compact()
+        for start in range(0, len(values), size):
+            yield decode_ids(values[start:start + size])
+
+    @property
+    def nbytes(self) -> int:
+        return self._compact().itemsize * len(self._sorted)
+
+    def values(self) -> array:
+        return self._compact()
+
+    def union(self, other: 'IdSet') -> 'IdSet':
+        return IdSet._from_sorted(_merge(self._compact(), other._compact()))
+
+    def intersection(self, other: 'IdSet') -> 'IdSet':
+        left, right = self._compact(), other._compact()
+        if np is not None:
+            common = np.intersect1d(np.frombuffer(left, dtype=np.uint64), np.frombuffer(right, dtype=np.uint64), assume_unique=True)
+            return IdSet._from_sorted(array('Q', common.tobytes()))
+        return IdSet._from_sorted(self._walk(left, right, keep_common=True))
+
+    def difference(self, other: 'IdSet') -> 'IdSet':
+        left, right = self._compact(), other._compact()
+        if np is not None:
+            rest = np.setdiff1d(np.frombuffer(left, dtype=np.uint64), np.frombuffer(right, dtype=np.uint64), assume_unique=True)
+            return IdSet._from_sorted(array('Q', rest.tobytes()))
+        return IdSet._from_sorted(self._walk(left, right, keep_common=False))
+
+    @staticmethod
+    def _walk(left: array, right: array, keep_common: bool) -> array:
+        # One linear pass over both sorted arrays
+        result = array('Q')
+        j = 0
+        for value in left:
+            while j < len(right) and right[j] < value:
+                j += 1
+            found = j < len(right) and right[j] == value
+            if found == keep_common:
+                result.append(value)
+        return result
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, IdSet) and self._compact() == other._compact()
+
+    def __repr__(self) -> str:
+        return f'IdSet({len(self)} ids)'
@@ -0,0 +1,270 @@
+import gzip
+import hashlib
+import io
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import BytesHeaderParser
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Union
+
+from .bulk import JOBS_DIR, JobJournal
+from .export import _zstd
+from .gmail_client import GmailClient
+from .labels import SYSTEM_LABEL_IDS
+
+
+LABELS_HEADER = b'x-gmail-labels:'
+
+# Takeout labels that describe state Gmail derives itself
+IGNORED_LABELS = frozenset(['opened', 'archived', 'chat', 'draft', 'drafts'])
+
+# Keep a batch's request body well under Gmail's batch payload limit
+MAX_BATCH_BYTES = 8 * 1024 * 1024
+
+_QUOTED_FROM = re.compile(rb'^>(>*From )')
+_EML_SUFFIXES = ('.eml', '.eml.gz', '.eml.zst')
+
+
+class SourceMessage(NamedTuple):
+    source: str
+    raw: bytes
+    labels: List[str]
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def _open(path: Path) -> BinaryIO:
+    # Sniffed rather than taken from the suffix, which may be missing
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(path, 'rb')
+    if magic == ZSTD_MAGIC:
+        # Exports append one frame per batch, so keep reading past frame ends
+        reader = _zstd().ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True)
+        return io.BufferedReader(reader)
+    return open(path, 'rb')
+
+
+def _split_labels(raw: bytes) -> SourceMessage:
+    # Pull the Takeout label header out of the message; it only exists for us
+    lines = raw.split(b'\n')
+    labels: List[str] = []
+    for index, line in enumerate(lines):
+        if not line.strip():
+            break
+        if line.lower().startswith(LABELS_HEADER):
+            value = line[len(LABELS_HEADER):]
+            while index + 1 < len(lines) and lines[index + 1][:1] in (b' ', b'\t'):
+                value += lines.pop(index + 1)
+            labels = [name.strip() for name in value.decode('utf-8', 'replace').split(',') if name.strip()]
+            del lines[index]
+            break
+    return SourceMessage('', b'\n'.join(lines), labels)
+
+
+def iter_mbox(path: Union[str, Path]) -> Iterator[SourceMessage]:
+    path = Path(path)
+    with _open(path) as f:
+        buffer: List[bytes] = []
+        start = 0
+        previous_blank = True
+        for number, line in enumerate(f):
+            if line.startswith(b'From ') and previous_blank:
+                if buffer:
+                    yield _split_labels(b''.join(buffer).rstrip(b'\n') + b'\n')._replace(source=f'{path.name}:{start}')
+                buffer = []
+                start = number
+            else:
+                buffer.append(_QUOTED_FROM.sub(rb'\1', line))
+            previous_blank = not line.strip()
+        if buffer:
+            yield _split_labels(b''.join(buffer).rstrip(b'\n') + b'\n')._replace(source=f'{path.name}:{start}')
+
+
+def iter_eml(directory: Union[str, Path]) -> Iterator[SourceMessage]:
+    for path in sorted(Path(directory).iterdir()):
+        if path.name.endswith(_EML_SUFFIXES):
+            with _open(path) as f:
+                yield _split_labels(f.read())._replace(source=path.name)
+
+
+def message_key(raw: bytes) -> str:
+    message_id = BytesHeaderParser().parsebytes(raw).get('Message-ID')
+    if message_id:
+        return message_id.strip()
+    # No Message-ID: fall back to the content so reruns still line up
+    return 'sha1:' + hashlib.sha1(raw).hexdigest()
+
+
+class MailboxImporter:
+    def __init__(
+        self,
+        client: GmailClient,
+        source: Union[str, Path],
+        job_id: Optional[str] = None,
+        mode: str = 'import',
+        label_map: Optional[Dict[str, Optional[str]]] = None,
+        add_labels: Optional[List[str]] = None,
+        create_labels: bool = True,
+        internal_date_source: str = 'dateHeader',
+        never_mark_spam: bool = True,
+        batch_size: int = 20,
+        concurrency: int = 4,
+        journal_dir: Union[str, Path] = JOBS_DIR
+    ):
+        self.client = client
+        self.source = Path(source)
+        self.format = 'eml' if self.source.is_dir() else 'mbox'
+        self.job_id = job_id or 'import-' + hashlib.sha1(str(self.source.resolve()).encode()).hexdigest()[:12]
+        self.batch_size = batch_size
+        self.concurrency = max(1, concurrency)
+        self.create_labels = create_labels
+        self.label_map = {name.lower(): target for name, target in (label_map or {}).items()}
+        self.cancel_event = threading.Event()
+        self.spec = {
+            'source': str(self.source.resolve()),
+            'mode': mode,
+            'add_labels': add_labels,
+            'internal_date_source': internal_date_source,
+            'never_mark_spam': never_mark_spam,
+        }
+        self.journal = JobJournal(Path(journal_dir) / f'{self.job_id}.jsonl')
+        self.stats = {'read': 0, 'imported': 0, 'duplicates': 0, 'bytes': 0}
+        self.errors: Dict[str, str] = {}
+        self._label_ids: Dict[str, Optional[str]] = {}
+        self._label_lock = threading.Lock()
+
+    def _load(self) -> Set[str]:
+        records = self.journal.replay()
+        first = next(records, None)
+        if first is None:
+            self.journal.append({'type': 'start', 'spec': self.spec})
+            return set()
+        if first['spec'] != self.spec:
+            raise ValueError(f"Import {self.job_id} already exists with a different spec")
+        done: Set[str] = set()
+        for record in records:
+            if record['type'] == 'imported':
+                done.update(key for key, _ in record['messages'])
+        return done
+
+    def _label_id(self, name: str) -> Optional[str]:
+        target = self.label_map.get(name.lower(), name)
+        if target is None or target.lower() in IGNORED_LABELS:
+            return None
+        system_id = target.upper().replace(' ', '_')
+        if system_id in SYSTEM_LABEL_IDS:
+            return system_id
+
+        with self._label_lock:
+            if target not in self._label_ids:
+                try:
+                    self._label_ids[target] = self.client.labels.resolve([target])[0]
+                except ValueError:
+                    if not self.create_labels:
+                        raise
+                    self._label_ids[target] = self.client.create_label(target)['id']
+            return self._label_ids[target]
+
+    def _label_ids_for(self, message: SourceMessage) -> List[str]:
+        names = message.labels + (self.spec['add_labels'] or [])
+        label_ids = [self._label_id(name) for name in names]
+        return list(dict.fromkeys(label_id for label_id in label_ids if label_id))
+
+    def _messages(self) -> Iterator[SourceMessage]:
+        return iter_eml(self.source) if self.format == 'eml' else iter_mbox(self.source)
+
+    def _pending_batches(self, done: Set[str]) -> Iterator[List[Dict[str, Any]]]:
+        batch: List[Dict[str, Any]] = []
+        size = 0
+        for message in self._messages():
+            if self.cancel_event.is_set():
+                break
+            self.stats['read'] += 1
+            key = message_key(message.raw)
+            if key in done:
+                self.stats['duplicates'] += 1
+                continue
+            # Also catches the same message appearing twice in one archive
+            done.add(key)
+            batch.append({'key': key, 'message': message})
+            size += len(message.raw)
+            if len(batch) >= self.batch_size or size >= MAX_BATCH_BYTES:
+                yield batch
+                batch = []
+                size = 0
+        if batch:
+            yield batch
+
+    def _upload(self, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        # Message-IDs contain characters that are not valid batch Content-IDs,
+        # so requests are keyed by position and mapped back afterwards.
+        requests = []
+        errors: Dict[str, str] = {}
+        for index, item in enumerate(batch):
+            try:
+                requests.append((str(index), item['message'].raw, self._label_ids_for(item['message'])))
+            except Exception as e:
+                errors[item['key']] = str(e)
+        result = self.client.import_messages_batch(
+            requests,
+            mode=self.spec['mode'],
+            internal_date_source=self.spec['internal_date_source'],
+            never_mark_spam=self.spec['never_mark_spam']
+        )
+        keys = [item['key'] for item in batch]
+        errors.update((keys[int(index)], error) for index, error in result['errors'].items())
+        return {
+            'imported': {keys[int(index)]: message_id for index, message_id in result['imported'].items()},
+            'errors': errors
+        }
+
+    def run(self, progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        done = self._load()
+
+        in_flight: deque = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='gmail-import') as pool:
+            batches = self._pending_batches(done)
+            while True:
+                while len(in_flight) < self.concurrency and not self.cancel_event.is_set():
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                    in_flight.append((batch, pool.submit(self._upload, batch)))
+                if not in_flight:
+                    break
+
+                batch, future = in_flight.popleft()
+                result = future.result()
+                imported = [[item['key'], result['imported'][item['key']]] for item in batch if item['key'] in result['imported']]
+                if imported:
+                    self.journal.append({'type': 'imported', 'messages': imported})
+                for item in batch:
+                    if item['key'] in result['imported']:
+                        self.stats['bytes'] += len(item['message'].raw)
+                    elif item['key'] in result['errors']:
+                        self.errors[item['message'].source] = result['errors'][item['key']]
+                self.stats['imported'] += len(imported)
+                if progress:
+                    progress(self.status())
+
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'journal': str(self.journal.path),
+            **self.spec,
+            **self.stats,
+            'failed': len(self.errors),
+            'errors': dict(list(self.errors.items())[:20]),
+            'cancelled': self.cancel_event.is_set(),
+        }
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
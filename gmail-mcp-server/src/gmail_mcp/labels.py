@@ -0,0 +1,91 @@
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+SYSTEM_LABEL_IDS = frozenset([
+    'INBOX', 'SPAM', 'TRASH', 'UNREAD', 'STARRED', 'IMPORTANT', 'SENT', 'DRAFT', 'CHAT',
+    'CATEGORY_PERSONAL', 'CATEGORY_SOCIAL', 'CATEGORY_PROMOTIONS', 'CATEGORY_UPDATES', 'CATEGORY_FORUMS',
+])
+
+_USER_LABEL_ID = re.compile(r'^Label_\d+$')
+
+
+class LabelCache:
+    def __init__(self, loader: Callable[[], List[Dict[str, Any]]]):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._labels: Optional[Dict[str, Dict[str, Any]]] = None
+        self._ids_by_name: Dict[str, str] = {}
+        self.hits = 0
+        self.loads = 0
+
+    def _ensure_loaded(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            if self._labels is None:
+                labels = self._loader()
+                self._labels = {label['id']: label for label in labels}
+                self._ids_by_name = {label['name'].lower(): label['id'] for label in labels}
+                self.loads += 1
+            else:
+                self.hits += 1
+            return self._labels
+
+    def all(self) -> List[Dict[str, Any]]:
+        return list(self._ensure_loaded().values())
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._labels = None
+            self._ids_by_name = {}
+
+    def put(self, label: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._labels is None:
+                return
+            previous = self._labels.get(label['id'])
+            if previous is not None:
+                self._ids_by_name.pop(previous['name'].lower(), None)
+            self._labels[label['id']] = {**(previous or {}), **label}
+            self._ids_by_name[label['name'].lower()] = label['id']
+
+    def remove(self, label_id: str) -> None:
+        with self._lock:
+            if self._labels is None:
+                return
+            label = self._labels.pop(label_id, None)
+            if label is not None:
+                self._ids_by_name.pop(label['name'].lower(), None)
+
+    def knows(self, label_ids: Iterable[str]) -> bool:
+        with self._lock:
+            if self._labels is None:
+                return True
+            return all(label_id in SYSTEM_LABEL_IDS or label_id in self._labels for label_id in label_ids)
+
+    def resolve(self, names_or_ids: Optional[List[str]]) -> Optional[List[str]]:
+        if not names_or_ids:
+            return names_or_ids
+
+        # System ids and Label_N ids are passed through without loading anything
+        if all(value in SYSTEM_LABEL_IDS or _USER_LABEL_ID.match(value) for value in names_or_ids):
+            return names_or_ids
+
+        resolved = []
+        for attempt in range(2):
+            labels = self._ensure_loaded()
+            resolved = [self._lookup(value, labels) for value in names_or_ids]
+            if None not in resolved:
+                return resolved
+            if attempt == 0:
+                # The label may have been created elsewhere since the cache was loaded
+                self.invalidate()
+
+        unknown = [value for value, label_id in zip(names_or_ids, resolved) if label_id is None]
+        raise ValueError(f"Unknown label(s): {', '.join(unknown)}")
+
+    def _lookup(self, value: str, labels: Dict[str, Dict[str, Any]]) -> Optional[str]:
+        if value in labels or value in SYSTEM_LABEL_IDS or _USER_LABEL_ID.match(value):
+            return value
+        with self._lock:
+            return self._ids_by_name.get(value.lower())
@@ -0,0 +1,263 @@
+import hashlib
+import html as html_lib
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.base import MIMEBase
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from .adaptive import is_throttled
+from .bulk import JOBS_DIR, JobJournal
+from .gmail_client import GmailClient
+
+
+# messages.send costs 100 of the 250 quota units a user gets per second
+SEND_QUOTA_COST = 100
+USER_QUOTA_PER_SECOND = 250
+DEFAULT_SEND_RATE = USER_QUOTA_PER_SECOND / SEND_QUOTA_COST
+
+# Consumer accounts can send 500 messages a day, Workspace accounts 2000,
+# counted over a rolling 24 hours
+DEFAULT_DAILY_LIMIT = 500
+SEND_WINDOW_SECONDS = 86400
+
+# Every merge send is logged here so the daily limit holds across runs and jobs
+SEND_LOG = 'merge-sends.jsonl'
+MAX_STALE_SENDS = 10000
+
+_FIELD = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+
+class MergeTemplate:
+    # Parsed once into literal and field segments; rendering is a join
+    def __init__(self, text: str, escape: Optional[Callable[[str], str]] = None):
+        self.text = text
+        self.escape = escape
+        self._parts = _FIELD.split(text)
+        self.fields = set(self._parts[1::2])
+
+    def render(self, values: Dict[str, Any]) -> str:
+        parts = self._parts[:]
+        for index in range(1, len(parts), 2):
+            name = parts[index]
+            if name not in values or values[name] is None:
+                raise ValueError(f"Missing template field: {name}")
+            value = str(values[name])
+            parts[index] = self.escape(value) if self.escape else value
+        return ''.join(parts)
+
+
+class RateLimiter:
+    # Token bucket shared by all sender threads
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class MailMerge:
+    def __init__(
+        self,
+        client: GmailClient,
+        subject: str,
+        body: str,
+        recipients: List[Dict[str, Any]],
+        html: bool = False,
+        attachments: Optional[List[str]] = None,
+        cc: Optional[List[str]] = None,
+        bcc: Optional[List[str]] = None,
+        rate: float = DEFAULT_SEND_RATE,
+        daily_limit: Optional[int] = DEFAULT_DAILY_LIMIT,
+        concurrency: int = 4,
+        max_retries: int = 3,
+        job_id: Optional[str] = None,
+        journal_dir: Union[str, Path] = JOBS_DIR
+    ):
+        self.client = client
+        self.subject = MergeTemplate(subject)
+        # Field values are text; in an HTML body they must not become markup
+        self.body = MergeTemplate(body, escape=html_lib.escape if html else None)
+        self.recipients = recipients
+        self.html = html
+        self.cc = cc
+        self.bcc = bcc
+        self.daily_limit = daily_limit
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.limiter = RateLimiter(rate, burst=self.concurrency)
+        self.cancel_event = threading.Event()
+        self.attachment_paths = [str(path) for path in attachments or []]
+        # Read and base64 encode each attachment once for the whole run
+        self.attachments: List[MIMEBase] = [GmailClient.attachment_part(path) for path in self.attachment_paths]
+        # With a job id, recipients already sent to are skipped on a rerun
+        self.job_id = job_id
+        self.journal = JobJournal(Path(journal_dir) / f'merge-{job_id}.jsonl') if job_id else None
+        self.send_log = JobJournal(Path(journal_dir) / SEND_LOG)
+        self.results: List[Optional[Dict[str, Any]]] = [None] * len(recipients)
+        self._lock = threading.Lock()
+        self._sent_count = 0
+
+    @property
+    def fields(self) -> Set[str]:
+        return self.subject.fields | self.body.fields
+
+    def validate(self) -> List[Tuple[int, str]]:
+        problems = []
+        for index, row in enumerate(self.recipients):
+            if not row.get('to'):
+                problems.append((index, "Recipient row has no 'to' address"))
+                continue
+            missing = sorted(field for field in self.fields if row.get(field) is None)
+            if missing:
+                problems.append((index, f"Missing template field(s): {', '.join(missing)}"))
+        return problems
+
+    def render(self, row: Dict[str, Any]) -> bytes:
+        to = row['to'] if isinstance(row['to'], list) else [row['to']]
+        message = GmailClient.build_message(
+            to,
+            self.subject.render(row),
+            self.body.render(row),
+            cc=self.cc,
+            bcc=self.bcc,
+            attachments=self.attachments,
+            html=self.html
+        )
+        return message.as_bytes()
+
+    def preview(self, count: int = 1) -> List[Dict[str, str]]:
+        return [
+            {'to': row['to'], 'subject': self.subject.render(row), 'body': self.body.render(row)}
+            for row in self.recipients[:count]
+        ]
+
+    def spec_hash(self) -> str:
+        # Journal rows are matched by index, which only means something for
+        # the same templates, recipient table and shared options
+        spec = {
+            'subject': self.subject.text,
+            'body': self.body.text,
+            'recipients': self.recipients,
+            'html': self.html,
+            'attachments': self.attachment_paths,
+            'cc': self.cc,
+            'bcc': self.bcc,
+        }
+        return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _already_sent(self) -> Dict[int, str]:
+        if self.journal is None:
+            return {}
+        records = self.journal.replay()
+        first = next(records, None)
+        if first is None:
+            self.journal.append({'type': 'start', 'spec_hash': self.spec_hash()})
+            return {}
+        if first.get('type') != 'start' or first.get('spec_hash') != self.spec_hash():
+            raise ValueError(f"Merge job {self.job_id} already exists with a different template or recipients")
+        sent = {}
+        for record in records:
+            if record['type'] == 'sent':
+                sent[record['index']] = record['id']
+        return sent
+
+    def _recent_sends(self) -> int:
+        cutoff = time.time() - SEND_WINDOW_SECONDS
+        records = list(self.send_log.replay())
+        recent = [record for record in records if record.get('at', 0) >= cutoff]
+        if len(records) - len(recent) > MAX_STALE_SENDS:
+            # Only the last day counts; keep the log from growing forever
+            self.send_log.rewrite(recent)
+        return len(recent)
+
+    def _take_quota(self) -> bool:
+        with self._lock:
+            if self.daily_limit is not None and self._sent_count >= self.daily_limit:
+                return False
+            self._sent_count += 1
+            return True
+
+    def _send(self, index: int) -> Dict[str, Any]:
+        row = self.recipients[index]
+        result: Dict[str, Any] = {'index': index, 'to': row.get('to')}
+        try:
+            raw = self.render(row)
+        except Exception as e:
+            return {**result, 'status': 'failed', 'error': str(e)}
+
+        if self.cancel_event.is_set():
+            return {**result, 'status': 'skipped', 'error': 'Cancelled'}
+        if not self._take_quota():
+            return {**result, 'status': 'deferred', 'error': 'Daily send limit reached'}
+
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                response = self.client.send_raw_message(raw)
+                break
+            except Exception as e:
+                # The client wraps API errors; the HttpError is the cause
+                if attempt == self.max_retries or not is_throttled(e.__cause__ or e):
+                    with self._lock:
+                        self._sent_count -= 1
+                    return {**result, 'status': 'failed', 'error': str(e)}
+                time.sleep(2 ** attempt)
+
+        sent_at = time.time()
+        self.send_log.append({'type': 'sent', 'at': sent_at})
+        if self.journal is not None:
+            self.journal.append({'type': 'sent', 'index': index, 'to': row.get('to'), 'id': response['id'], 'at': sent_at})
+        return {**result, 'status': 'sent', 'id': response['id']}
+
+    def run(self, progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        already_sent = self._already_sent()
+        with self._lock:
+            self._sent_count = self._recent_sends()
+        pending = []
+        for index, row in enumerate(self.recipients):
+            if index in already_sent:
+                self.results[index] = {'index': index, 'to': row.get('to'), 'status': 'sent', 'id': already_sent[index]}
+            else:
+                pending.append(index)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='gmail-merge') as pool:
+            for result in pool.map(self._send, pending):
+                self.results[result['index']] = result
+                if progress:
+                    progress(self.status())
+
+        return {**self.status(), 'results': self.results}
+
+    def status(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for result in self.results:
+            if result is not None:
+                counts[result['status']] = counts.get(result['status'], 0) + 1
+        return {
+            'recipients': len(self.recipients),
+            'sent': counts.get('sent', 0),
+            'failed': counts.get('failed', 0),
+            'deferred': counts.get('deferred', 0),
+            'skipped': counts.get('skipped', 0),
+            'cancelled': self.cancel_event.is_set(),
+        }
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
@@ -0,0 +1,362 @@
+import json
+import threading
+import time
+from array import array
+from email.utils import parseaddr
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from .auth import TOKEN_PATH
+from .gmail_client import BATCH_SIZE, GmailClient
+from .ids import IdSet, decode_id, encode_id
+from .partition import PartitionedEnumerator
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+METADATA_DIR = TOKEN_PATH.parent / 'metadata'
+INITIAL_CAPACITY = 16384
+
+# Label membership is a bitmask of 64-bit words per row; it starts at 4 words
+# (256 labels) and doubles whenever a new label does not fit
+LABEL_WORDS = 4
+
+COLUMNS = {
+    'id': ('uint64', ()),
+    'thread': ('uint64', ()),
+    'date': ('int64', ()),
+    'size': ('int64', ()),
+    'sender': ('int32', ()),
+    # Width comes from meta['label_words']
+    'labels': ('uint64', (LABEL_WORDS,)),
+    'live': ('bool', ()),
+}
+
+GROUP_BYS = ('sender', 'label', 'thread', 'year', 'month')
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("The metadata store needs NumPy (pip install gmail-mcp-server[stats])")
+
+
+class MetadataStore:
+    def __init__(self, path: Union[str, Path] = METADATA_DIR):
+        _require_numpy()
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        # Held for a whole sync, which can take minutes; queries only ever
+        # wait for _lock, which sync takes around each change to the columns
+        self._sync_lock = threading.Lock()
+        meta_path = self.path / 'meta.json'
+        self.meta = json.loads(meta_path.read_text()) if meta_path.exists() else {
+            'count': 0,
+            'capacity': INITIAL_CAPACITY,
+            'senders': [],
+            'labels': [],
+            'history_id': None,
+            'synced_at': None,
+        }
+        self.meta.setdefault('label_words', LABEL_WORDS)
+        self.columns = {name: self._open(name, self.meta['capacity']) for name in COLUMNS}
+        # The column file is authoritative if a widening was never saved to meta.json
+        self.meta['label_words'] = self.columns['labels'].shape[1]
+        self._sender_codes = {sender: code for code, sender in enumerate(self.meta['senders'])}
+        self._label_bits = {label: bit for bit, label in enumerate(self.meta['labels'])}
+        self._rows: Dict[int, int] = {}
+        self._index_rows()
+
+    def _open(self, name: str, capacity: int, mode: str = 'r+'):
+        dtype, shape = COLUMNS[name]
+        if name == 'labels':
+            shape = (self.meta['label_words'],)
+        file_path = self.path / f'{name}.npy'
+        if file_path.exists() and mode == 'r+':
+            return np.load(file_path, mmap_mode='r+')
+        return np.lib.format.open_memmap(file_path, mode='w+', dtype=dtype, shape=(capacity,) + shape)
+
+    def _index_rows(self) -> None:
+        count = self.meta['count']
+        self._rows = dict(zip(self.columns['id'][:count].tolist(), range(count)))
+
+    def _grow(self, needed: int) -> None:
+        capacity = self.meta['capacity']
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        count = self.meta['count']
+        for name in COLUMNS:
+            old = np.array(self.columns[name][:count])
+            del self.columns[name]
+            new = self._open(name, capacity, mode='w+')
+            new[:count] = old
+            self.columns[name] = new
+        self.meta['capacity'] = capacity
+
+    def _save(self) -> None:
+        for column in self.columns.values():
+            column.flush()
+        self.meta['senders'] = list(self._sender_codes)
+        self.meta['labels'] = list(self._label_bits)
+        partial = self.path / 'meta.json.part'
+        partial.write_text(json.dumps(self.meta))
+        partial.replace(self.path / 'meta.json')
+
+    def __len__(self) -> int:
+        with self._lock:
+            count = self.meta['count']
+            return int(self.columns['live'][:count].sum())
+
+    @property
+    def synced_at(self) -> Optional[float]:
+        with self._lock:
+            return self.meta['synced_at']
+
+    def _sender_code(self, from_header: str) -> int:
+        address = (parseaddr(from_header)[1] or from_header).lower()
+        code = self._sender_codes.get(address)
+        if code is None:
+            code = self._sender_codes[address] = len(self._sender_codes)
+        return code
+
+    def _widen_labels(self, needed: int) -> None:
+        words = self.meta['label_words']
+        if needed <= words:
+            return
+        while words < needed:
+            words *= 2
+        old = np.array(self.columns['labels'])
+        del self.columns['labels']
+        self.meta['label_words'] = words
+        new = self._open('labels', self.meta['capacity'], mode='w+')
+        new[:, :old.shape[1]] = old
+        self.columns['labels'] = new
+
+    def _label_mask(self, label_ids: List[str]) -> List[int]:
+        bits = []
+        for label_id in label_ids:
+            bit = self._label_bits.get(label_id)
+            if bit is None:
+                bit = self._label_bits[label_id] = len(self._label_bits)
+            bits.append(bit)
+        self._widen_labels((len(self._label_bits) + 63) // 64)
+        words = [0] * self.meta['label_words']
+        for bit in bits:
+            words[bit // 64] |= 1 << (bit % 64)
+        return words
+
+    def upsert(self, messages: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._grow(self.meta['count'] + len(messages))
+            cols = self.columns
+            for message in messages:
+                key = encode_id(message['id'])
+                row = self._rows.get(key)
+                if row is None:
+                    row = self._rows[key] = self.meta['count']
+                    self.meta['count'] += 1
+                headers = {h['name'].lower(): h['value'] for h in message.get('payload', {}).get('headers', [])}
+                cols['id'][row] = key
+                cols['thread'][row] = encode_id(message.get('threadId') or message['id'])
+                cols['date'][row] = int(message.get('internalDate', 0))
+                cols['size'][row] = int(message.get('sizeEstimate', 0))
+                cols['sender'][row] = self._sender_code(headers.get('from', ''))
+                cols['labels'][row] = self._label_mask(message.get('labelIds', []))
+                cols['live'][row] = True
+
+    def remove(self, message_ids: List[str]) -> None:
+        with self._lock:
+            for message_id in message_ids:
+                row = self._rows.get(encode_id(message_id))
+                if row is not None:
+                    self.columns['live'][row] = False
+
+    def _set_labels(self, message_id: str, label_ids: List[str], present: bool) -> None:
+        row = self._rows.get(encode_id(message_id))
+        if row is None:
+            return
+        words = self._label_mask(label_ids)
+        current = self.columns['labels'][row]
+        for index, word in enumerate(words):
+            current[index] = (int(current[index]) | word) if present else (int(current[index]) & ~word)
+
+    def live_ids(self) -> IdSet:
+        with self._lock:
+            count = self.meta['count']
+            ids = self.columns['id'][:count][self.columns['live'][:count]]
+            return IdSet(array('Q', np.ascontiguousarray(ids, dtype=np.uint64).tobytes()))
+
+    def sync(
+        self,
+        client: GmailClient,
+        batch_size: int = BATCH_SIZE,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> Dict[str, Any]:
+        # Label changes since the last sync come from the history API; new and
+        # deleted messages from diffing the full id listing against the store.
+        with self._sync_lock:
+            started = client.get_profile().get('historyId')
+            stats = {'listed': 0, 'fetched': 0, 'removed': 0, 'label_updates': 0, 'errors': 0}
+            incremental = False
+            with self._lock:
+                history_id = self.meta['history_id']
+            if history_id:
+                incremental = self._apply_history(client, history_id, stats)
+
+            enumerator = PartitionedEnumerator(client, include_spam_trash=True, cancel_event=cancel_event)
+            listed = enumerator.run()
+            stats['listed'] = len(listed)
+
+            known = self.live_ids()
+            # A cancelled listing is incomplete, so absence proves nothing
+            if not enumerator.cancel_event.is_set():
+                gone = known - listed
+                self.remove(list(gone))
+                stats['removed'] = len(gone)
+
+            # Without usable history every row is refetched to pick up label changes
+            to_fetch = listed - known if incremental else listed
+            total = len(to_fetch)
+            completed = True
+            for chunk in to_fetch.chunks(batch_size * 4):
+                if cancel_event is not None and cancel_event.is_set():
+                    completed = False
+                    break
+                result = client.get_messages_batch(chunk, format='metadata', metadata_headers=['From'])
+                self.upsert(result['messages'])
+                stats['fetched'] += len(result['messages'])
+                stats['errors'] += len(result['errors'])
+                if progress:
+                    progress(dict(stats, total=total))
+
+            with self._lock:
+                if completed:
+                    self.meta['history_id'] = started
+                self.meta['synced_at'] = time.time()
+                self._save()
+            return {**stats, 'messages': len(self)}
+
+    def _apply_history(self, client: GmailClient, start_history_id: str, stats: Dict[str, int]) -> bool:
+        page_token = None
+        while True:
+            try:
+                result = client.list_history(
+                    start_history_id,
+                    history_types=['labelAdded', 'labelRemoved', 'messageDeleted'],
+                    max_results=500,
+                    page_token=page_token
+                )
+            except Exception:
+                # History only goes back about a week
+                return False
+            with self._lock:
+                for record in result.get('history', []):
+                    for change in record.get('labelsAdded', []):
+                        self._set_labels(change['message']['id'], change.get('labelIds', []), True)
+                        stats['label_updates'] += 1
+                    for change in record.get('labelsRemoved', []):
+                        self._set_labels(change['message']['id'], change.get('labelIds', []), False)
+                        stats['label_updates'] += 1
+                    self.remove([change['message']['id'] for change in record.get('messagesDeleted', [])])
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return True
+
+    def _filter(
+        self,
+        after: Optional[float] = None,
+        before: Optional[float] = None,
+        labels: Optional[List[str]] = None,
+        exclude_labels: Optional[List[str]] = None,
+        senders: Optional[List[str]] = None
+    ):
+        count = self.meta['count']
+        cols = {name: column[:count] for name, column in self.columns.items()}
+        mask = cols['live'].copy()
+        if after is not None:
+            mask &= cols['date'] >= int(after * 1000)
+        if before is not None:
+            mask &= cols['date'] < int(before * 1000)
+        for label_id in labels or []:
+            mask &= self._has_label(cols['labels'], label_id)
+        for label_id in exclude_labels or []:
+            mask &= ~self._has_label(cols['labels'], label_id)
+        if senders:
+            wanted = [code for sender, code in self._sender_codes.items() if any(s.lower() in sender for s in senders)]
+            mask &= np.isin(cols['sender'], wanted)
+        return cols, mask
+
+    def _has_label(self, label_words, label_id: str):
+        bit = self._label_bits.get(label_id)
+        if bit is None:
+            return np.zeros(len(label_words), dtype=bool)
+        return (label_words[:, bit // 64] & np.uint64(1 << (bit % 64))) != 0
+
+    def query(
+        self,
+        group_by: Optional[str] = None,
+        after: Optional[float] = None,
+        before: Optional[float] = None,
+        labels: Optional[List[str]] = None,
+        exclude_labels: Optional[List[str]] = None,
+        senders: Optional[List[str]] = None,
+        order_by: str = 'messages',
+        top: int = 20
+    ) -> Dict[str, Any]:
+        if group_by is not None and group_by not in GROUP_BYS:
+            raise ValueError(f"Unknown group_by: {group_by}")
+        with self._lock:
+            cols, mask = self._filter(after, before, labels, exclude_labels, senders)
+            sizes = cols['size'][mask]
+            result: Dict[str, Any] = {'messages': int(mask.sum()), 'bytes': int(sizes.sum())}
+            if group_by is None:
+                return result
+
+            if group_by == 'label':
+                keys = list(self._label_bits)
+                counts = np.array([int((mask & self._has_label(cols['labels'], key)).sum()) for key in keys])
+                totals = np.array([int(cols['size'][mask & self._has_label(cols['labels'], key)].sum()) for key in keys])
+            elif group_by == 'sender':
+                keys = list(self._sender_codes)
+                codes = cols['sender'][mask]
+                counts = np.bincount(codes, minlength=len(keys))
+                totals = np.bincount(codes, weights=sizes, minlength=len(keys))
+            else:
+                if group_by == 'thread':
+                    values = cols['thread'][mask]
+                else:
+                    unit = 'Y' if group_by == 'year' else 'M'
+                    values = cols['date'][mask].astype('datetime64[ms]').astype(f'datetime64[{unit}]')
+                uniques, inverse = np.unique(values, return_inverse=True)
+                counts = np.bincount(inverse, minlength=len(uniques))
+                totals = np.bincount(inverse, weights=sizes, minlength=len(uniques))
+                keys = [decode_id(int(value)) for value in uniques] if group_by == 'thread' else [str(value) for value in uniques]
+
+            ranking = counts if order_by == 'messages' else totals
+            if group_by in ('year', 'month'):
+                order = range(len(keys))
+            else:
+                order = [index for index in np.argsort(-ranking, kind='stable')[:top] if counts[index]]
+            result['groups'] = [
+                {'key': keys[index], 'messages': int(counts[index]), 'bytes': int(totals[index])}
+                for index in order
+            ]
+            return result
+
+
+_default_store: Optional[MetadataStore] = None
+_default_lock = threading.Lock()
+
+
+def default_store() -> MetadataStore:
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = MetadataStore()
+        return _default_store
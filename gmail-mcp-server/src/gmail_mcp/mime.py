@@ -0,0 +1,120 @@
+import base64
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesParser
+from typing import Any, Dict, List, Optional
+
+from .html_text import html_to_text
+
+
+CONTENT_HEADERS = ('from', 'to', 'subject', 'date', 'cc', 'bcc')
+
+# Below this many messages the round trip to a worker costs more than parsing
+MIN_POOL_BATCH = 8
+
+_parser = BytesParser(policy=policy.default)
+
+
+def _decode_text(part: EmailMessage) -> str:
+    try:
+        return part.get_content()
+    except (LookupError, UnicodeError, AssertionError):
+        # Unknown or lying charset; fall back to what _extract_body does
+        return (part.get_payload(decode=True) or b'').decode('utf-8', errors='ignore')
+
+
+def _walk(part: EmailMessage, part_id: str, body: Dict[str, Optional[str]], attachments: List[Dict[str, Any]]) -> None:
+    if part.is_multipart():
+        for index, child in enumerate(part.get_payload()):
+            _walk(child, f'{part_id}.{index}' if part_id else str(index), body, attachments)
+        return
+
+    filename = part.get_filename()
+    if filename:
+        attachments.append({
+            'filename': filename,
+            'mimeType': part.get_content_type(),
+            'size': len(part.get_payload(decode=True) or b''),
+            # Raw messages carry no attachment ids; Gmail only issues them in
+            # format=full responses. partId is numbered the way Gmail numbers
+            # parts, so it finds the attachmentId in a format=full fetch.
+            'attachmentId': None,
+            'partId': part_id or '0',
+        })
+        return
+
+    content_type = part.get_content_type()
+    if content_type == 'text/plain' and body['text'] is None:
+        body['text'] = _decode_text(part)
+    elif content_type == 'text/html' and body['html'] is None:
+        body['html'] = _decode_text(part)
+
+
+def parse_raw_message(message: Dict[str, Any], include_html: bool = True) -> Dict[str, Any]:
+    raw = message['raw']
+    parsed = _parser.parsebytes(base64.urlsafe_b64decode(raw + '=' * (-len(raw) % 4)))
+
+    headers = {}
+    for name in CONTENT_HEADERS:
+        value = parsed.get(name)
+        if value is not None:
+            headers[name] = str(value)
+
+    body: Dict[str, Optional[str]] = {'text': None, 'html': None}
+    attachments: List[Dict[str, Any]] = []
+    _walk(parsed, '', body, attachments)
+    if body['text'] is None and body['html']:
+        body['text'] = html_to_text(body['html'])
+    if not include_html:
+        del body['html']
+
+    return {
+        'id': message['id'],
+        'threadId': message.get('threadId'),
+        'labelIds': message.get('labelIds', []),
+        'snippet': message.get('snippet'),
+        'headers': headers,
+        'body': body,
+        'attachments': attachments
+    }
+
+
+def _parse_chunk(messages: List[Dict[str, Any]], include_html: bool) -> List[Dict[str, Any]]:
+    return [parse_raw_message(message, include_html) for message in messages]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def pool_context() -> multiprocessing.context.BaseContext:
+    # Forking a process that runs an event loop and HTTP client threads can
+    # copy held locks into the child, so workers start from a clean interpreter
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=pool_context())
+        return _pool
+
+
+def parse_raw_messages(messages: List[Dict[str, Any]], include_html: bool = True) -> List[Dict[str, Any]]:
+    # MIME decoding and HTML conversion are CPU bound, so they run in a shared
+    # process pool instead of holding the GIL in the server process.
+    workers = os.cpu_count() or 1
+    if workers <= 1 or len(messages) < MIN_POOL_BATCH:
+        return _parse_chunk(messages, include_html)
+    size = -(-len(messages) // workers)
+    chunks = [messages[start:start + size] for start in range(0, len(messages), size)]
+    results: List[Dict[str, Any]] = []
+    for parsed in _executor().map(_parse_chunk, chunks, [include_html] * len(chunks)):
+        results.extend(parsed)
+    return results
@@ -0,0 +1,139 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .gmail_client import GmailClient
+from .ids import IdSet
+from .mailmerge import RateLimiter
+
+
+# Gmail opened in April 2004; anything older was imported and is usually sparse
+GMAIL_EPOCH = 1080777600
+PAGE_SIZE = 500
+
+# Slices whose resultSizeEstimate exceeds this are split; smaller ones are paged
+DEFAULT_SLICE_SIZE = 5000
+MAX_SPLIT = 16
+MIN_SLICE_SECONDS = 3600
+
+# messages.list costs 5 units; 40 calls a second stays under the 250 unit quota
+DEFAULT_CALLS_PER_SECOND = 40.0
+
+# The last slice has no upper bound, so mail dated in the future is listed too
+Slice = Tuple[int, Optional[int]]
+
+
+class PartitionedEnumerator:
+    # Page tokens make one listing strictly sequential, so the query is cut
+    # into after:/before: time slices that are listed side by side.
+    def __init__(
+        self,
+        client: GmailClient,
+        query: str = "",
+        label_ids: Optional[List[str]] = None,
+        include_spam_trash: bool = False,
+        concurrency: int = 8,
+        slice_size: int = DEFAULT_SLICE_SIZE,
+        calls_per_second: float = DEFAULT_CALLS_PER_SECOND,
+        cancel_event: Optional[threading.Event] = None
+    ):
+        self.client = client
+        self.query = query
+        self.label_ids = label_ids
+        self.include_spam_trash = include_spam_trash
+        self.concurrency = max(1, concurrency)
+        self.slice_size = slice_size
+        self.limiter = RateLimiter(calls_per_second, burst=self.concurrency)
+        self.cancel_event = cancel_event or threading.Event()
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {'listed': 0, 'duplicates': 0, 'calls': 0, 'slices': 0, 'splits': 0}
+
+    def _slice_query(self, start: int, end: Optional[int]) -> str:
+        # One second of overlap on each side; the merge drops the duplicates
+        bounds = []
+        if start > 0:
+            bounds.append(f'after:{start - 1}')
+        if end is not None:
+            bounds.append(f'before:{end + 1}')
+        return ' '.join([self.query] + bounds).strip()
+
+    def _stopped(self) -> bool:
+        return self.cancel_event.is_set() or self._closed.is_set()
+
+    @staticmethod
+    def _upper(end: Optional[int]) -> int:
+        return int(time.time()) + 86400 if end is None else end
+
+    def _split(self, start: int, end: Optional[int], estimate: int) -> List[Slice]:
+        upper = self._upper(end)
+        parts = min(MAX_SPLIT, -(-estimate // self.slice_size))
+        step = max(MIN_SLICE_SECONDS, -(-(upper - start) // parts))
+        slices: List[Slice] = [(lower, min(lower + step, upper)) for lower in range(start, upper, step)]
+        # An open-ended slice stays open-ended in its last part
+        slices[-1] = (slices[-1][0], end)
+        return slices
+
+    def _scan(self, start: int, end: Optional[int]) -> Tuple[List[str], List[Slice]]:
+        query = self._slice_query(start, end)
+        message_ids: List[str] = []
+        page_token = None
+        first = True
+        while not self._stopped():
+            self.limiter.acquire()
+            result = self.client.list_messages(
+                query=query,
+                max_results=PAGE_SIZE,
+                page_token=page_token,
+                label_ids=self.label_ids,
+                include_spam_trash=self.include_spam_trash
+            )
+            with self._lock:
+                self.stats['calls'] += 1
+            message_ids.extend(message['id'] for message in result.get('messages', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                break
+            estimate = result.get('resultSizeEstimate', 0)
+            if first and estimate > self.slice_size and self._upper(end) - start > MIN_SLICE_SECONDS:
+                # Too big to page alone; the ids already fetched are kept and
+                # the overlap with the sub-slices is deduplicated.
+                with self._lock:
+                    self.stats['splits'] += 1
+                return message_ids, self._split(start, end, estimate)
+            first = False
+        return message_ids, []
+
+    def iter_ids(self, progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Iterator[str]:
+        seen = IdSet()
+        initial: List[Slice] = [(0, GMAIL_EPOCH), (GMAIL_EPOCH, None)]
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='gmail-partition')
+        try:
+            pending = {pool.submit(self._scan, start, end) for start, end in initial}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    message_ids, children = future.result()
+                    self.stats['slices'] += 1
+                    if not self._stopped():
+                        pending.update(pool.submit(self._scan, start, end) for start, end in children)
+                    for message_id in message_ids:
+                        if message_id in seen:
+                            self.stats['duplicates'] += 1
+                            continue
+                        seen.add(message_id)
+                        self.stats['listed'] += 1
+                        yield message_id
+                    if progress:
+                        progress(self.status())
+        finally:
+            # Also reached when the caller stops iterating early
+            self._closed.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def run(self, progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> IdSet:
+        return IdSet(self.iter_ids(progress))
+
+    def status(self) -> Dict[str, Any]:
+        return {**self.stats, 'cancelled': self.cancel_event.is_set()}
@@ -0,0 +1,322 @@
+import asyncio
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from .gmail_client import BATCH_SIZE, GmailClient
+from .mime import parse_raw_messages
+from .query import MessageFilter
+
+
+Item = Union[str, Dict[str, Any]]
+Predicate = Callable[[Dict[str, Any]], bool]
+
+_DONE = object()
+
+
+def _item_id(item: Item) -> str:
+    return item if isinstance(item, str) else item['id']
+
+
+class _Stage:
+    def __init__(self, name: str, concurrency: int, run: Callable[..., Awaitable[None]]):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.run = run
+
+
+class Pipeline:
+    def __init__(self, client: GmailClient, queue_size: int = 200):
+        self.client = client
+        self.queue_size = queue_size
+        self._source: Optional[_Stage] = None
+        self._stages: List[_Stage] = []
+        self._action: Optional[_Stage] = None
+        self._limit: Optional[int] = None
+        self._local_filter: Optional[MessageFilter] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._progress: Optional[Callable[[Dict[str, int]], None]] = None
+        self.stats: Counter = Counter()
+        self.errors: Dict[str, str] = {}
+        self.items: List[Item] = []
+
+    # Sources
+
+    def enumerate(
+        self,
+        query: Union[str, MessageFilter] = "",
+        label_ids: Optional[List[str]] = None,
+        include_spam_trash: bool = False,
+        max_results: Optional[int] = None,
+        page_size: int = 500
+    ) -> 'Pipeline':
+        # Structured filters are pushed down into the Gmail query; whatever Gmail
+        # cannot express is checked by the fetch stage before anything else runs.
+        if isinstance(query, MessageFilter):
+            self._local_filter = query
+            query = query.to_query()
+        else:
+            self._local_filter = None
+
+        async def run(inbox, outbox):
+            page_token = None
+            remaining = max_results
+            while not self._stop.is_set() and (remaining is None or remaining > 0):
+                result = await asyncio.to_thread(
+                    self.client.list_messages,
+                    query=query,
+                    max_results=page_size if remaining is None else min(page_size, remaining),
+                    page_token=page_token,
+                    label_ids=label_ids,
+                    include_spam_trash=include_spam_trash
+                )
+                messages = result.get('messages', [])
+                for message in messages:
+                    self.stats['enumerated'] += 1
+                    await outbox.put(message['id'])
+                if remaining is not None:
+                    remaining -= len(messages)
+                self._report()
+                page_token = result.get('nextPageToken')
+                if not page_token:
+                    break
+
+        self._source = _Stage('enumerate', 1, run)
+        return self
+
+    def ids(self, message_ids: List[str]) -> 'Pipeline':
+        self._local_filter = None
+
+        async def run(inbox, outbox):
+            for message_id in message_ids:
+                if self._stop.is_set():
+                    break
+                self.stats['enumerated'] += 1
+                await outbox.put(message_id)
+
+        self._source = _Stage('ids', 1, run)
+        return self
+
+    # Transforms
+
+    def fetch(
+        self,
+        format: str = 'metadata',
+        metadata_headers: Optional[List[str]] = None,
+        batch_size: int = BATCH_SIZE,
+        concurrency: int = 4,
+        parse: bool = False
+    ) -> 'Pipeline':
+        async def run(inbox, outbox):
+            fetch_format, headers = format, metadata_headers
+            local = self._local_filter.local_predicate() if self._local_filter else None
+            if local is not None:
+                if self._local_filter.needs_body and fetch_format in ('minimal', 'metadata'):
+                    fetch_format = 'full'
+                elif fetch_format == 'minimal':
+                    fetch_format = 'metadata'
+                if fetch_format == 'metadata' and headers:
+                    headers = sorted(set(headers) | set(self._local_filter.metadata_headers))
+
+            while True:
+                chunk, done = await self._take(inbox, batch_size)
+                if chunk:
+                    result = await asyncio.to_thread(
+                        self.client.get_messages_batch,
+                        [_item_id(item) for item in chunk],
+                        format=fetch_format,
+                        metadata_headers=headers
+                    )
+                    self.errors.update(result['errors'])
+                    messages = result['messages']
+                    contents = None
+                    if fetch_format == 'raw' and (parse or local is not None):
+                        # MIME parsing happens in worker processes, off the event loop
+                        contents = await asyncio.to_thread(parse_raw_messages, messages)
+                    for index, message in enumerate(messages):
+                        self.stats['fetched'] += 1
+                        content = contents[index] if contents is not None else None
+                        # Headers come from the API resource, which has all of
+                        # them; parsed content only adds the decoded body
+                        if local is not None and not local(message if content is None else {**message, 'body': content['body']}):
+                            continue
+                        if parse:
+                            message = content or GmailClient.parse_message_content(message)
+                        await outbox.put(message)
+                    self._report()
+                if done:
+                    break
+
+        self._stages.append(_Stage('fetch', concurrency, run))
+        return self
+
+    def filter(self, predicate: Predicate, concurrency: int = 1) -> 'Pipeline':
+        async def run(inbox, outbox):
+            while True:
+                item = await inbox.get()
+                if item is _DONE:
+                    await inbox.put(_DONE)
+                    break
+                # Cheap predicates stay on the loop; heavier ones get worker threads
+                matched = predicate(item) if concurrency == 1 else await asyncio.to_thread(predicate, item)
+                if matched:
+                    self.stats['matched'] += 1
+                    await outbox.put(item)
+
+        self._stages.append(_Stage('filter', concurrency, run))
+        return self
+
+    def limit(self, count: int) -> 'Pipeline':
+        self._limit = count
+        return self
+
+    # Actions
+
+    def collect(self) -> 'Pipeline':
+        async def run(inbox, outbox):
+            while True:
+                item = await inbox.get()
+                if item is _DONE:
+                    await inbox.put(_DONE)
+                    break
+                if not self._accept():
+                    break
+                self.items.append(item)
+
+        self._action = _Stage('collect', 1, run)
+        return self
+
+    def label(
+        self,
+        add_labels: Optional[List[str]] = None,
+        remove_labels: Optional[List[str]] = None,
+        batch_size: int = 1000,
+        concurrency: int = 2
+    ) -> 'Pipeline':
+        def apply(message_ids):
+            self.client.batch_modify_messages(message_ids, add_labels=add_labels, remove_labels=remove_labels)
+            return {}
+
+        self._action = _Stage('label', concurrency, self._bulk_action(apply, batch_size))
+        return self
+
+    def trash(self, batch_size: int = BATCH_SIZE, concurrency: int = 2) -> 'Pipeline':
+        def apply(message_ids):
+            return self.client.batch_trash_messages(message_ids)['errors']
+
+        self._action = _Stage('trash', concurrency, self._bulk_action(apply, batch_size))
+        return self
+
+    def _bulk_action(self, apply: Callable[[List[str]], Dict[str, str]], batch_size: int):
+        async def run(inbox, outbox):
+            while True:
+                chunk, done = await self._take(inbox, batch_size)
+                accepted = [item for item in chunk if self._accept()]
+                if accepted:
+                    message_ids = [_item_id(item) for item in accepted]
+                    try:
+                        errors = await asyncio.to_thread(apply, message_ids)
+                    except Exception as e:
+                        errors = {message_id: str(e) for message_id in message_ids}
+                    self.errors.update(errors)
+                    self.items.extend(item for item in accepted if _item_id(item) not in errors)
+                if done or len(accepted) < len(chunk):
+                    break
+
+        return run
+
+    # Execution
+
+    def _accept(self) -> bool:
+        if self._limit is not None and self.stats['processed'] >= self._limit:
+            self._stop.set()
+            return False
+        self.stats['processed'] += 1
+        if self._limit is not None and self.stats['processed'] >= self._limit:
+            self._stop.set()
+        return True
+
+    def _report(self) -> None:
+        if self._progress is not None:
+            self._progress(dict(self.stats))
+
+    def cancel(self) -> None:
+        # Safe to call from any thread; sources stop and the queues drain
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    async def _take(self, inbox: asyncio.Queue, size: int):
+        chunk = []
+        while len(chunk) < size:
+            item = await inbox.get()
+            if item is _DONE:
+                await inbox.put(_DONE)
+                return chunk, True
+            chunk.append(item)
+        return chunk, False
+
+    async def _run_stage(self, stage: _Stage, inbox: Optional[asyncio.Queue], outbox: Optional[asyncio.Queue]):
+        workers = [asyncio.create_task(stage.run(inbox, outbox)) for _ in range(stage.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except asyncio.CancelledError:
+            # Only happens once the action stage has returned; nobody is
+            # left downstream to hear about it.
+            raise
+        except Exception:
+            for worker in workers:
+                worker.cancel()
+            if outbox is not None:
+                await outbox.put(_DONE)
+            raise
+        if outbox is not None:
+            await outbox.put(_DONE)
+
+    async def run(self, progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, Any]:
+        if self._source is None:
+            raise ValueError("Pipeline needs a source: call enumerate() or ids() first")
+        if self._action is None:
+            self.collect()
+        if self._local_filter is not None and self._local_filter.local_predicate() is not None:
+            if not any(stage.name == 'fetch' for stage in self._stages):
+                self.fetch(format=self._local_filter.fetch_format, metadata_headers=self._local_filter.metadata_headers or None)
+                self._stages.insert(0, self._stages.pop())
+
+        self._stop = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._progress = progress
+        self.stats.clear()
+        self.errors.clear()
+        self.items = []
+
+        stages = [self._source] + self._stages + [self._action]
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in stages[1:]]
+        tasks = [
+            asyncio.create_task(self._run_stage(
+                stage,
+                queues[index - 1] if index > 0 else None,
+                queues[index] if index < len(queues) else None
+            ))
+            for index, stage in enumerate(stages)
+        ]
+
+        # The action stage finishes first when a limit is hit; upstream stages
+        # may be blocked on full queues, so cancel them instead of draining.
+        try:
+            await tasks[-1]
+        finally:
+            for task in tasks[:-1]:
+                task.cancel()
+            await asyncio.gather(*tasks[:-1], return_exceptions=True)
+            for task in tasks[:-1]:
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+
+        return {
+            'items': self.items,
+            'stats': dict(self.stats),
+            'errors': dict(self.errors)
+        }
+
+    def run_sync(self, progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, Any]:
+        return asyncio.run(self.run(progress))
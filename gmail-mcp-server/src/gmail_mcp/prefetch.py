@@ -0,0 +1,185 @@
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+
+DEFAULT_DEPTH = 10
+DEFAULT_TTL = 120.0
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+# Quota units per call; users get 15000 a minute, prefetching may spend a fifth
+QUOTA_COSTS = {'message': 5, 'thread': 10}
+DEFAULT_QUOTA_PER_MINUTE = 3000
+
+# A read for an id whose prefetch is still in flight waits this long for it,
+# then fetches directly rather than queueing behind the whole batch
+PENDING_WAIT = 0.25
+
+# A prefetched item of the key's format can also serve reads of these formats
+SERVES = {'full': ('full', 'metadata'), 'metadata': ('metadata',)}
+
+Key = Tuple[str, str, str]
+
+
+class _Entry:
+    def __init__(self, rank: int):
+        self.rank = rank
+        self.ready = threading.Event()
+        self.value: Optional[Dict[str, Any]] = None
+        self.size = 0
+        self.expires = float('inf')
+        self.taken = False
+        self.stale = False
+
+
+class Prefetcher:
+    def __init__(
+        self,
+        client,
+        depth: int = DEFAULT_DEPTH,
+        bodies: bool = True,
+        ttl: float = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        quota_per_minute: int = DEFAULT_QUOTA_PER_MINUTE
+    ):
+        self.client = client
+        self.depth = depth
+        self.bodies = bodies
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.quota_per_minute = quota_per_minute
+        self._entries: 'OrderedDict[Key, _Entry]' = OrderedDict()
+        self._spent: deque = deque()
+        self._lock = threading.Lock()
+        # One worker: a prefetch must never compete with the reads it serves
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gmail-prefetch')
+        self.bytes = 0
+        self.counts = {'scheduled': 0, 'fetched': 0, 'hits': 0, 'misses': 0, 'unused': 0, 'over_quota': 0}
+        self.hits_by_rank = [0] * depth
+
+    @property
+    def format(self) -> str:
+        return 'full' if self.bodies else 'metadata'
+
+    def _quota_left(self, now: float) -> int:
+        while self._spent and self._spent[0][0] <= now - 60:
+            self._spent.popleft()
+        return self.quota_per_minute - sum(units for _, units in self._spent)
+
+    def _drop(self, key: Key, unused: bool) -> None:
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        if unused and entry.value is not None:
+            self.counts['unused'] += 1
+
+    def _expire(self, now: float) -> None:
+        for key in [key for key, entry in self._entries.items() if entry.expires <= now]:
+            self._drop(key, unused=True)
+        # Oldest first until the cache fits its memory budget again
+        while self.bytes > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)), unused=True)
+
+    def schedule(self, kind: str, item_ids: List[str]) -> int:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            wanted = [
+                (rank, (kind, item_id, self.format))
+                for rank, item_id in enumerate(list(dict.fromkeys(item_ids))[:self.depth])
+            ]
+            wanted = [(rank, key) for rank, key in wanted if key not in self._entries]
+            affordable = max(0, self._quota_left(now)) // QUOTA_COSTS[kind]
+            if len(wanted) > affordable:
+                self.counts['over_quota'] += len(wanted) - affordable
+                wanted = wanted[:affordable]
+            if not wanted:
+                return 0
+            self._spent.append((now, len(wanted) * QUOTA_COSTS[kind]))
+            batch = []
+            for rank, key in wanted:
+                entry = self._entries[key] = _Entry(rank)
+                batch.append((key, entry))
+            self.counts['scheduled'] += len(batch)
+        self._pool.submit(self._fetch, kind, batch)
+        return len(batch)
+
+    def _fetch(self, kind: str, batch: List[Tuple[Key, _Entry]]) -> None:
+        item_ids = [key[1] for key, _ in batch]
+        try:
+            if kind == 'message':
+                found = {m['id']: m for m in self.client.get_messages_batch(item_ids, format=self.format)['messages']}
+            else:
+                found = {t['id']: t for t in self.client.get_threads_batch(item_ids, format=self.format)['threads']}
+        except Exception:
+            found = {}
+
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, entry in batch:
+                entry.value = found.get(key[1])
+                entry.expires = expires
+                if self._entries.get(key) is not entry:
+                    continue
+                if entry.value is None:
+                    del self._entries[key]
+                    continue
+                entry.size = len(json.dumps(entry.value, separators=(',', ':')))
+                self.bytes += entry.size
+                self.counts['fetched'] += 1
+            self._expire(time.monotonic())
+        for _, entry in batch:
+            entry.ready.set()
+
+    def _lookup(self, kind: str, item_id: str, format: str) -> Tuple[Optional[Key], Optional[_Entry]]:
+        for stored in SERVES:
+            key = (kind, item_id, stored)
+            if format in SERVES[stored] and key in self._entries:
+                return key, self._entries[key]
+        return None, None
+
+    def take(self, kind: str, item_id: str, format: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            key, entry = self._lookup(kind, item_id, format)
+        if entry is None or not entry.ready.wait(PENDING_WAIT):
+            with self._lock:
+                self.counts['misses'] += 1
+            return None
+        with self._lock:
+            if entry.taken or entry.stale or entry.value is None or entry.expires <= time.monotonic():
+                self.counts['misses'] += 1
+                return None
+            # Each prefetched item serves one read; repeats go upstream
+            entry.taken = True
+            if self._entries.get(key) is entry:
+                self._drop(key, unused=False)
+            self.counts['hits'] += 1
+            if entry.rank < len(self.hits_by_rank):
+                self.hits_by_rank[entry.rank] += 1
+            return entry.value
+
+    def clear(self) -> None:
+        # Called after writes; anything prefetched before may be out of date
+        with self._lock:
+            for entry in self._entries.values():
+                entry.stale = True
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+            reads = counts['hits'] + counts['misses']
+            return {
+                'depth': self.depth,
+                'format': self.format,
+                **counts,
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                # Share of reads served from the cache, and of prefetches that got used
+                'hit_rate': round(counts['hits'] / reads, 3) if reads else None,
+                'precision': round(counts['hits'] / counts['fetched'], 3) if counts['fetched'] else None,
+                'hits_by_rank': list(self.hits_by_rank),
+            }
@@ -0,0 +1,177 @@
+import base64
+import re
+from datetime import date, datetime
+from email import policy
+from email.parser import BytesHeaderParser
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from .gmail_client import GmailClient
+from .mime import parse_raw_message
+
+
+_BARE_VALUE = re.compile(r'^[^\s"(){}]+$')
+_header_parser = BytesHeaderParser(policy=policy.default)
+
+
+def _quote(value: str) -> str:
+    if _BARE_VALUE.match(value):
+        return value
+    return '"' + value.replace('"', '') + '"'
+
+
+def _label_term(name: str) -> str:
+    # Gmail search spells spaces and slashes in label names as dashes
+    return re.sub(r'[\s/]+', '-', name.strip())
+
+
+def _date_term(value: Union[date, datetime]) -> str:
+    if isinstance(value, datetime):
+        # Epoch seconds keep the time of day; YYYY/MM/DD would round to midnight PST
+        return str(int(value.timestamp()))
+    return value.strftime('%Y/%m/%d')
+
+
+def _any_of(terms: List[str]) -> str:
+    if len(terms) == 1:
+        return terms[0]
+    return '{' + ' '.join(terms) + '}'
+
+
+def _headers(message: Dict[str, Any]) -> Dict[str, str]:
+    # Every header of an API resource; parsed content keeps only a few, so
+    # it is the last resort
+    if 'payload' in message:
+        return {
+            header['name'].lower(): header['value']
+            for header in message['payload'].get('headers', [])
+        }
+    if 'raw' in message:
+        raw = message['raw']
+        parsed = _header_parser.parsebytes(base64.urlsafe_b64decode(raw + '=' * (-len(raw) % 4)))
+        return {name.lower(): str(value) for name, value in parsed.items()}
+    if isinstance(message.get('headers'), dict):
+        return message['headers']
+    return {}
+
+
+def _body_text(message: Dict[str, Any]) -> str:
+    body = message.get('body') if isinstance(message.get('body'), dict) else None
+    if body is None:
+        parse = parse_raw_message if 'raw' in message else GmailClient.parse_message_content
+        body = parse(message)['body'] or {}
+    return body.get('text') or body.get('html') or ''
+
+
+class MessageFilter(BaseModel):
+    model_config = ConfigDict(extra='forbid', populate_by_name=True)
+
+    # Predicates Gmail evaluates server-side
+    from_: List[str] = Field(default_factory=list, alias='from', description="Sender addresses or domains (any of)")
+    to: List[str] = Field(default_factory=list, description="To recipients (any of)")
+    cc: List[str] = Field(default_factory=list, description="Cc recipients (any of)")
+    bcc: List[str] = Field(default_factory=list, description="Bcc recipients (any of)")
+    participants: List[str] = Field(default_factory=list, description="Addresses appearing as sender or recipient (any of)")
+    subject: List[str] = Field(default_factory=list, description="Words or phrases in the subject (all of)")
+    words: List[str] = Field(default_factory=list, description="Words or phrases anywhere in the message (all of)")
+    after: Optional[Union[datetime, date]] = Field(None, description="Only messages received after this date")
+    before: Optional[Union[datetime, date]] = Field(None, description="Only messages received before this date")
+    newer_than: Optional[str] = Field(None, pattern=r'^\d+[dmy]$', description="Relative age, e.g. '7d', '6m', '2y'")
+    older_than: Optional[str] = Field(None, pattern=r'^\d+[dmy]$', description="Relative age, e.g. '7d', '6m', '2y'")
+    labels: List[str] = Field(default_factory=list, description="Label names the message must carry (all of)")
+    exclude_labels: List[str] = Field(default_factory=list, description="Label names the message must not carry")
+    has_attachment: Optional[bool] = Field(None, description="Require (true) or exclude (false) attachments")
+    filename: Optional[str] = Field(None, description="Attachment file name or extension")
+    larger: Optional[int] = Field(None, ge=0, description="Minimum size in bytes")
+    smaller: Optional[int] = Field(None, ge=0, description="Maximum size in bytes")
+    is_: List[str] = Field(default_factory=list, alias='is', description="Gmail is: flags such as unread, starred, important")
+    raw: Optional[str] = Field(None, description="Extra Gmail search syntax appended as-is")
+
+    # Predicates Gmail cannot express; checked locally after fetching
+    subject_pattern: Optional[str] = Field(None, description="Regular expression the subject must match")
+    body_pattern: Optional[str] = Field(None, description="Regular expression the body must match")
+    header_equals: Dict[str, str] = Field(default_factory=dict, description="Headers that must equal these values (case-insensitive)")
+
+    def to_query(self) -> str:
+        terms: List[str] = []
+
+        for operator, values in (('from', self.from_), ('to', self.to), ('cc', self.cc), ('bcc', self.bcc)):
+            if values:
+                terms.append(_any_of([f'{operator}:{_quote(value)}' for value in values]))
+        if self.participants:
+            terms.append(_any_of([
+                f'{operator}:{_quote(address)}'
+                for address in self.participants
+                for operator in ('from', 'to', 'cc', 'bcc')
+            ]))
+
+        terms.extend(f'subject:{_quote(value)}' for value in self.subject)
+        terms.extend(_quote(value) for value in self.words)
+
+        if self.after is not None:
+            terms.append(f'after:{_date_term(self.after)}')
+        if self.before is not None:
+            terms.append(f'before:{_date_term(self.before)}')
+        if self.newer_than:
+            terms.append(f'newer_than:{self.newer_than}')
+        if self.older_than:
+            terms.append(f'older_than:{self.older_than}')
+
+        terms.extend(f'label:{_label_term(name)}' for name in self.labels)
+        terms.extend(f'-label:{_label_term(name)}' for name in self.exclude_labels)
+
+        if self.has_attachment is True:
+            terms.append('has:attachment')
+        elif self.has_attachment is False:
+            terms.append('-has:attachment')
+        if self.filename:
+            terms.append(f'filename:{_quote(self.filename)}')
+        if self.larger is not None:
+            terms.append(f'larger:{self.larger}')
+        if self.smaller is not None:
+            terms.append(f'smaller:{self.smaller}')
+
+        terms.extend(f'is:{flag}' for flag in self.is_)
+        if self.raw:
+            terms.append(self.raw)
+
+        return ' '.join(terms)
+
+    @property
+    def needs_body(self) -> bool:
+        return self.body_pattern is not None
+
+    @property
+    def fetch_format(self) -> str:
+        return 'full' if self.needs_body else 'metadata'
+
+    @property
+    def metadata_headers(self) -> List[str]:
+        headers = {'Subject'} if self.subject_pattern else set()
+        headers.update(name.title() for name in self.header_equals)
+        return sorted(headers)
+
+    def local_predicate(self) -> Optional[Callable[[Dict[str, Any]], bool]]:
+        # Each check gets the message and its headers, extracted once
+        checks: List[Callable[[Dict[str, Any], Dict[str, str]], bool]] = []
+
+        if self.subject_pattern:
+            subject_re = re.compile(self.subject_pattern, re.IGNORECASE)
+            checks.append(lambda m, headers: bool(subject_re.search(headers.get('subject', ''))))
+        if self.header_equals:
+            expected = {name.lower(): value.strip().lower() for name, value in self.header_equals.items()}
+            checks.append(lambda m, headers: all(
+                headers.get(name, '').strip().lower() == value for name, value in expected.items()
+            ))
+        if self.body_pattern:
+            body_re = re.compile(self.body_pattern, re.IGNORECASE)
+            checks.append(lambda m, headers: bool(body_re.search(_body_text(m))))
+
+        if not checks:
+            return None
+
+        def predicate(message: Dict[str, Any]) -> bool:
+            headers = _headers(message)
+            return all(check(message, headers) for check in checks)
+        return predicate
@@ -0,0 +1,160 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote, urlparse
+
+from mcp.server.lowlevel.helper_types import ReadResourceContents
+from mcp.types import ResourceTemplate
+
+from .gmail_client import GmailClient
+from .mime import CONTENT_HEADERS
+
+
+SCHEME = 'gmail'
+
+# Bodies longer than this are cut in tool results; the message resource has them whole
+INLINE_BODY_CHARS = 20000
+
+# Attachment types seen in tool results, so reading one needs no extra lookup
+MAX_KNOWN_ATTACHMENTS = 10000
+
+TEMPLATES = [
+    ResourceTemplate(
+        name='gmail-message',
+        uriTemplate='gmail://message/{message_id}',
+        description="Parsed message: headers, full text and HTML bodies, attachment list with resource URIs",
+        mimeType='application/json',
+    ),
+    ResourceTemplate(
+        name='gmail-thread',
+        uriTemplate='gmail://thread/{thread_id}',
+        description="Every message of a thread, parsed like gmail://message",
+        mimeType='application/json',
+    ),
+    ResourceTemplate(
+        name='gmail-attachment',
+        uriTemplate='gmail://attachment/{message_id}/{attachment_id}',
+        description="Attachment bytes, downloaded on first read and cached locally",
+    ),
+]
+
+_known: 'OrderedDict[Tuple[str, str], Dict[str, Any]]' = OrderedDict()
+_known_lock = threading.Lock()
+
+
+def message_uri(message_id: str) -> str:
+    return f'{SCHEME}://message/{quote(message_id, safe="")}'
+
+
+def thread_uri(thread_id: str) -> str:
+    return f'{SCHEME}://thread/{quote(thread_id, safe="")}'
+
+
+def attachment_uri(message_id: str, attachment_id: str) -> str:
+    return f'{SCHEME}://attachment/{quote(message_id, safe="")}/{quote(attachment_id, safe="")}'
+
+
+def parse_uri(uri: str) -> Tuple[str, List[str]]:
+    parsed = urlparse(uri)
+    parts = [unquote(part) for part in parsed.path.split('/') if part]
+    arity = {'message': 1, 'thread': 1, 'attachment': 2}
+    if parsed.scheme != SCHEME or arity.get(parsed.netloc) != len(parts):
+        raise ValueError(f"Unknown resource: {uri}")
+    return parsed.netloc, parts
+
+
+def link_content(content: Dict[str, Any], max_body_chars: Optional[int] = None) -> Dict[str, Any]:
+    # Adds resource URIs to parsed message content and, given a limit, cuts
+    # long bodies so the full text is only transferred when someone reads it
+    message_id = content['id']
+    content['uri'] = message_uri(message_id)
+    for attachment in content.get('attachments', []):
+        if not attachment.get('attachmentId'):
+            continue
+        attachment['uri'] = attachment_uri(message_id, attachment['attachmentId'])
+        with _known_lock:
+            _known[(message_id, attachment['attachmentId'])] = {
+                'mimeType': attachment.get('mimeType'),
+                'filename': attachment.get('filename'),
+            }
+            while len(_known) > MAX_KNOWN_ATTACHMENTS:
+                _known.popitem(last=False)
+
+    body = content.get('body') or {}
+    if max_body_chars:
+        for name in ('text', 'html'):
+            value = body.get(name)
+            if value and len(value) > max_body_chars:
+                body[name] = value[:max_body_chars]
+                body.setdefault('truncated', {})[name] = len(value)
+    return content
+
+
+def summarize_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    # A format=full message without its payload tree: headers and attachment
+    # links inline, the bodies behind the message URI
+    payload = message.get('payload', {})
+    content = {
+        'id': message['id'],
+        'threadId': message.get('threadId'),
+        'labelIds': message.get('labelIds', []),
+        'snippet': message.get('snippet'),
+        'internalDate': message.get('internalDate'),
+        'sizeEstimate': message.get('sizeEstimate'),
+        'headers': {
+            header['name'].lower(): header['value']
+            for header in payload.get('headers', [])
+            if header['name'].lower() in CONTENT_HEADERS
+        },
+        'attachments': GmailClient._extract_attachments_info(payload),
+    }
+    return link_content(content)
+
+
+def summarize_thread(thread: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'id': thread['id'],
+        'uri': thread_uri(thread['id']),
+        'messages': [summarize_message(message) for message in thread.get('messages', [])],
+    }
+
+
+def link_listing(result: Dict[str, Any]) -> Dict[str, Any]:
+    for message in result.get('messages', []):
+        message['uri'] = message_uri(message['id'])
+    for thread in result.get('threads', []):
+        thread['uri'] = thread_uri(thread['id'])
+    return result
+
+
+def _attachment_type(client: GmailClient, message_id: str, attachment_id: str) -> Optional[str]:
+    with _known_lock:
+        known = _known.get((message_id, attachment_id))
+    if known is not None:
+        return known['mimeType']
+    # Attachment ids are not stable across fetches, so this can miss
+    content = link_content(client.get_message_content(message_id))
+    for attachment in content['attachments']:
+        if attachment.get('attachmentId') == attachment_id:
+            return attachment.get('mimeType')
+    return None
+
+
+def read_resource(client: GmailClient, uri: str) -> List[ReadResourceContents]:
+    kind, parts = parse_uri(uri)
+    if kind == 'message':
+        content = link_content(client.get_message_content(parts[0], include_html=True))
+        return [ReadResourceContents(json.dumps(content, indent=2), 'application/json')]
+    if kind == 'thread':
+        thread = client.get_thread(parts[0])
+        messages = [
+            link_content(GmailClient.parse_message_content(message, include_html=True))
+            for message in thread.get('messages', [])
+        ]
+        content = {'id': thread['id'], 'uri': thread_uri(thread['id']), 'messages': messages}
+        return [ReadResourceContents(json.dumps(content, indent=2), 'application/json')]
+    message_id, attachment_id = parts
+    data = client.get_attachment(message_id, attachment_id)
+    mime_type = _attachment_type(client, message_id, attachment_id) or 'application/octet-stream'
+    return [ReadResourceContents(data, mime_type)]
@@ -0,0 +1,734 @@
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Type, Union
+
+from mcp.types import Tool
+from pydantic import BaseModel, ConfigDict, Field
+
+from .bulk import BulkJob
+from .dedupe import DEFAULT_THRESHOLD, DuplicateFinder
+from .export import MailboxExporter
+from .gmail_client import GmailClient
+from .html_text import text_cache
+from .importer import MailboxImporter
+from .mailmerge import DEFAULT_DAILY_LIMIT, MailMerge
+from .metastore import default_store
+from .pipeline import Pipeline
+from .query import MessageFilter
+from .resources import INLINE_BODY_CHARS, attachment_uri, link_content, link_listing, message_uri, summarize_message, summarize_thread
+
+
+# 'client' handlers take (client, args) and run in a worker thread.
+# 'job' handlers take (client, args, context) and run as background jobs.
+# 'server' handlers are coroutines taking (server, args) and never touch Gmail.
+Handler = Callable[..., Any]
+TOOL_KINDS = ('client', 'job', 'server')
+
+
+class ToolArgs(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+
+class BackgroundArgs(ToolArgs):
+    background: bool = Field(True, description="Return a job id immediately and keep working in the background; poll with gmail_job_status")
+
+
+def _clean_schema(node: Any, defs: Optional[Dict[str, Any]] = None) -> Any:
+    # Pydantic emits titles and `anyOf: [X, null]` for Optional fields; the MCP
+    # clients only need the plain JSON schema, so strip it back down once.
+    # Nested models are inlined because not every client resolves `$ref`.
+    if isinstance(node, dict):
+        if defs is None:
+            defs = node.pop('$defs', {})
+        if '$ref' in node:
+            return _clean_schema(defs[node['$ref'].rsplit('/', 1)[-1]], defs)
+        any_of = node.get('anyOf')
+        if any_of and len(any_of) == 2 and {'type': 'null'} in any_of:
+            inner = next(option for option in any_of if option != {'type': 'null'})
+            node = {**{k: v for k, v in node.items() if k != 'anyOf'}, **inner}
+            if node.get('default', 0) is None:
+                del node['default']
+        return {k: _clean_schema(v, defs) for k, v in node.items() if k != 'title'}
+    if isinstance(node, list):
+        return [_clean_schema(item, defs) for item in node]
+    return node
+
+
+class ToolSpec:
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        args_model: Type[ToolArgs],
+        handler: Handler,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        kind: str = 'client'
+    ):
+        if kind not in TOOL_KINDS:
+            raise ValueError(f"Unknown tool kind: {kind}")
+        self.name = name
+        self.description = description
+        self.args_model = args_model
+        self.handler = handler
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.kind = kind
+        self.tool = Tool(
+            name=name,
+            description=description,
+            inputSchema=_clean_schema(args_model.model_json_schema())
+        )
+
+    def validate(self, arguments: Optional[Dict[str, Any]]) -> ToolArgs:
+        return self.args_model.model_validate(arguments or {})
+
+
+class ToolRegistry:
+    def __init__(self):
+        self._specs: Dict[str, ToolSpec] = {}
+        self._tools: Optional[List[Tool]] = None
+
+    def register(
+        self,
+        name: str,
+        description: str,
+        args_model: Type[ToolArgs],
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = 60.0,
+        kind: str = 'client'
+    ) -> Callable[[Handler], Handler]:
+        def decorator(handler: Handler) -> Handler:
+            if name in self._specs:
+                raise ValueError(f"Tool already registered: {name}")
+            if kind == 'job' and not issubclass(args_model, BackgroundArgs):
+                raise TypeError(f"Background tool {name} needs BackgroundArgs")
+            self._specs[name] = ToolSpec(name, description, args_model, handler, max_concurrency, timeout, kind)
+            self._tools = None
+            return handler
+        return decorator
+
+    def get(self, name: str) -> Optional[ToolSpec]:
+        return self._specs.get(name)
+
+    def list_tools(self) -> List[Tool]:
+        if self._tools is None:
+            self._tools = [spec.tool for spec in self._specs.values()]
+        return self._tools
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+
+registry = ToolRegistry()
+
+
+# Argument models
+
+class ListArgs(ToolArgs):
+    query: str = Field("", description="Gmail search query (e.g., 'is:unread', 'from:example@gmail.com')")
+    max_results: int = Field(10, ge=1, le=500, description="Maximum number of results to return")
+    page_token: Optional[str] = Field(None, description="Token for pagination")
+    label_ids: Optional[List[str]] = Field(None, description="Filter by label IDs or names")
+    include_spam_trash: bool = Field(False, description="Include spam and trash")
+
+
+class GetMessageArgs(ToolArgs):
+    message_id: str = Field(..., min_length=1, description="The ID of the message to retrieve")
+    format: str = Field("full", pattern="^(full|metadata|minimal|raw)$", description="Format of the message (full, metadata, minimal, raw); full is returned as a summary without the payload tree")
+
+
+class MessageIdArgs(ToolArgs):
+    message_id: str = Field(..., min_length=1, description="The ID of the message")
+
+
+class MessageContentArgs(MessageIdArgs):
+    include_html: bool = Field(False, description="Also return the raw HTML body (HTML-only messages always get a plain-text rendering)")
+    max_body_chars: int = Field(INLINE_BODY_CHARS, ge=0, description="Cut longer bodies here; read the message's gmail:// resource for the rest (0 = no limit)")
+
+
+class MessagesContentArgs(ToolArgs):
+    message_ids: List[str] = Field(..., min_length=1, max_length=500, description="The IDs of the messages")
+    include_html: bool = Field(False, description="Also return the HTML body")
+    max_body_chars: int = Field(INLINE_BODY_CHARS, ge=0, description="Cut longer bodies here; read each message's gmail:// resource for the rest (0 = no limit)")
+
+
+class MultiSearchArgs(ToolArgs):
+    queries: List[str] = Field(..., min_length=1, max_length=20, description="Gmail search queries, run concurrently; results are merged and deduplicated")
+    max_results: int = Field(100, ge=1, le=5000, description="Maximum number of results per query")
+    label_ids: Optional[List[str]] = Field(None, description="Filter every query by label IDs or names")
+    include_spam_trash: bool = Field(False, description="Include spam and trash")
+    annotate: bool = Field(True, description="List the queries that matched each message")
+    hydrate: bool = Field(False, description="Fetch headers and snippet of every merged result in batches")
+    metadata_headers: Optional[List[str]] = Field(None, description="Headers to fetch when hydrating (default From, To, Subject, Date)")
+
+
+class ComposeArgs(ToolArgs):
+    to: List[str] = Field(..., min_length=1, description="Recipient email addresses")
+    subject: str = Field(..., description="Email subject")
+    body: str = Field(..., description="Email body content")
+    cc: Optional[List[str]] = Field(None, description="CC recipients")
+    bcc: Optional[List[str]] = Field(None, description="BCC recipients")
+    attachments: Optional[List[str]] = Field(None, description="File paths to attach")
+    html: bool = Field(False, description="Whether body is HTML")
+
+
+class CreateDraftsArgs(ToolArgs):
+    drafts: List[ComposeArgs] = Field(..., min_length=1, max_length=100, description="Drafts to create, each with the same fields as gmail_create_draft")
+
+
+class ListDraftsArgs(ToolArgs):
+    max_results: int = Field(10, ge=1, le=500, description="Maximum number of drafts to return")
+    page_token: Optional[str] = Field(None, description="Token for pagination")
+    hydrate: bool = Field(False, description="Include subject, recipients and snippet for each draft")
+
+
+class DraftIdArgs(ToolArgs):
+    draft_id: str = Field(..., min_length=1, description="The ID of the draft")
+
+
+class DraftIdsArgs(ToolArgs):
+    draft_ids: List[str] = Field(..., min_length=1, max_length=100, description="The IDs of the drafts")
+
+
+class ModifyMessageArgs(ToolArgs):
+    message_id: str = Field(..., min_length=1, description="The ID of the message")
+    add_labels: Optional[List[str]] = Field(None, description="Label IDs or names to add")
+    remove_labels: Optional[List[str]] = Field(None, description="Label IDs or names to remove")
+
+
+class NoArgs(ToolArgs):
+    pass
+
+
+class ListLabelsArgs(ToolArgs):
+    refresh: bool = Field(False, description="Reload labels from Gmail instead of using the cached list")
+
+
+class CreateLabelArgs(ToolArgs):
+    name: str = Field(..., min_length=1, description="Name of the label")
+    label_list_visibility: str = Field("labelShow", pattern="^(labelShow|labelShowIfUnread|labelHide)$", description="Visibility in label list")
+    message_list_visibility: str = Field("show", pattern="^(show|hide)$", description="Visibility in message list")
+
+
+class LabelIdArgs(ToolArgs):
+    label_id: str = Field(..., min_length=1, description="The ID of the label")
+
+
+class UpdateLabelArgs(ToolArgs):
+    label_id: str = Field(..., min_length=1, description="The ID of the label")
+    new_name: str = Field(..., min_length=1, description="New name for the label")
+
+
+class BatchModifyArgs(ToolArgs):
+    message_ids: List[str] = Field(..., min_length=1, max_length=1000, description="List of message IDs")
+    add_labels: Optional[List[str]] = Field(None, description="Label IDs or names to add")
+    remove_labels: Optional[List[str]] = Field(None, description="Label IDs or names to remove")
+
+
+class BatchDeleteArgs(ToolArgs):
+    message_ids: List[str] = Field(..., min_length=1, max_length=1000, description="List of message IDs to delete")
+
+
+class ThreadIdArgs(ToolArgs):
+    thread_id: str = Field(..., min_length=1, description="The ID of the thread")
+
+
+class ModifyThreadArgs(ToolArgs):
+    thread_id: str = Field(..., min_length=1, description="The ID of the thread")
+    add_labels: Optional[List[str]] = Field(None, description="Label IDs or names to add")
+    remove_labels: Optional[List[str]] = Field(None, description="Label IDs or names to remove")
+
+
+class GetAttachmentArgs(ToolArgs):
+    message_id: str = Field(..., min_length=1, description="The ID of the message")
+    attachment_id: str = Field(..., min_length=1, description="The ID of the attachment")
+    save_path: Optional[str] = Field(None, min_length=1, description="Path to save the attachment; without it only a gmail:// resource URI is returned and nothing is downloaded")
+
+
+# Message tools
+
+@registry.register("gmail_list_messages", "List Gmail messages with optional search query", ListArgs)
+def _list_messages(client: GmailClient, args: ListArgs) -> Any:
+    result = client.list_messages(**args.model_dump())
+    if client.prefetcher is not None:
+        # Agents usually read what they just listed
+        client.prefetcher.schedule('message', [m['id'] for m in result.get('messages', [])])
+    return link_listing(result)
+
+
+@registry.register("gmail_multi_search", "Run several search queries concurrently and return the merged, deduplicated matches", MultiSearchArgs, max_concurrency=2, timeout=300.0)
+def _multi_search(client: GmailClient, args: MultiSearchArgs) -> Any:
+    return link_listing(client.multi_search(**args.model_dump()))
+
+
+@registry.register("gmail_get_message", "Get a Gmail message's headers, labels and attachment links by ID; its body is at the returned gmail:// URI", GetMessageArgs)
+def _get_message(client: GmailClient, args: GetMessageArgs) -> Any:
+    message = client.get_message(**args.model_dump())
+    if args.format == 'full':
+        return summarize_message(message)
+    message['uri'] = message_uri(message['id'])
+    return message
+
+
+@registry.register("gmail_get_message_content", "Get parsed content of a Gmail message including headers, body, and attachments info", MessageContentArgs)
+def _get_message_content(client: GmailClient, args: MessageContentArgs) -> Any:
+    content = client.get_message_content(args.message_id, include_html=args.include_html)
+    return link_content(content, args.max_body_chars)
+
+
+@registry.register("gmail_get_messages_content", "Get parsed content of several messages, fetched raw in batches and parsed in parallel", MessagesContentArgs, max_concurrency=2, timeout=300.0)
+def _get_messages_content(client: GmailClient, args: MessagesContentArgs) -> Any:
+    result = client.get_messages_content(args.message_ids, include_html=args.include_html)
+    for content in result['messages']:
+        link_content(content, args.max_body_chars)
+    return result
+
+
+@registry.register("gmail_send_message", "Send a new email message", ComposeArgs, max_concurrency=4, timeout=120.0)
+def _send_message(client: GmailClient, args: ComposeArgs) -> Any:
+    return client.send_message(**args.model_dump())
+
+
+@registry.register("gmail_trash_message", "Move a message to trash", MessageIdArgs)
+def _trash_message(client: GmailClient, args: MessageIdArgs) -> Any:
+    return client.trash_message(**args.model_dump())
+
+
+@registry.register("gmail_untrash_message", "Remove a message from trash", MessageIdArgs)
+def _untrash_message(client: GmailClient, args: MessageIdArgs) -> Any:
+    return client.untrash_message(**args.model_dump())
+
+
+@registry.register("gmail_delete_message", "Permanently delete a message", MessageIdArgs)
+def _delete_message(client: GmailClient, args: MessageIdArgs) -> Any:
+    client.delete_message(**args.model_dump())
+    return {"status": "success", "message": "Message permanently deleted"}
+
+
+@registry.register("gmail_modify_message", "Modify message labels", ModifyMessageArgs)
+def _modify_message(client: GmailClient, args: ModifyMessageArgs) -> Any:
+    return client.modify_message(**args.model_dump())
+
+
+# Draft tools
+
+@registry.register("gmail_create_draft", "Create a new email draft", ComposeArgs, max_concurrency=4, timeout=120.0)
+def _create_draft(client: GmailClient, args: ComposeArgs) -> Any:
+    return client.create_draft(**args.model_dump())
+
+
+@registry.register("gmail_create_drafts", "Create several email drafts in one batch request", CreateDraftsArgs, max_concurrency=2, timeout=300.0)
+def _create_drafts(client: GmailClient, args: CreateDraftsArgs) -> Any:
+    return client.create_drafts([draft.model_dump() for draft in args.drafts])
+
+
+@registry.register("gmail_list_drafts", "List all email drafts", ListDraftsArgs)
+def _list_drafts(client: GmailClient, args: ListDraftsArgs) -> Any:
+    return client.list_drafts(**args.model_dump())
+
+
+@registry.register("gmail_get_draft", "Get a specific draft by ID", DraftIdArgs)
+def _get_draft(client: GmailClient, args: DraftIdArgs) -> Any:
+    return client.get_draft(**args.model_dump())
+
+
+@registry.register("gmail_get_drafts", "Get several drafts by ID in one batch request", DraftIdsArgs)
+def _get_drafts(client: GmailClient, args: DraftIdsArgs) -> Any:
+    return client.get_drafts(**args.model_dump())
+
+
+@registry.register("gmail_delete_draft", "Delete a draft", DraftIdArgs)
+def _delete_draft(client: GmailClient, args: DraftIdArgs) -> Any:
+    client.delete_draft(**args.model_dump())
+    return {"status": "success", "message": "Draft deleted"}
+
+
+# Label tools
+
+@registry.register("gmail_list_labels", "List all labels in the Gmail account", ListLabelsArgs)
+def _list_labels(client: GmailClient, args: ListLabelsArgs) -> Any:
+    return client.list_labels(**args.model_dump())
+
+
+@registry.register("gmail_create_label", "Create a new label", CreateLabelArgs, max_concurrency=1)
+def _create_label(client: GmailClient, args: CreateLabelArgs) -> Any:
+    return client.create_label(**args.model_dump())
+
+
+@registry.register("gmail_delete_label", "Delete a label", LabelIdArgs, max_concurrency=1)
+def _delete_label(client: GmailClient, args: LabelIdArgs) -> Any:
+    client.delete_label(**args.model_dump())
+    return {"status": "success", "message": "Label deleted"}
+
+
+@registry.register("gmail_update_label", "Update a label's name", UpdateLabelArgs, max_concurrency=1)
+def _update_label(client: GmailClient, args: UpdateLabelArgs) -> Any:
+    return client.update_label(**args.model_dump())
+
+
+# Account tools
+
+@registry.register("gmail_get_profile", "Get Gmail account profile information", NoArgs)
+def _get_profile(client: GmailClient, args: NoArgs) -> Any:
+    return client.get_profile()
+
+
+@registry.register("gmail_client_stats", "Report how many Gmail API calls request coalescing, prefetching and local caches saved, and current adaptive batch sizes", NoArgs)
+def _client_stats(client: GmailClient, args: NoArgs) -> Any:
+    return {
+        'coalescing': client.flights.stats(),
+        'labels': {'hits': client.labels.hits, 'loads': client.labels.loads},
+        'html_text': text_cache.stats(),
+        'attachments': client.attachments.stats() if client.attachments is not None else None,
+        'prefetch': client.prefetcher.stats() if client.prefetcher is not None else None,
+        'batching': client.batching.stats(),
+        'bulk_writes': client.bulk_batching.stats(),
+        'cassette': client.auth.cassette.stats() if getattr(client.auth, 'cassette', None) is not None else None,
+    }
+
+
+# Batch tools
+
+@registry.register("gmail_batch_modify_messages", "Modify labels for multiple messages at once", BatchModifyArgs, max_concurrency=2, timeout=120.0)
+def _batch_modify_messages(client: GmailClient, args: BatchModifyArgs) -> Any:
+    client.batch_modify_messages(**args.model_dump())
+    return {"status": "success", "message": "Messages modified"}
+
+
+@registry.register("gmail_batch_delete_messages", "Permanently delete multiple messages", BatchDeleteArgs, max_concurrency=2, timeout=120.0)
+def _batch_delete_messages(client: GmailClient, args: BatchDeleteArgs) -> Any:
+    client.batch_delete_messages(**args.model_dump())
+    return {"status": "success", "message": "Messages deleted"}
+
+
+# Thread tools
+
+@registry.register("gmail_list_threads", "List email threads", ListArgs)
+def _list_threads(client: GmailClient, args: ListArgs) -> Any:
+    result = client.list_threads(**args.model_dump())
+    if client.prefetcher is not None:
+        client.prefetcher.schedule('thread', [t['id'] for t in result.get('threads', [])])
+    return link_listing(result)
+
+
+@registry.register("gmail_get_thread", "Get a thread's messages as summaries with gmail:// URIs for their bodies", ThreadIdArgs)
+def _get_thread(client: GmailClient, args: ThreadIdArgs) -> Any:
+    return summarize_thread(client.get_thread(**args.model_dump()))
+
+
+@registry.register("gmail_trash_thread", "Move a thread to trash", ThreadIdArgs)
+def _trash_thread(client: GmailClient, args: ThreadIdArgs) -> Any:
+    return client.trash_thread(**args.model_dump())
+
+
+@registry.register("gmail_untrash_thread", "Remove a thread from trash", ThreadIdArgs)
+def _untrash_thread(client: GmailClient, args: ThreadIdArgs) -> Any:
+    return client.untrash_thread(**args.model_dump())
+
+
+@registry.register("gmail_modify_thread", "Modify thread labels", ModifyThreadArgs)
+def _modify_thread(client: GmailClient, args: ModifyThreadArgs) -> Any:
+    return client.modify_thread(**args.model_dump())
+
+
+# Attachment tools
+
+@registry.register("gmail_get_attachment", "Download an attachment from a message to a file, or get its gmail:// resource URI", GetAttachmentArgs, max_concurrency=4, timeout=300.0)
+def _get_attachment(client: GmailClient, args: GetAttachmentArgs) -> Any:
+    if args.save_path is None:
+        # The bytes are fetched, and cached, only when the resource is read
+        return {"uri": attachment_uri(args.message_id, args.attachment_id)}
+    save_path = client.save_attachment(args.message_id, args.attachment_id, args.save_path)
+    return {"status": "success", "message": f"Attachment saved to {save_path}"}
+
+
+# Long-running tools
+
+class BulkJobArgs(BackgroundArgs):
+    operation: str = Field(..., pattern="^(trash|delete|modify)$", description="What to do with every matching message (trash, delete, modify)")
+    query: str = Field("", description="Gmail search query selecting the messages")
+    label_ids: Optional[List[str]] = Field(None, description="Only messages with these label IDs or names")
+    include_spam_trash: bool = Field(False, description="Include spam and trash")
+    add_labels: Optional[List[str]] = Field(None, description="Label IDs or names to add (modify only)")
+    remove_labels: Optional[List[str]] = Field(None, description="Label IDs or names to remove (modify only)")
+    job_id: Optional[str] = Field(None, pattern=r"^[\w-]+$", description="Journal name; reuse it to resume an interrupted job")
+
+
+class ScanArgs(MessageFilter, BackgroundArgs):
+    max_results: int = Field(1000, ge=1, le=100000, description="Stop after this many matches")
+
+
+@registry.register("gmail_bulk_job", "Trash, delete or relabel every message matching a query as a resumable job", BulkJobArgs, timeout=None, kind='job')
+def _bulk_job(client: GmailClient, args: BulkJobArgs, context) -> Any:
+    # An existing journal is resumed only if it was started with these same
+    # arguments; BulkJob raises rather than run the old job under a new request
+    job = BulkJob(
+        client,
+        job_id=args.job_id,
+        operation=args.operation,
+        query=args.query,
+        label_ids=args.label_ids,
+        include_spam_trash=args.include_spam_trash,
+        add_labels=args.add_labels,
+        remove_labels=args.remove_labels
+    )
+    job.cancel_event = context.cancel_event
+
+    def progress(status):
+        total = status['listed'] if status['listing_done'] else None
+        context.report(status['processed'], total, f"{status['processed']} of {status['listed']} messages processed")
+
+    return job.run(progress=progress)
+
+
+@registry.register("gmail_scan_messages", "Scan the mailbox for messages matching structured filters", ScanArgs, timeout=None, kind='job')
+def _scan_messages(client: GmailClient, args: ScanArgs, context) -> Any:
+    message_filter = MessageFilter(**args.model_dump(include=set(MessageFilter.model_fields)))
+    pipeline = (
+        Pipeline(client)
+        .enumerate(message_filter)
+        .fetch(format='metadata', metadata_headers=['From', 'To', 'Subject', 'Date'], parse=True)
+        .limit(args.max_results)
+    )
+
+    def progress(stats):
+        if context.cancelled:
+            pipeline.cancel()
+        context.report(stats.get('processed', 0), args.max_results, f"{stats.get('fetched', 0)} messages fetched")
+
+    result = pipeline.run_sync(progress=progress)
+    return {
+        'query': message_filter.to_query(),
+        'messages': [
+            {'id': m['id'], 'threadId': m['threadId'], 'snippet': m['snippet'], **m['headers']}
+            for m in result['items']
+        ],
+        'stats': result['stats'],
+        'errors': result['errors']
+    }
+
+
+class ExportArgs(BackgroundArgs):
+    path: str = Field(..., min_length=1, description="Output mbox file, or directory for EML files; rerun with the same path to resume")
+    format: str = Field("mbox", pattern="^(mbox|eml)$", description="mbox (one file) or eml (one file per message)")
+    compression: Optional[str] = Field(None, pattern="^(gzip|zstd)$", description="Compress the output with gzip or zstd")
+    query: str = Field("", description="Gmail search query selecting the messages")
+    label_ids: Optional[List[str]] = Field(None, description="Only messages with these label IDs or names")
+    include_spam_trash: bool = Field(False, description="Include spam and trash")
+
+
+@registry.register("gmail_export_mailbox", "Export matching messages as RFC 822 to an mbox file or EML directory", ExportArgs, timeout=None, kind='job')
+def _export_mailbox(client: GmailClient, args: ExportArgs, context) -> Any:
+    exporter = MailboxExporter(
+        client,
+        Path(args.path).expanduser(),
+        format=args.format,
+        compression=args.compression,
+        query=args.query,
+        label_ids=args.label_ids,
+        include_spam_trash=args.include_spam_trash
+    )
+    exporter.cancel_event = context.cancel_event
+
+    def progress(status):
+        context.report(status['exported'] + status['skipped'], None, f"{status['exported']} messages exported")
+
+    return exporter.run(progress=progress)
+
+
+class ImportArgs(BackgroundArgs):
+    source: str = Field(..., min_length=1, description="mbox file (optionally .gz/.zst) or directory of EML files")
+    mode: str = Field("import", pattern="^(import|insert)$", description="import runs Gmail's normal delivery scanning; insert stores messages as-is")
+    label_map: Optional[Dict[str, Optional[str]]] = Field(None, description="Rename source labels (X-Gmail-Labels) to these label names; null drops the label")
+    add_labels: Optional[List[str]] = Field(None, description="Label names or IDs to add to every imported message")
+    create_labels: bool = Field(True, description="Create labels that do not exist yet")
+    job_id: Optional[str] = Field(None, pattern=r"^[\w-]+$", description="Journal name; defaults to one derived from the source path")
+
+
+@registry.register("gmail_import_mailbox", "Import an mbox file or EML directory into Gmail, skipping messages already imported", ImportArgs, timeout=None, kind='job')
+def _import_mailbox(client: GmailClient, args: ImportArgs, context) -> Any:
+    importer = MailboxImporter(
+        client,
+        Path(args.source).expanduser(),
+        job_id=args.job_id,
+        mode=args.mode,
+        label_map=args.label_map,
+        add_labels=args.add_labels,
+        create_labels=args.create_labels
+    )
+    importer.cancel_event = context.cancel_event
+
+    def progress(status):
+        context.report(status['read'], None, f"{status['imported']} messages imported, {status['duplicates']} already present")
+
+    return importer.run(progress=progress)
+
+
+class BulkSendArgs(BackgroundArgs):
+    subject: str = Field(..., description="Subject template; {{field}} is replaced from each recipient row")
+    body: str = Field(..., description="Body template; {{field}} is replaced from each recipient row")
+    recipients: List[Dict[str, Any]] = Field(..., min_length=1, description="One row per message; 'to' is required, other keys fill template fields")
+    html: bool = Field(False, description="Whether the body is HTML")
+    attachments: Optional[List[str]] = Field(None, description="File paths attached to every message")
+    cc: Optional[List[str]] = Field(None, description="CC recipients for every message")
+    bcc: Optional[List[str]] = Field(None, description="BCC recipients for every message")
+    daily_limit: int = Field(DEFAULT_DAILY_LIMIT, ge=1, description="Most messages to send in any 24 hours, counting earlier merges; the rest are reported as deferred")
+    dry_run: bool = Field(False, description="Validate and render the first message without sending anything")
+    job_id: Optional[str] = Field(None, pattern=r"^[\w-]+$", description="Journal name; rerunning with it and the same templates and recipients skips those already sent to")
+
+
+@registry.register("gmail_send_bulk", "Send a personalised message to every row of a recipient table", BulkSendArgs, timeout=None, kind='job')
+def _send_bulk(client: GmailClient, args: BulkSendArgs, context) -> Any:
+    merge = MailMerge(
+        client,
+        args.subject,
+        args.body,
+        args.recipients,
+        html=args.html,
+        attachments=args.attachments,
+        cc=args.cc,
+        bcc=args.bcc,
+        daily_limit=args.daily_limit,
+        job_id=args.job_id
+    )
+    problems = merge.validate()
+    if args.dry_run or problems:
+        return {
+            'fields': sorted(merge.fields),
+            'problems': [{'index': index, 'error': error} for index, error in problems],
+            'preview': [] if problems else merge.preview()
+        }
+    merge.cancel_event = context.cancel_event
+
+    def progress(status):
+        done = status['sent'] + status['failed'] + status['deferred'] + status['skipped']
+        context.report(done, status['recipients'], f"{status['sent']} sent, {status['failed']} failed")
+
+    return merge.run(progress=progress)
+
+
+class FindDuplicatesArgs(BackgroundArgs):
+    query: str = Field("", description="Gmail search query selecting the messages to compare")
+    label_ids: Optional[List[str]] = Field(None, description="Only messages with these label IDs or names")
+    include_spam_trash: bool = Field(False, description="Include spam and trash")
+    threshold: float = Field(DEFAULT_THRESHOLD, gt=0, le=1, description="Minimum estimated body similarity (Jaccard) for near-duplicates")
+    max_messages: Optional[int] = Field(None, ge=1, description="Stop after comparing this many messages")
+    trash_duplicates: bool = Field(False, description="Move copies that match the earliest message of their cluster to trash (members linked only through another copy are kept)")
+
+
+@registry.register("gmail_find_duplicates", "Find duplicate and near-duplicate messages by Message-ID, body hash and MinHash similarity", FindDuplicatesArgs, timeout=None, kind='job')
+def _find_duplicates(client: GmailClient, args: FindDuplicatesArgs, context) -> Any:
+    finder = DuplicateFinder(
+        client,
+        query=args.query,
+        label_ids=args.label_ids,
+        include_spam_trash=args.include_spam_trash,
+        threshold=args.threshold,
+        max_messages=args.max_messages
+    )
+    finder.cancel_event = context.cancel_event
+
+    def progress(status):
+        context.report(status['scanned'], args.max_messages, f"{status['scanned']} messages compared")
+
+    result = finder.run(progress=progress)
+    if args.trash_duplicates and result['duplicate_ids'] and not context.cancelled:
+        trashed = client.batch_trash_messages(result['duplicate_ids'])
+        result['trashed'] = len(trashed['trashed'])
+        result['trash_errors'] = trashed['errors']
+    return result
+
+
+class SyncMetadataArgs(BackgroundArgs):
+    pass
+
+
+class MailboxStatsArgs(ToolArgs):
+    group_by: Optional[str] = Field(None, pattern="^(sender|label|thread|year|month)$", description="Break totals down by sender, label, thread, year or month")
+    after: Optional[Union[datetime, date]] = Field(None, description="Only messages received after this date")
+    before: Optional[Union[datetime, date]] = Field(None, description="Only messages received before this date")
+    labels: List[str] = Field(default_factory=list, description="Label names the message must carry (all of)")
+    exclude_labels: List[str] = Field(default_factory=list, description="Label names the message must not carry")
+    senders: List[str] = Field(default_factory=list, description="Sender addresses or domains (any of, substring match)")
+    order_by: str = Field("messages", pattern="^(messages|bytes)$", description="Rank groups by message count or total size")
+    top: int = Field(20, ge=1, le=1000, description="Number of groups to return")
+
+
+def _timestamp(value: Optional[Union[datetime, date]]) -> Optional[float]:
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    return value.timestamp()
+
+
+@registry.register("gmail_sync_metadata", "Build or refresh the local metadata index used by gmail_mailbox_stats", SyncMetadataArgs, timeout=None, kind='job')
+def _sync_metadata(client: GmailClient, args: SyncMetadataArgs, context) -> Any:
+    def progress(stats):
+        context.report(stats['fetched'], stats['total'], f"{stats['fetched']} of {stats['total']} messages indexed")
+
+    return default_store().sync(client, progress=progress, cancel_event=context.cancel_event)
+
+
+@registry.register("gmail_mailbox_stats", "Count messages and bytes from the local metadata index, with filters and group-by", MailboxStatsArgs)
+def _mailbox_stats(client: GmailClient, args: MailboxStatsArgs) -> Any:
+    store = default_store()
+    synced_at = store.synced_at
+    if synced_at is None:
+        raise ValueError("The metadata index is empty; run gmail_sync_metadata first")
+    result = store.query(
+        group_by=args.group_by,
+        after=_timestamp(args.after),
+        before=_timestamp(args.before),
+        labels=client.labels.resolve(args.labels),
+        exclude_labels=client.labels.resolve(args.exclude_labels),
+        senders=args.senders,
+        order_by=args.order_by,
+        top=args.top
+    )
+    if args.group_by == 'label':
+        names = {label['id']: label['name'] for label in client.list_labels()}
+        for group in result['groups']:
+            group['key'] = names.get(group['key'], group['key'])
+    result['synced_at'] = datetime.fromtimestamp(synced_at).isoformat(timespec='seconds')
+    return result
+
+
+# Job tools
+
+class JobIdArgs(ToolArgs):
+    job_id: str = Field(..., min_length=1, description="The ID returned when the job was started")
+
+
+class JobStatusArgs(JobIdArgs):
+    wait_seconds: float = Field(0, ge=0, le=300, description="Wait up to this long for the job to finish, sending progress notifications meanwhile")
+
+
+@registry.register("gmail_job_status", "Get the status and progress of a background job", JobStatusArgs, timeout=None, kind='server')
+async def _job_status(server, args: JobStatusArgs) -> Any:
+    job = server.jobs.get(args.job_id)
+    if args.wait_seconds:
+        await server.wait_for_job(job, args.wait_seconds)
+    return job.summary()
+
+
+@registry.register("gmail_job_result", "Get the result of a finished background job", JobIdArgs, kind='server')
+async def _job_result(server, args: JobIdArgs) -> Any:
+    job = server.jobs.get(args.job_id)
+    if not job.done:
+        raise Exception(f"Job {args.job_id} is still {job.status}")
+    return {**job.summary(), 'result': job.result}
+
+
+@registry.register("gmail_job_cancel", "Cancel a running background job", JobIdArgs, kind='server')
+async def _job_cancel(server, args: JobIdArgs) -> Any:
+    return server.jobs.cancel(args.job_id).summary()
+
+
+@registry.register("gmail_list_jobs", "List background jobs started by this server", NoArgs, kind='server')
+async def _list_jobs(server, args: NoArgs) -> Any:
+    return [job.summary() for job in server.jobs.list()]
@@ -0,0 +1,15 @@
+import pytest
+
+from gmail_mcp.gmail_client import GmailClient
+
+from fakes import FakeAuth, FakeMailbox, make_message
+
+
+@pytest.fixture
+def mailbox():
+    return FakeMailbox([make_message(index, text=f'Body of message {index}') for index in range(1, 21)])
+
+
+@pytest.fixture
+def client(mailbox):
+    return GmailClient(FakeAuth(mailbox))
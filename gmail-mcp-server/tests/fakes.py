@@ -0,0 +1,422 @@
+import base64
+import copy
+import threading
+from collections import Counter
+from email import message_from_bytes
+from email.message import EmailMessage
+from typing import Any, Callable, Dict, List, Optional
+
+
+BASE_DATE_MS = 1700000000000
+
+
+def b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def attachment_data(gmail_id: str, attachment_id: str) -> bytes:
+    return f'ATTACHMENT {gmail_id} {attachment_id}'.encode()
+
+
+def message_id(index: int) -> str:
+    # Real Gmail ids are 16 hex digits and grow with time
+    return format(0x180000000000000 + index, 'x')
+
+
+def make_message(
+    index: int,
+    sender: str = 'alice@example.com',
+    to: str = 'me@example.com',
+    subject: Optional[str] = None,
+    text: Optional[str] = None,
+    html: Optional[str] = None,
+    labels: tuple = ('INBOX',),
+    date_ms: Optional[int] = None,
+    thread_id: Optional[str] = None,
+    attachments: tuple = ()
+) -> Dict[str, Any]:
+    parts = []
+    if text is not None:
+        parts.append({'partId': str(len(parts)), 'mimeType': 'text/plain', 'body': {'data': b64(text.encode()), 'size': len(text)}})
+    if html is not None:
+        parts.append({'partId': str(len(parts)), 'mimeType': 'text/html', 'body': {'data': b64(html.encode()), 'size': len(html)}})
+    for filename, mime_type in attachments:
+        parts.append({
+            'partId': str(len(parts)),
+            'mimeType': mime_type,
+            'filename': filename,
+            'body': {'attachmentId': f'att-{index}-{len(parts)}', 'size': 100},
+        })
+    gmail_id = message_id(index)
+    return {
+        'id': gmail_id,
+        'threadId': thread_id or gmail_id,
+        'labelIds': list(labels),
+        'snippet': (text or '')[:50],
+        'internalDate': str(date_ms if date_ms is not None else BASE_DATE_MS + index * 1000),
+        'sizeEstimate': 1000 + index,
+        'payload': {
+            'mimeType': 'multipart/mixed',
+            'headers': [
+                {'name': 'From', 'value': sender},
+                {'name': 'To', 'value': to},
+                {'name': 'Subject', 'value': subject or f'Message {index}'},
+                {'name': 'Date', 'value': 'Mon, 1 Jan 2024 00:00:00 +0000'},
+                {'name': 'Message-ID', 'value': f'<{index}@example.com>'},
+            ],
+            'parts': parts,
+        },
+    }
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, reason: str = ''):
+        super().__init__(f'HttpError {status} {reason}'.strip())
+        self.resp = type('Response', (), {'status': status})()
+
+
+class Request:
+    def __init__(self, fn: Callable[[], Any]):
+        self.fn = fn
+
+    def execute(self, http=None, num_retries=0):
+        return self.fn()
+
+
+class BatchRequest:
+    def __init__(self, store: 'FakeMailbox', callback):
+        self.store = store
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None, callback=None):
+        self.requests.append((request_id, request, callback or self.callback))
+
+    def execute(self, http=None):
+        self.store.calls['batch'] += 1
+        # The last `throttled` requests of the batch are rejected with 429s
+        throttled = self.store.throttle(len(self.requests)) if self.store.throttle else 0
+        for index, (request_id, request, callback) in enumerate(self.requests):
+            if index >= len(self.requests) - throttled:
+                callback(request_id, None, HttpError(429, 'rateLimitExceeded'))
+                continue
+            try:
+                response, error = request.execute(), None
+            except Exception as e:
+                response, error = None, e
+            callback(request_id, response, error)
+
+
+class _Resource:
+    def __init__(self, **methods):
+        self.__dict__.update(methods)
+
+
+class FakeMailbox:
+    # Just enough of the Gmail API for GmailClient: list with a handful of
+    # query operators, get in every format, writes, labels, threads, batches.
+    def __init__(self, messages: List[Dict[str, Any]] = ()):
+        self.messages: Dict[str, Dict[str, Any]] = {m['id']: m for m in messages}
+        self.labels = [
+            {'id': 'INBOX', 'name': 'INBOX', 'type': 'system'},
+            {'id': 'SENT', 'name': 'SENT', 'type': 'system'},
+            {'id': 'TRASH', 'name': 'TRASH', 'type': 'system'},
+            {'id': 'Label_1', 'name': 'Work', 'type': 'user'},
+        ]
+        self.raw_messages: Dict[str, bytes] = {}
+        self.sent: List[Dict[str, Any]] = []
+        self.history: List[Dict[str, Any]] = []
+        self.imported: List[Dict[str, Any]] = []
+        # Imports whose raw message contains one of these markers are rejected
+        self.fail_imports: set = set()
+        self.drafts: Dict[str, Dict[str, Any]] = {}
+        # Drafts whose raw message contains one of these markers are rejected
+        self.fail_drafts: set = set()
+        self.calls: Counter = Counter()
+        self.throttle: Optional[Callable[[int], int]] = None
+        self.fail_gets: set = set()
+        self.lock = threading.Lock()
+
+    def add(self, message: Dict[str, Any], raw: Optional[bytes] = None) -> None:
+        self.messages[message['id']] = message
+        if raw is not None:
+            self.raw_messages[message['id']] = raw
+
+    def matches(self, message: Dict[str, Any], query: str, label_ids: Optional[List[str]]) -> bool:
+        if label_ids and not set(label_ids) <= set(message['labelIds']):
+            return False
+        headers = {h['name'].lower(): h['value'].lower() for h in message['payload']['headers']}
+        seconds = int(message['internalDate']) // 1000
+        for term in query.split():
+            name, _, value = term.partition(':')
+            if name in ('from', 'to', 'subject') and value.lower() not in headers.get(name, ''):
+                return False
+            if name == 'after' and not seconds > int(value):
+                return False
+            if name == 'before' and not seconds < int(value):
+                return False
+            if name == 'label' and value not in message['labelIds']:
+                return False
+        return True
+
+    def raw(self, gmail_id: str) -> bytes:
+        if gmail_id in self.raw_messages:
+            return self.raw_messages[gmail_id]
+        message = self.messages[gmail_id]
+        mime = EmailMessage()
+        for header in message['payload']['headers']:
+            mime[header['name']] = header['value']
+        parts = message['payload'].get('parts', [])
+        bodies = {part['mimeType']: base64.urlsafe_b64decode(part['body']['data']).decode() for part in parts if 'data' in part['body']}
+        mime.set_content(bodies.get('text/plain', ''))
+        if 'text/html' in bodies:
+            if 'text/plain' in bodies:
+                mime.add_alternative(bodies['text/html'], subtype='html')
+            else:
+                mime.set_content(bodies['text/html'], subtype='html')
+        for part in parts:
+            if part.get('filename'):
+                maintype, subtype = part['mimeType'].split('/')
+                data = attachment_data(gmail_id, part['body']['attachmentId'])
+                mime.add_attachment(data, maintype=maintype, subtype=subtype, filename=part['filename'])
+        return bytes(mime)
+
+    # API surface
+
+    def _list(self, userId, maxResults=100, q=None, pageToken=None, labelIds=None, includeSpamTrash=False):
+        def run():
+            self.calls['list'] += 1
+            found = [m for m in self.messages.values() if self.matches(m, q or '', labelIds)]
+            start = int(pageToken or 0)
+            page = found[start:start + maxResults]
+            result = {'resultSizeEstimate': len(found)}
+            if page:
+                result['messages'] = [{'id': m['id'], 'threadId': m['threadId']} for m in page]
+            if start + maxResults < len(found):
+                result['nextPageToken'] = str(start + maxResults)
+            return result
+        return Request(run)
+
+    def _get(self, userId, id, format='full', metadataHeaders=None):
+        def run():
+            self.calls['get'] += 1
+            if id not in self.messages or id in self.fail_gets:
+                raise HttpError(404, f'Not found: {id}')
+            message = copy.deepcopy(self.messages[id])
+            if format == 'raw':
+                del message['payload']
+                message['raw'] = b64(self.raw(id))
+            elif format == 'metadata':
+                message['payload'].pop('parts', None)
+                if metadataHeaders:
+                    wanted = {name.lower() for name in metadataHeaders}
+                    message['payload']['headers'] = [h for h in message['payload']['headers'] if h['name'].lower() in wanted]
+            elif format == 'minimal':
+                del message['payload']
+            return message
+        return Request(run)
+
+    def _batch_modify(self, userId, body):
+        def run():
+            self.calls['batchModify'] += 1
+            for gmail_id in body['ids']:
+                message = self.messages.get(gmail_id)
+                if message is not None:
+                    labels = [label for label in message['labelIds'] if label not in body.get('removeLabelIds', [])]
+                    message['labelIds'] = labels + [label for label in body.get('addLabelIds', []) if label not in labels]
+        return Request(run)
+
+    def _batch_delete(self, userId, body):
+        def run():
+            self.calls['batchDelete'] += 1
+            for gmail_id in body['ids']:
+                self.messages.pop(gmail_id, None)
+        return Request(run)
+
+    def _trash(self, userId, id):
+        def run():
+            self.calls['trash'] += 1
+            self.messages[id]['labelIds'] = ['TRASH']
+            return {'id': id, 'labelIds': ['TRASH']}
+        return Request(run)
+
+    def _send(self, userId, body):
+        def run():
+            with self.lock:
+                self.calls['send'] += 1
+                self.sent.append(body)
+                return {'id': f'sent-{len(self.sent)}', 'threadId': f'sent-{len(self.sent)}'}
+        return Request(run)
+
+    def _import(self, userId, body, **params):
+        def run():
+            raw = base64.urlsafe_b64decode(body['raw'])
+            with self.lock:
+                self.calls['import'] += 1
+                if any(marker in raw for marker in self.fail_imports):
+                    raise HttpError(400, 'Invalid message')
+                self.imported.append({'raw': raw, 'labelIds': body['labelIds']})
+                return {'id': f'imported-{len(self.imported)}', 'labelIds': body['labelIds']}
+        return Request(run)
+
+    def _drafts_create(self, userId, body):
+        def run():
+            raw = base64.urlsafe_b64decode(body['message']['raw'])
+            with self.lock:
+                self.calls['drafts.create'] += 1
+                if any(marker in raw for marker in self.fail_drafts):
+                    raise HttpError(400, 'Invalid draft')
+                draft_id = f'r{len(self.drafts) + 1}'
+                parsed = message_from_bytes(raw)
+                text = parsed.get_payload(decode=True) if not parsed.is_multipart() else b''
+                self.drafts[draft_id] = {'id': draft_id, 'message': {
+                    'id': f'draft-message-{len(self.drafts) + 1}',
+                    'threadId': f'draft-thread-{len(self.drafts) + 1}',
+                    'labelIds': ['DRAFT'],
+                    'snippet': text.decode()[:50],
+                    'payload': {
+                        'mimeType': parsed.get_content_type(),
+                        'headers': [{'name': name, 'value': value} for name, value in parsed.items()],
+                        'body': {'data': b64(text), 'size': len(text)},
+                    },
+                }}
+                return {'id': draft_id, 'message': {'id': self.drafts[draft_id]['message']['id'], 'labelIds': ['DRAFT']}}
+        return Request(run)
+
+    def _drafts_list(self, userId, maxResults=100, pageToken=None):
+        def run():
+            self.calls['drafts.list'] += 1
+            return {'drafts': [
+                {'id': draft['id'], 'message': {'id': draft['message']['id']}}
+                for draft in list(self.drafts.values())[:maxResults]
+            ]}
+        return Request(run)
+
+    def _drafts_get(self, userId, id, format='full'):
+        def run():
+            self.calls['drafts.get'] += 1
+            if id not in self.drafts or id in self.fail_gets:
+                raise HttpError(404, f'Not found: {id}')
+            draft = copy.deepcopy(self.drafts[id])
+            if format == 'metadata':
+                del draft['message']['payload']['body']
+            return draft
+        return Request(run)
+
+    def _attachment(self, userId, messageId, id):
+        def run():
+            self.calls['attachment'] += 1
+            data = attachment_data(messageId, id)
+            return {'data': b64(data), 'size': len(data)}
+        return Request(run)
+
+    def _labels_list(self, userId):
+        def run():
+            self.calls['labels'] += 1
+            return {'labels': copy.deepcopy(self.labels)}
+        return Request(run)
+
+    def _labels_create(self, userId, body):
+        def run():
+            self.calls['labels.create'] += 1
+            label = {**body, 'id': f'Label_{len(self.labels) + 1}', 'type': 'user'}
+            self.labels.append(label)
+            return copy.deepcopy(label)
+        return Request(run)
+
+    def _labels_update(self, userId, id, body):
+        def run():
+            self.calls['labels.update'] += 1
+            [label] = [label for label in self.labels if label['id'] == id]
+            label.update(body)
+            return copy.deepcopy(label)
+        return Request(run)
+
+    def _labels_delete(self, userId, id):
+        def run():
+            self.calls['labels.delete'] += 1
+            self.labels = [label for label in self.labels if label['id'] != id]
+        return Request(run)
+
+    def _history_list(self, userId, startHistoryId, maxResults=100, historyTypes=None, labelId=None, pageToken=None):
+        def run():
+            self.calls['history'] += 1
+            return {'history': copy.deepcopy(self.history), 'historyId': str(int(startHistoryId) + len(self.history))}
+        return Request(run)
+
+    def _threads_get(self, userId, id, format='full'):
+        def run():
+            self.calls['thread'] += 1
+            messages = [copy.deepcopy(m) for m in self.messages.values() if m['threadId'] == id]
+            if not messages:
+                raise HttpError(404, f'Not found: {id}')
+            return {'id': id, 'messages': messages}
+        return Request(run)
+
+    def _threads_list(self, userId, maxResults=100, q=None, pageToken=None, labelIds=None, includeSpamTrash=False):
+        def run():
+            found = [m for m in self.messages.values() if self.matches(m, q or '', labelIds)]
+            thread_ids = list(dict.fromkeys(m['threadId'] for m in found))[:maxResults]
+            return {'threads': [{'id': thread_id} for thread_id in thread_ids]}
+        return Request(run)
+
+    def users(self):
+        return _Resource(
+            messages=lambda: _Resource(
+                list=self._list,
+                get=self._get,
+                batchModify=self._batch_modify,
+                batchDelete=self._batch_delete,
+                trash=self._trash,
+                send=self._send,
+                import_=self._import,
+                insert=self._import,
+                attachments=lambda: _Resource(get=self._attachment),
+            ),
+            labels=lambda: _Resource(
+                list=self._labels_list,
+                create=self._labels_create,
+                update=self._labels_update,
+                delete=self._labels_delete,
+            ),
+            history=lambda: _Resource(list=self._history_list),
+            drafts=lambda: _Resource(create=self._drafts_create, list=self._drafts_list, get=self._drafts_get),
+            threads=lambda: _Resource(get=self._threads_get, list=self._threads_list),
+            getProfile=lambda userId: Request(lambda: {'emailAddress': 'me@example.com', 'messagesTotal': len(self.messages)}),
+        )
+
+
+class FakeService:
+    def __init__(self, mailbox: FakeMailbox):
+        self.mailbox = mailbox
+        self._http = None
+
+    def users(self):
+        return self.mailbox.users()
+
+    def new_batch_http_request(self, callback=None):
+        return BatchRequest(self.mailbox, callback)
+
+
+class FakeAuth:
+    cassette = None
+
+    def __init__(self, mailbox: FakeMailbox):
+        self.mailbox = mailbox
+
+    def get_service(self):
+        return FakeService(self.mailbox)
+
+
+class FakeJobContext:
+    # Stands in for background.JobContext when a job tool runs inline
+    def __init__(self):
+        self.cancel_event = threading.Event()
+        self.reports: List[tuple] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def report(self, progress, total=None, message=None) -> None:
+        self.reports.append((progress, total, message))
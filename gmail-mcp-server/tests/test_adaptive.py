@@ -0,0 +1,49 @@
+from gmail_mcp.adaptive import MAX_BACKOFF, BatchController, is_congestion, is_throttled
+
+from fakes import HttpError
+
+
+def test_throttle_detection():
+    assert is_throttled(HttpError(429))
+    assert is_throttled(HttpError(403, 'rateLimitExceeded'))
+    assert not is_throttled(HttpError(403, 'insufficientPermissions'))
+    assert not is_throttled(ValueError('429'))
+    assert is_congestion(HttpError(503)) and not is_congestion(HttpError(404))
+
+
+def test_window_grows_on_full_batches_and_halves_on_throttling():
+    control = BatchController(20, minimum=5, maximum=50, max_concurrency=2)
+    for _ in range(4):
+        control.record(control.size, elapsed=0.1)
+    assert control.stats()['size'] > 20
+
+    before = control._window
+    backoff = control.record(control.size, elapsed=0.1, throttled=1)
+    assert 0 < backoff <= MAX_BACKOFF
+    assert control._window == before * 0.5
+
+
+def test_window_shrinks_once_per_round_trip():
+    control = BatchController(80, minimum=5, maximum=50)
+    control.record(40, elapsed=0.0, throttled=1)
+    window = control._window
+    # Started before the first decrease: same congestion, no second cut
+    assert control.record(40, elapsed=10.0, throttled=1) == 0.0
+    assert control._window == window
+
+
+def test_partial_batches_do_not_grow_the_window():
+    control = BatchController(20, minimum=5, maximum=50)
+    control.record(3, elapsed=0.1)
+    assert control.size == 20
+
+
+def test_slow_batches_shrink_and_fixed_never_changes():
+    control = BatchController(40, minimum=5, maximum=100, target_latency=1.0)
+    control.record(40, elapsed=2.0)
+    assert control.size == 20 and control.stats()['slow'] == 1
+
+    fixed = BatchController.fixed(25)
+    fixed.record(25, elapsed=0.1)
+    fixed.record(25, elapsed=0.1, throttled=5)
+    assert fixed.size == 25 and fixed.concurrency == 1
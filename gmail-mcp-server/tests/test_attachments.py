@@ -0,0 +1,34 @@
+import os
+
+from gmail_mcp.attachments import AttachmentStore
+from gmail_mcp.gmail_client import GmailClient
+
+from fakes import FakeAuth, attachment_data, message_id
+
+
+def test_saved_attachments_are_independent_copies(mailbox, tmp_path):
+    client = GmailClient(FakeAuth(mailbox), attachments=AttachmentStore(tmp_path / 'store'))
+    gmail_id = message_id(1)
+    first = client.save_attachment(gmail_id, 'att-1', str(tmp_path / 'a' / 'one.bin'))
+    second = client.save_attachment(gmail_id, 'att-1', str(tmp_path / 'b' / 'one.bin'))
+
+    assert mailbox.calls['attachment'] == 1
+    assert second.read_bytes() == attachment_data(gmail_id, 'att-1')
+    assert os.stat(second).st_nlink == 1
+    # The caller owns the file: it can be changed without touching the cache
+    second.write_bytes(b'edited')
+    assert first.read_bytes() == attachment_data(gmail_id, 'att-1')
+    assert client.get_attachment(gmail_id, 'att-1') == attachment_data(gmail_id, 'att-1')
+
+
+def test_evicted_blob_is_downloaded_again(mailbox, tmp_path):
+    store = AttachmentStore(tmp_path / 'store', max_bytes=40)
+    client = GmailClient(FakeAuth(mailbox), attachments=store)
+    gmail_id = message_id(1)
+    client.get_attachment(gmail_id, 'att-1')
+    # A second blob pushes the store over its limit and evicts the first
+    client.get_attachment(gmail_id, 'att-2')
+
+    saved = client.save_attachment(gmail_id, 'att-1', str(tmp_path / 'one.bin'))
+    assert saved.read_bytes() == attachment_data(gmail_id, 'att-1')
+    assert mailbox.calls['attachment'] == 3
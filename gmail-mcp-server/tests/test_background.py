@@ -0,0 +1,113 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from mcp.server.lowlevel.server import request_ctx
+from mcp.shared.context import RequestContext
+from mcp.types import RequestParams
+
+from gmail_mcp.server import GmailServer
+from gmail_mcp.tools import BackgroundArgs, registry
+
+
+def _job_spec(handler):
+    return SimpleNamespace(name='test_job', kind='job', handler=handler, timeout=None, max_concurrency=None)
+
+
+async def _call(server, name, **args):
+    spec = registry.get(name)
+    return await server._invoke(spec, spec.validate(args))
+
+
+def _run(client, scenario):
+    async def main():
+        server = GmailServer()
+        server.client = client
+        try:
+            return await scenario(server)
+        finally:
+            server.jobs.shutdown()
+    return asyncio.run(main())
+
+
+def test_start_status_result(client):
+    release = threading.Event()
+
+    def handler(client, args, context):
+        context.report(1, 2, 'halfway')
+        release.wait(5)
+        context.report(2, 2, 'done')
+        return {'ok': True}
+
+    async def scenario(server):
+        started = await server._invoke(_job_spec(handler), BackgroundArgs())
+        job_id = started['job_id']
+        assert started['status'] == 'running'
+        with pytest.raises(Exception, match='still running'):
+            await _call(server, 'gmail_job_result', job_id=job_id)
+
+        release.set()
+        status = await _call(server, 'gmail_job_status', job_id=job_id, wait_seconds=5)
+        assert (status['status'], status['progress'], status['total'], status['message']) == ('completed', 2, 2, 'done')
+        result = await _call(server, 'gmail_job_result', job_id=job_id)
+        assert result['result'] == {'ok': True}
+
+    _run(client, scenario)
+
+
+def test_cancel_mid_run(client):
+    def handler(client, args, context):
+        steps = 0
+        while not context.cancelled and steps < 500:
+            context.cancel_event.wait(0.01)
+            steps += 1
+        return {'steps': steps}
+
+    async def scenario(server):
+        job_id = (await server._invoke(_job_spec(handler), BackgroundArgs()))['job_id']
+        cancelling = await _call(server, 'gmail_job_cancel', job_id=job_id)
+        assert cancelling['status'] == 'cancelling'
+        status = await _call(server, 'gmail_job_status', job_id=job_id, wait_seconds=5)
+        assert status['status'] == 'cancelled'
+        assert (await _call(server, 'gmail_job_result', job_id=job_id))['result']['steps'] < 500
+
+    _run(client, scenario)
+
+
+def test_progress_is_relayed_as_notifications(client):
+    notifications = []
+
+    class Session:
+        async def send_progress_notification(self, token, progress, total=None):
+            notifications.append((token, progress, total))
+
+    def handler(client, args, context):
+        for step in range(1, 4):
+            context.report(step, 3)
+            threading.Event().wait(0.05)
+        return 'done'
+
+    async def scenario(server):
+        request_ctx.set(RequestContext(1, RequestParams.Meta(progressToken='token-1'), Session(), None))
+        return await server._invoke(_job_spec(handler), BackgroundArgs(background=False))
+
+    assert _run(client, scenario) == 'done'
+    assert notifications and all(token == 'token-1' and total == 3 for token, _, total in notifications)
+    assert [progress for _, progress, _ in notifications] == sorted(progress for _, progress, _ in notifications)
+
+
+def test_failed_job(client):
+    def handler(client, args, context):
+        raise ValueError('boom')
+
+    async def scenario(server):
+        job_id = (await server._invoke(_job_spec(handler), BackgroundArgs()))['job_id']
+        status = await _call(server, 'gmail_job_status', job_id=job_id, wait_seconds=5)
+        assert (status['status'], status['error']) == ('failed', 'boom')
+        assert (await _call(server, 'gmail_job_result', job_id=job_id))['result'] is None
+        # Waited-on jobs raise the job's error to the caller
+        with pytest.raises(Exception, match='boom'):
+            await server._invoke(_job_spec(handler), BackgroundArgs(background=False))
+
+    _run(client, scenario)
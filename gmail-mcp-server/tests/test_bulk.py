@@ -0,0 +1,55 @@
+from functools import partial
+
+import pytest
+
+from gmail_mcp import tools
+from gmail_mcp.bulk import BulkJob
+
+from fakes import FakeJobContext
+
+
+def test_same_spec_resumes(client, mailbox, tmp_path):
+    BulkJob(client, job_id='purge', query='subject:message', journal_dir=tmp_path).run()
+    status = BulkJob(client, job_id='purge', query='subject:message', journal_dir=tmp_path).run()
+    assert status['processed'] == 20
+    assert mailbox.calls['list'] == 1
+
+
+@pytest.mark.parametrize('changed', [{'operation': 'delete'}, {'query': 'subject:other'}, {'include_spam_trash': True}])
+def test_changed_spec_raises_naming_the_fields(client, tmp_path, changed):
+    BulkJob(client, job_id='purge', query='subject:message', journal_dir=tmp_path)
+    spec = {'query': 'subject:message', **changed}
+    with pytest.raises(ValueError, match=f'different .*{next(iter(changed))}'):
+        BulkJob(client, job_id='purge', journal_dir=tmp_path, **spec)
+
+
+def test_label_lists_compare_as_sets(client, tmp_path):
+    spec = {'job_id': 'relabel', 'operation': 'modify', 'journal_dir': tmp_path}
+    BulkJob(client, **spec, add_labels=['Work', 'STARRED'], remove_labels=['INBOX'])
+    BulkJob(client, **spec, add_labels=['STARRED', 'Work', 'Work'], remove_labels=['INBOX'])
+    with pytest.raises(ValueError, match='different add_labels'):
+        BulkJob(client, **spec, add_labels=['Work'], remove_labels=['INBOX'])
+    with pytest.raises(ValueError, match='different remove_labels'):
+        BulkJob(client, **spec, add_labels=['Work', 'STARRED'], remove_labels=['UNREAD'])
+
+
+@pytest.fixture
+def bulk_tool(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(tools, 'BulkJob', partial(BulkJob, journal_dir=tmp_path))
+    spec = tools.registry.get('gmail_bulk_job')
+    return lambda **args: spec.handler(client, spec.validate(args), FakeJobContext())
+
+
+def test_tool_rerun_with_same_arguments_resumes(bulk_tool, mailbox):
+    first = bulk_tool(job_id='purge', operation='trash', query='subject:message')
+    again = bulk_tool(job_id='purge', operation='trash', query='subject:message')
+    assert first['processed'] == again['processed'] == 20
+    assert mailbox.calls['list'] == 1
+
+
+@pytest.mark.parametrize('changed', [{'operation': 'delete'}, {'query': 'subject:other'}, {'add_labels': ['Work']}])
+def test_tool_does_not_resume_under_new_arguments(bulk_tool, mailbox, changed):
+    bulk_tool(job_id='purge', operation='trash', query='subject:message')
+    with pytest.raises(ValueError, match=f'different .*{next(iter(changed))}'):
+        bulk_tool(**{'job_id': 'purge', 'operation': 'trash', 'query': 'subject:message', **changed})
+    assert 'batchDelete' not in mailbox.calls and 'batchModify' not in mailbox.calls
@@ -0,0 +1,93 @@
+import gzip
+import json
+from urllib.parse import urlparse
+
+import httplib2
+from google.oauth2.credentials import Credentials
+
+from gmail_mcp import auth
+from gmail_mcp.auth import GmailAuth
+from gmail_mcp.cassette import Cassette, _batch_requests
+from gmail_mcp.gmail_client import GmailClient
+
+from fakes import message_id
+
+TOKEN = 'ya29.secret-token'
+
+
+class GmailHttp:
+    # Answers plain and batched message gets from the fake mailbox, and
+    # remembers every Authorization header it was sent
+    def __init__(self, mailbox):
+        self.mailbox = mailbox
+        self.authorizations = []
+
+    def _answer(self, method, uri, headers):
+        self.authorizations.append({k.lower(): v for k, v in (headers or {}).items()}.get('authorization'))
+        path = urlparse(uri).path
+        if path.endswith('/token'):
+            return 200, json.dumps({'access_token': TOKEN, 'expires_in': 3599})
+        if path.endswith('/labels'):
+            return 200, json.dumps({'labels': self.mailbox.labels})
+        gmail_id = path.rsplit('/', 1)[-1]
+        if gmail_id not in self.mailbox.messages:
+            return 404, json.dumps({'error': {'code': 404, 'message': 'Not Found'}})
+        return 200, json.dumps(self.mailbox.messages[gmail_id])
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        if not urlparse(uri).path.startswith('/batch'):
+            status, content = self._answer(method, uri, headers)
+            return httplib2.Response({
+                'status': str(status), 'content-type': 'application/json', 'set-cookie': 'SID=secret-cookie'
+            }), content.encode()
+        # Every part is signed with the same credentials
+        signed = dict(line.strip().split(': ', 1) for line in body.splitlines() if line.lower().startswith('authorization: '))
+        parts = []
+        for content_id, sub_method, sub_uri, _ in _batch_requests(headers, body):
+            status, content = self._answer(sub_method, sub_uri, signed)
+            parts.append(
+                f'--reply\r\nContent-Type: application/http\r\nContent-ID: {content_id.replace("<", "<response-", 1)}\r\n\r\n'
+                f'HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\nSet-Cookie: SID=secret-cookie\r\n\r\n{content}\r\n'
+            )
+        response = httplib2.Response({'status': '200', 'content-type': 'multipart/mixed; boundary=reply'})
+        return response, (''.join(parts) + '--reply--\r\n').encode()
+
+
+def test_record_then_replay_offline(mailbox, tmp_path, monkeypatch):
+    path = tmp_path / 'gmail.cassette.gz'
+    ids = [message_id(index) for index in range(1, 7)]
+
+    server = GmailHttp(mailbox)
+    monkeypatch.setattr(auth.httplib2, 'Http', lambda: server)
+    recording = Cassette(path, mode='record')
+    recorder = GmailAuth(cassette=recording)
+    recorder.creds = Credentials(TOKEN)
+    client = GmailClient(recorder)
+    recorded = client.get_messages_batch(ids, batch_size=4)
+    labels = client.list_labels()
+    http = client.service._http
+    http.request('https://oauth2.googleapis.com/token', 'POST', body=f'refresh_token=1//secret&access_token={TOKEN}')
+    http.request(f'https://gmail.googleapis.com/gmail/v1/users/me/labels/INBOX?access_token={TOKEN}&key=secret-key')
+    recording.close()
+
+    # The token reached the server on every request, batched or not
+    assert server.authorizations and all(value == f'Bearer {TOKEN}' for value in server.authorizations)
+    assert len(recorded['messages']) == 6 and recording.counts['recorded'] == 9
+
+    stored = gzip.decompress(path.read_bytes()).decode()
+    for secret in (TOKEN, 'secret-cookie', 'secret-key', '1//secret'):
+        assert secret not in stored
+    interactions = [json.loads(line) for line in stored.splitlines()[1:]]
+    assert sum(interaction['batched'] for interaction in interactions) == 6
+
+    # Replay needs neither credentials nor a network
+    monkeypatch.setattr(auth.httplib2, 'Http', None)
+    replay = Cassette(path, mode='replay', latency=False)
+    offline = GmailClient(GmailAuth(cassette=replay))
+    # Recorded in batches of four, replayed in threes and as single gets
+    replayed = offline.get_messages_batch(ids + [message_id(99)], batch_size=3)
+    assert replayed['messages'] == recorded['messages']
+    assert list(replayed['errors']) == [message_id(99)]
+    assert offline.get_message(message_id(2))['id'] == message_id(2)
+    assert offline.list_labels() == labels
+    assert replay.counts == {'recorded': 0, 'replayed': 8, 'misses': 1}
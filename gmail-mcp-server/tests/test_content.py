@@ -0,0 +1,25 @@
+from gmail_mcp.tools import registry
+
+from fakes import make_message
+
+
+def test_library_keeps_html_and_tool_drops_it(client, mailbox):
+    message = make_message(50, text='Plain body', html='<p>Plain <b>body</b></p>')
+    mailbox.add(message)
+
+    content = client.get_message_content(message['id'])
+    assert content['body']['html'] == '<p>Plain <b>body</b></p>'
+    assert client.get_messages_content([message['id']])['messages'][0]['body']['html']
+
+    spec = registry.get('gmail_get_message_content')
+    result = spec.handler(client, spec.validate({'message_id': message['id']}))
+    assert 'html' not in result['body']
+    assert result['body']['text'] == 'Plain body'
+
+
+def test_html_only_messages_get_text(client, mailbox):
+    message = make_message(51, html='<h1>Hello</h1><p>World &amp; friends</p>')
+    mailbox.add(message)
+    spec = registry.get('gmail_get_message_content')
+    result = spec.handler(client, spec.validate({'message_id': message['id']}))
+    assert 'Hello' in result['body']['text'] and 'World & friends' in result['body']['text']
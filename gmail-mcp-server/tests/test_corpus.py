@@ -0,0 +1,29 @@
+import base64
+
+from gmail_mcp import mime
+from gmail_mcp.corpus import CorpusGenerator
+from gmail_mcp.gmail_client import GmailClient
+
+
+def _attachments(content):
+    return [(a['filename'], a['mimeType']) for a in content['attachments']]
+
+
+def test_full_and_raw_resources_parse_the_same():
+    generator = CorpusGenerator(seed=1, profile='small', charset_rate=0.3, attachment_rate=0.3)
+    for _ in range(300):
+        message = generator.message()
+        full = GmailClient.parse_message_content(message['full'])
+        raw = mime.parse_raw_message(message['resource_raw'])
+        assert full['headers'] == raw['headers'], message['full']['id']
+        assert full['body'] == raw['body'], message['full']['id']
+        assert _attachments(full) == _attachments(raw), message['full']['id']
+
+
+def test_full_resources_decode_headers_and_charsets():
+    generator = CorpusGenerator(seed=1, profile='small', charset_rate=1.0, plain_only_rate=1.0, attachment_rate=0.0)
+    for _ in range(20):
+        payload = generator.message()['full']['payload']
+        assert not any('=?' in header['value'] for header in payload['headers'])
+        # Whatever charset the part declares, body data is UTF-8
+        base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8')
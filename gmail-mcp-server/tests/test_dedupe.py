@@ -0,0 +1,99 @@
+from array import array
+
+import pytest
+
+from gmail_mcp import dedupe
+from gmail_mcp.dedupe import DEFAULT_NUM_PERM, DuplicateFinder, lsh_params, minhash, shingles, similarity, words
+from gmail_mcp.gmail_client import GmailClient
+from gmail_mcp.tools import registry
+
+from fakes import FakeAuth, FakeJobContext, FakeMailbox, make_message
+
+
+FILLER = ' '.join(f'word{n}' for n in range(20))
+
+
+def _signature(changes):
+    # Slots not listed agree across every signature
+    signature = array('I', [7]) * DEFAULT_NUM_PERM
+    for slot, value in changes.items():
+        signature[slot] = value
+    return signature
+
+
+# A~B and B~C are 56/64 similar, A~C only 48/64
+SIGNATURES = {
+    'issuea': _signature({}),
+    'issueb': _signature({slot: 1 for slot in range(8)}),
+    'issuec': _signature({**{slot: 1 for slot in range(8)}, **{slot: 2 for slot in range(8, 16)}}),
+}
+
+
+@pytest.fixture
+def chained(monkeypatch):
+    # Hash randomisation makes real signatures differ per run, so each body
+    # gets a fixed signature picked by its first word
+    real = dedupe.minhash
+
+    def fixed(features, num_perm=DEFAULT_NUM_PERM):
+        key = features[0][0] if features else None
+        return SIGNATURES[key] if key in SIGNATURES else real(features, num_perm)
+
+    monkeypatch.setattr(dedupe, 'minhash', fixed)
+    return FakeMailbox([
+        make_message(1, subject='Newsletter #1', text=f'issuea {FILLER}'),
+        make_message(2, subject='Newsletter #2', text=f'issueb {FILLER}'),
+        make_message(3, subject='Newsletter #3', text=f'issuec {FILLER}'),
+    ])
+
+
+def test_similarity_estimates_jaccard():
+    base = words(' '.join(f'token{n}' for n in range(400)))
+    edited = base[:360] + [f'other{n}' for n in range(40)]
+    left = minhash(shingles(base), 256)
+    right = minhash(shingles(edited), 256)
+    assert similarity(left, left) == 1.0
+    assert 0.7 < similarity(left, right) < 0.95
+
+
+def test_lsh_params_cover_num_perm():
+    bands, rows = lsh_params(64, 0.8)
+    assert bands * rows == 64
+    assert (1 / bands) ** (1 / rows) <= 0.8
+
+
+def test_chained_near_duplicates_are_related_not_duplicates(chained):
+    assert similarity(SIGNATURES['issuea'], SIGNATURES['issueb']) >= 0.8
+    assert similarity(SIGNATURES['issuea'], SIGNATURES['issuec']) < 0.8
+
+    result = DuplicateFinder(GmailClient(FakeAuth(chained)), threshold=0.8).run()
+    (cluster,) = result['clusters']
+    ids = [message['id'] for message in chained.messages.values()]
+    assert cluster['keep'] == ids[0]
+    assert cluster['duplicates'] == [ids[1]]
+    assert cluster['related'] == [ids[2]]
+    assert result['duplicate_ids'] == [ids[1]]
+
+
+def test_exact_matches_count_even_without_similarity(chained):
+    # Same body as the kept copy, reached only through C in the chain
+    copy = make_message(4, text=f'issuea {FILLER}')
+    chained.add(copy)
+    result = DuplicateFinder(GmailClient(FakeAuth(chained)), threshold=0.8).run()
+    assert copy['id'] in result['duplicate_ids']
+    assert make_message(3)['id'] not in result['duplicate_ids']
+
+
+def test_trash_duplicates_leaves_related_messages(chained):
+    spec = registry.get('gmail_find_duplicates')
+    args = spec.validate({'trash_duplicates': True, 'background': False})
+    result = spec.handler(GmailClient(FakeAuth(chained)), args, FakeJobContext())
+    trashed = [gmail_id for gmail_id, message in chained.messages.items() if 'TRASH' in message['labelIds']]
+    assert result['trashed'] == 1
+    assert trashed == [make_message(2)['id']]
+
+
+def test_short_bodies_only_match_on_message_id():
+    mailbox = FakeMailbox([make_message(1, text='Thanks!'), make_message(2, text='Thanks!')])
+    result = DuplicateFinder(GmailClient(FakeAuth(mailbox))).run()
+    assert result['clusters'] == []
@@ -0,0 +1,50 @@
+def _draft(subject, **kwargs):
+    return {'to': ['bob@example.com'], 'subject': subject, 'body': f'Body of {subject}', **kwargs}
+
+
+def test_create_drafts_reports_failures_in_order(client, mailbox):
+    mailbox.fail_drafts = {b'Body of Rejected'}
+
+    result = client.create_drafts([
+        _draft('First'),
+        _draft('Missing attachment', attachments=['/nonexistent/report.pdf']),
+        _draft('Rejected'),
+        _draft('Last'),
+    ], batch_size=2)
+
+    assert [draft and draft['id'] for draft in result['drafts']] == ['r1', None, None, 'r2']
+    assert set(result['errors']) == {'1', '2'}
+    assert 'Attachment not found' in result['errors']['1']
+    assert 'Invalid draft' in result['errors']['2']
+    # The unbuildable draft never reached the API
+    assert mailbox.calls['drafts.create'] == 3
+    assert mailbox.calls['batch'] == 2
+
+
+def test_get_drafts(client, mailbox):
+    client.create_drafts([_draft('First'), _draft('Second')])
+
+    result = client.get_drafts(['r2', 'missing', 'r1', 'r2'])
+    assert [draft['id'] for draft in result['drafts']] == ['r2', 'r1']
+    assert list(result['errors']) == ['missing']
+    assert mailbox.calls['drafts.get'] == 3
+
+    [draft] = client.get_drafts(['r1'], format='metadata')['drafts']
+    assert 'body' not in draft['message']['payload']
+
+
+def test_list_drafts_hydrates_in_one_batch(client, mailbox):
+    client.create_drafts([_draft('First', cc=['carol@example.com']), _draft('Second'), _draft('Third')])
+    mailbox.fail_gets = {'r3'}
+    batches = mailbox.calls['batch']
+
+    assert [draft.keys() for draft in client.list_drafts()['drafts']] == [{'id', 'message'}] * 3
+
+    result = client.list_drafts(hydrate=True)
+    assert mailbox.calls['batch'] == batches + 1
+    assert [(d['id'], d['subject'], d['to'], d['cc']) for d in result['drafts']] == [
+        ('r1', 'First', 'bob@example.com', 'carol@example.com'),
+        ('r2', 'Second', 'bob@example.com', None),
+    ]
+    assert result['drafts'][0]['messageId'] == 'draft-message-1'
+    assert list(result['errors']) == ['r3']
@@ -0,0 +1,35 @@
+import gzip
+
+from gmail_mcp.export import MailboxExporter
+from gmail_mcp.importer import iter_mbox
+
+
+def test_compressed_mbox_gets_suffix_and_reads_back(client, tmp_path):
+    status = MailboxExporter(client, tmp_path / 'backup.mbox', compression='gzip').run()
+
+    assert status['path'] == str(tmp_path / 'backup.mbox.gz')
+    assert status['exported'] == 20
+    messages = list(iter_mbox(status['path']))
+    assert len(messages) == 20
+    assert messages[0].labels == ['INBOX']
+
+
+def test_importer_sniffs_compression(client, tmp_path):
+    status = MailboxExporter(client, tmp_path / 'backup.mbox').run()
+    plain = (tmp_path / 'backup.mbox').read_bytes()
+    misnamed = tmp_path / 'backup'
+    misnamed.write_bytes(gzip.compress(plain))
+
+    assert [m.raw for m in iter_mbox(misnamed)] == [m.raw for m in iter_mbox(status['path'])]
+
+
+def test_mbox_export_resumes_after_cancel(client, mailbox, tmp_path):
+    first = MailboxExporter(client, tmp_path / 'backup.mbox', batch_size=5, concurrency=1)
+    first.run(progress=lambda status: first.cancel())
+    assert first.stats['exported'] == 5
+
+    resumed = MailboxExporter(client, tmp_path / 'backup.mbox', batch_size=5, concurrency=1)
+    assert len(resumed._resume_mbox()) == 5
+    status = MailboxExporter(client, tmp_path / 'backup.mbox', batch_size=5, concurrency=1).run()
+    assert (status['exported'], status['skipped']) == (15, 5)
+    assert len(list(iter_mbox(tmp_path / 'backup.mbox'))) == 20
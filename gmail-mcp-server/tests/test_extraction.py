@@ -0,0 +1,26 @@
+from gmail_mcp.extraction import TaskExtractor
+
+from fakes import make_message, message_id
+
+
+def test_worker_pool_matches_inline_extraction(client, mailbox):
+    mailbox.add(make_message(70, subject='Release', text='- todo: ship the release\n- lunch on friday'))
+    categories = {'task': ['todo', 'ship'], 'social': ['lunch']}
+
+    inline = list(TaskExtractor(client, categories, workers=1, batch_size=8).iter_records())
+    pooled = list(TaskExtractor(client, categories, workers=2, batch_size=8).iter_records())
+
+    assert pooled == inline
+    [record] = [r for r in pooled if r['subject'] == 'Release']
+    assert record['categories'] == ['social', 'task']
+    assert record['tasks'] == ['todo: ship the release']
+
+
+def test_run_reports_failed_fetches(client, mailbox, tmp_path):
+    mailbox.fail_gets = {message_id(3), message_id(11)}
+
+    summary = TaskExtractor(client, {'task': ['todo']}, workers=1, batch_size=8).run(tmp_path / 'tasks.jsonl')
+
+    assert summary['total_messages_analyzed'] == 18
+    assert summary['failed'] == 2
+    assert set(summary['errors']) == {message_id(3), message_id(11)}
@@ -0,0 +1,29 @@
+import pytest
+
+from gmail_mcp.html_text import html_to_text
+
+
+def test_unclosed_head_ends_at_body():
+    assert html_to_text('<html><head><title>x</title><body><p>Hello world</p></body>') == 'Hello world'
+    assert html_to_text('<head><title>x</title><meta charset="utf-8">Hello') == 'Hello'
+
+
+def test_unclosed_hidden_paragraph_ends_at_next_block():
+    assert html_to_text('<p style="display:none">pre<p>Visible text') == 'Visible text'
+
+
+@pytest.mark.parametrize('html, text', [
+    ('<ul><li hidden>a<li>b</ul>', '- b'),
+    ('<table><tr><td style="display:none">x<td>y</tr></table>', 'y'),
+    ('<td hidden><table><tr><td>nested</td></tr></table><td>shown', 'shown'),
+    ('<div hidden><div>inner</div>still hidden</div>after', 'after'),
+    ('<ul><li hidden>a</ul><p>next', 'next'),
+])
+def test_implied_end_tags_end_hidden_elements(html, text):
+    assert html_to_text(html) == text
+
+
+def test_document_ending_inside_hidden_element_keeps_its_text():
+    assert html_to_text('<p>Intro</p><div style="display:none">never <b>closed</b>') == 'Intro\n\nnever closed'
+    # Scripts and styles never leak into the output
+    assert html_to_text('<p>Intro</p><script>var secret = 1') == 'Intro'
@@ -0,0 +1,44 @@
+import pytest
+
+from gmail_mcp import ids
+from gmail_mcp.ids import IdSet, decode_id, encode_id
+
+
+def test_encode_round_trip():
+    assert decode_id(encode_id('18c2f0a1b2c3d4e5')) == '18c2f0a1b2c3d4e5'
+    with pytest.raises(ValueError):
+        encode_id('0abc')
+    with pytest.raises(ValueError):
+        encode_id('not-hex')
+    with pytest.raises(ValueError):
+        encode_id('1' + '0' * 16)
+
+
+def test_idset_dedupes_and_iterates_sorted():
+    id_set = IdSet(['1a', 'ff', '1a', '2b'])
+    assert len(id_set) == 3
+    assert list(id_set) == ['1a', '2b', 'ff']
+    assert '2b' in id_set and 'abc' not in id_set and 'bad id' not in id_set
+
+
+def test_set_operations():
+    left, right = IdSet(['1', '2', '3']), IdSet(['2', '3', '4'])
+    assert list(left | right) == ['1', '2', '3', '4']
+    assert list(left & right) == ['2', '3']
+    assert list(left - right) == ['1']
+
+
+def test_pure_python_fallback(monkeypatch):
+    monkeypatch.setattr(ids, 'np', None)
+    left, right = IdSet(['5', '1', '3']), IdSet(['3', '4'])
+    assert list(left | right) == ['1', '3', '4', '5']
+    assert list(left & right) == ['3']
+    assert list(left - right) == ['1', '5']
+
+
+def test_pending_adds_are_compacted(monkeypatch):
+    monkeypatch.setattr(ids, 'PENDING_LIMIT', 4)
+    id_set = IdSet()
+    id_set.update(format(value, 'x') for value in range(1, 11))
+    assert len(id_set) == 10
+    assert list(id_set.chunks(4)) == [['1', '2', '3', '4'], ['5', '6', '7', '8'], ['9', 'a']]
@@ -0,0 +1,62 @@
+from gmail_mcp.importer import MailboxImporter
+
+
+def _mbox(path, *messages):
+    chunks = []
+    for index, (labels, subject) in enumerate(messages, 1):
+        chunks.append(
+            f'From sender@example.com Mon Jan  1 00:00:00 2024\n'
+            f'Message-ID: <import-{index}@example.com>\n'
+            f'X-Gmail-Labels: {labels}\n'
+            f'Subject: {subject}\n\n'
+            f'Body {index}\n\n'
+        )
+    path.write_text(''.join(chunks))
+    return path
+
+
+def _importer(client, source, tmp_path, **kwargs):
+    return MailboxImporter(client, source, journal_dir=tmp_path / 'jobs', batch_size=2, concurrency=1, **kwargs)
+
+
+def test_rerun_skips_imported_messages(client, mailbox, tmp_path):
+    source = _mbox(tmp_path / 'mail.mbox', ('Inbox', 'One'), ('Inbox', 'Two'), ('Inbox', 'Three'))
+    assert _importer(client, source, tmp_path).run()['imported'] == 3
+
+    rerun = _importer(client, source, tmp_path).run()
+    assert (rerun['imported'], rerun['duplicates']) == (0, 3)
+    assert mailbox.calls['import'] == 3
+
+    _mbox(source, ('Inbox', 'One'), ('Inbox', 'Two'), ('Inbox', 'Three'), ('Inbox', 'Four'))
+    assert _importer(client, source, tmp_path).run()['imported'] == 1
+    assert [m['raw'].count(b'Subject: Four') for m in mailbox.imported] == [0, 0, 0, 1]
+
+
+def test_labels_map_to_ids_and_missing_ones_are_created(client, mailbox, tmp_path):
+    source = _mbox(tmp_path / 'mail.mbox', ('Inbox,Work,Projects,Opened', 'One'), ('Old stuff', 'Two'))
+
+    result = _importer(client, source, tmp_path, label_map={'old stuff': 'Work'}, add_labels=['Imported']).run()
+
+    assert result['imported'] == 2
+    created = {label['name']: label['id'] for label in mailbox.labels if label['name'] in ('Projects', 'Imported')}
+    assert set(created) == {'Projects', 'Imported'}
+    assert [m['labelIds'] for m in mailbox.imported] == [
+        ['INBOX', 'Label_1', created['Projects'], created['Imported']],
+        ['Label_1', created['Imported']],
+    ]
+    assert mailbox.calls['labels.create'] == 2
+
+
+def test_failed_message_is_reported_and_retried(client, mailbox, tmp_path):
+    source = _mbox(tmp_path / 'mail.mbox', ('Inbox', 'One'), ('Inbox', 'Broken'), ('Inbox', 'Three'))
+    mailbox.fail_imports = {b'Subject: Broken'}
+
+    result = _importer(client, source, tmp_path).run()
+    assert (result['imported'], result['failed']) == (2, 1)
+    [(failed_source, error)] = result['errors'].items()
+    assert failed_source.startswith('mail.mbox:') and 'Invalid message' in error
+
+    # Failures are not journaled, so a rerun only retries that message
+    mailbox.fail_imports = set()
+    rerun = _importer(client, source, tmp_path).run()
+    assert (rerun['imported'], rerun['duplicates'], rerun['failed']) == (1, 2, 0)
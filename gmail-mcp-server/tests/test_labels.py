@@ -0,0 +1,54 @@
+import pytest
+
+
+def test_resolves_names_to_ids(client, mailbox):
+    # System and Label_N ids pass through without loading the label list
+    assert client.labels.resolve(['INBOX', 'Label_7']) == ['INBOX', 'Label_7']
+    assert mailbox.calls['labels'] == 0
+
+    assert client.labels.resolve(['work', 'SENT']) == ['Label_1', 'SENT']
+    assert client.labels.resolve(['Work']) == ['Label_1']
+    assert (client.labels.loads, mailbox.calls['labels']) == (1, 1)
+
+
+def test_miss_reloads_once(client, mailbox):
+    client.labels.resolve(['Work'])
+    mailbox.labels.append({'id': 'Label_9', 'name': 'Elsewhere', 'type': 'user'})
+    assert client.labels.resolve(['Elsewhere', 'Work']) == ['Label_9', 'Label_1']
+    assert mailbox.calls['labels'] == 2
+
+    with pytest.raises(ValueError, match='Unknown label\\(s\\): Missing, Absent'):
+        client.labels.resolve(['Missing', 'Work', 'Absent'])
+    # One reload for the whole call, not one per unknown name
+    assert mailbox.calls['labels'] == 3
+
+
+def test_writes_update_the_cache(client, mailbox):
+    client.labels.resolve(['Work'])
+
+    created = client.create_label('Receipts')
+    assert client.labels.resolve(['receipts']) == [created['id']]
+
+    client.update_label(created['id'], 'Invoices')
+    assert client.labels.resolve(['Invoices']) == [created['id']]
+    with pytest.raises(ValueError, match='Receipts'):
+        client.labels.resolve(['Receipts'])
+
+    client.delete_label('Label_1')
+    assert 'Label_1' not in {label['id'] for label in client.list_labels()}
+    # Only the failed lookup reloaded; the writes were applied in place
+    assert mailbox.calls['labels'] == 2
+
+
+def test_history_with_unknown_label_invalidates(client, mailbox):
+    client.list_labels()
+    mailbox.history = [{'id': '2', 'labelsAdded': [{'message': {'id': 'a', 'labelIds': ['INBOX']}, 'labelIds': ['Label_1']}]}]
+    client.list_history('1')
+    client.list_labels()
+    assert mailbox.calls['labels'] == 1
+
+    mailbox.labels.append({'id': 'Label_5', 'name': 'New', 'type': 'user'})
+    mailbox.history.append({'id': '3', 'messagesAdded': [{'message': {'id': 'b', 'labelIds': ['Label_5']}}]})
+    client.list_history('1')
+    assert client.labels.resolve(['New']) == ['Label_5']
+    assert mailbox.calls['labels'] == 2
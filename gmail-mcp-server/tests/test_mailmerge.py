@@ -0,0 +1,93 @@
+import base64
+import json
+import time
+from email import message_from_bytes
+
+import pytest
+
+from gmail_mcp import mailmerge
+from gmail_mcp.mailmerge import SEND_LOG, MailMerge, MergeTemplate
+
+from fakes import HttpError, Request
+
+
+ROWS = [{'to': f'user{n}@example.com', 'name': f'User {n}'} for n in range(3)]
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(mailmerge.time, 'sleep', lambda seconds: None)
+
+
+def _merge(client, tmp_path, rows=ROWS, **kwargs):
+    kwargs.setdefault('rate', 1000)
+    return MailMerge(client, 'Hi {{name}}', 'Hello {{ name }}', rows, journal_dir=tmp_path, **kwargs)
+
+
+def test_template_fields_and_missing_values():
+    template = MergeTemplate('{{a}} and {{ b }}')
+    assert template.fields == {'a', 'b'}
+    assert template.render({'a': 1, 'b': 'x'}) == '1 and x'
+    with pytest.raises(ValueError):
+        template.render({'a': 1})
+
+
+def test_html_bodies_escape_field_values(client, mailbox, tmp_path):
+    rows = [{'to': 'eve@example.com', 'name': '<script>alert(1)</script> & co'}]
+    merge = MailMerge(client, 'Hi {{name}}', '<p>Hello {{name}}</p>', rows, html=True, journal_dir=tmp_path)
+    assert merge.preview()[0]['body'] == '<p>Hello &lt;script&gt;alert(1)&lt;/script&gt; &amp; co</p>'
+    # Subjects are plain text and stay as they are
+    assert merge.preview()[0]['subject'] == 'Hi <script>alert(1)</script> & co'
+    assert MailMerge(client, 's', '{{name}}', rows, journal_dir=tmp_path).preview()[0]['body'] == rows[0]['name']
+
+
+def test_daily_limit_holds_across_runs(client, mailbox, tmp_path):
+    first = _merge(client, tmp_path, daily_limit=2).run()
+    assert (first['sent'], first['deferred']) == (2, 1)
+    second = _merge(client, tmp_path, daily_limit=2).run()
+    assert (second['sent'], second['deferred']) == (0, 3)
+    assert len(mailbox.sent) == 2
+
+
+def test_old_sends_do_not_count(client, mailbox, tmp_path, monkeypatch):
+    day_old = time.time() - mailmerge.SEND_WINDOW_SECONDS - 60
+    with open(tmp_path / SEND_LOG, 'w') as f:
+        for _ in range(5):
+            f.write(json.dumps({'type': 'sent', 'at': day_old}) + '\n')
+    monkeypatch.setattr(mailmerge, 'MAX_STALE_SENDS', 3)
+    assert _merge(client, tmp_path, daily_limit=3).run()['sent'] == 3
+    # Stale entries were pruned from the log
+    assert len((tmp_path / SEND_LOG).read_text().splitlines()) == 3
+
+
+def test_resume_skips_sent_rows(client, mailbox, tmp_path):
+    _merge(client, tmp_path, rows=ROWS[:2], job_id='launch').run()
+    assert len(mailbox.sent) == 2
+    result = _merge(client, tmp_path, rows=ROWS[:2], job_id='launch').run()
+    assert result['sent'] == 2 and len(mailbox.sent) == 2
+
+
+def test_resume_with_a_different_spec_is_refused(client, mailbox, tmp_path):
+    _merge(client, tmp_path, job_id='launch').run()
+    changed = [dict(row, name='Someone else') for row in ROWS]
+    with pytest.raises(ValueError, match='different template or recipients'):
+        _merge(client, tmp_path, rows=changed, job_id='launch').run()
+    with pytest.raises(ValueError):
+        MailMerge(client, 'Other {{name}}', 'Hello {{ name }}', ROWS, job_id='launch', journal_dir=tmp_path).run()
+
+
+def test_only_rate_limits_are_retried(client, mailbox, tmp_path):
+    send = mailbox._send
+    failures = {'user0@example.com': [HttpError(429, 'rateLimitExceeded')], 'user1@example.com': [Exception('Invalid To header: 429')]}
+
+    def flaky(userId, body):
+        to = message_from_bytes(base64.urlsafe_b64decode(body['raw']))['to']
+        if failures.get(to):
+            error = failures[to].pop()
+            return Request(lambda: (_ for _ in ()).throw(error))
+        return send(userId, body)
+
+    mailbox._send = flaky
+    result = _merge(client, tmp_path).run()
+    statuses = {row['to']: row['status'] for row in result['results']}
+    assert statuses == {'user0@example.com': 'sent', 'user1@example.com': 'failed', 'user2@example.com': 'sent'}
@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from gmail_mcp.metastore import MetadataStore
+
+
+def test_sync_indexes_and_removes(tmp_path, client, mailbox):
+    store = MetadataStore(tmp_path)
+    result = store.sync(client)
+    assert result['messages'] == len(mailbox.messages) == 20
+    assert store.query()['messages'] == 20
+    assert store.query(group_by='sender')['groups'][0] == {'key': 'alice@example.com', 'messages': 20, 'bytes': sum(1000 + i for i in range(1, 21))}
+
+    gone = next(iter(mailbox.messages))
+    del mailbox.messages[gone]
+    assert store.sync(client)['removed'] == 1
+    assert len(store) == 19
+    assert MetadataStore(tmp_path).query()['messages'] == 19
+
+
+def test_queries_do_not_wait_for_a_running_sync(tmp_path, client):
+    store = MetadataStore(tmp_path)
+    store.sync(client)
+
+    fetching, release = threading.Event(), threading.Event()
+    fetch = client.get_messages_batch
+
+    def slow_fetch(*args, **kwargs):
+        fetching.set()
+        release.wait(10)
+        return fetch(*args, **kwargs)
+
+    client.get_messages_batch = slow_fetch
+    syncing = threading.Thread(target=store.sync, args=(client,))
+    syncing.start()
+    try:
+        assert fetching.wait(10)
+        answered = []
+        reader = threading.Thread(target=lambda: answered.append((store.query(), store.synced_at)))
+        reader.start()
+        reader.join(2)
+        assert answered and answered[0][0]['messages'] == 20 and answered[0][1] is not None
+    finally:
+        release.set()
+        syncing.join(10)
+
+
+def test_label_mask_widens_past_256_labels(tmp_path, client, mailbox):
+    for index, message in enumerate(mailbox.messages.values()):
+        message['labelIds'] = ['INBOX'] + [f'Label_{index * 20 + n}' for n in range(20)]
+
+    store = MetadataStore(tmp_path)
+    store.sync(client)
+    assert store.meta['label_words'] == 8
+    assert store.query(labels=['Label_399'])['messages'] == 1
+    assert store.query(labels=['INBOX'])['messages'] == 20
+
+    reopened = MetadataStore(tmp_path)
+    assert reopened.query(labels=['Label_399'])['messages'] == 1
+    assert reopened.query(labels=['Label_0'])['messages'] == 1
@@ -0,0 +1,40 @@
+import base64
+import os
+
+from gmail_mcp import mime
+
+from fakes import make_message, message_id
+
+
+def _raw(mailbox, gmail_id):
+    return {'id': gmail_id, 'raw': base64.urlsafe_b64encode(mailbox.raw(gmail_id)).decode()}
+
+
+def test_raw_parse_matches_full_parse(client, mailbox):
+    message = make_message(60, text='Hello', attachments=(('report.pdf', 'application/pdf'),))
+    mailbox.add(message)
+
+    raw = mime.parse_raw_message(_raw(mailbox, message['id']))
+    full = client.get_message_content(message['id'])
+    assert raw['body']['text'].strip() == full['body']['text']
+    assert raw['headers']['subject'] == full['headers']['subject']
+
+    [raw_attachment] = raw['attachments']
+    [full_attachment] = full['attachments']
+    # Raw messages have no attachment ids; the part id leads to one
+    assert raw_attachment['attachmentId'] is None
+    assert raw_attachment['partId'] == full_attachment['partId']
+    assert full_attachment['attachmentId']
+
+
+def test_pool_does_not_fork(mailbox, monkeypatch):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 2)
+    messages = [_raw(mailbox, message_id(index)) for index in range(1, 21)]
+    try:
+        parsed = mime.parse_raw_messages(messages)
+        assert mime._pool._mp_context.get_start_method() in ('forkserver', 'spawn')
+    finally:
+        if mime._pool is not None:
+            mime._pool.shutdown()
+            mime._pool = None
+    assert [m['body']['text'].strip() for m in parsed] == [f'Body of message {index}' for index in range(1, 21)]
@@ -0,0 +1,15 @@
+from fakes import message_id
+
+
+def test_hydrate_keeps_failed_fetches_with_empty_headers(client, mailbox):
+    failed = message_id(3)
+    mailbox.fail_gets.add(failed)
+
+    result = client.multi_search(['subject:message', 'from:alice'], hydrate=True)
+
+    assert result['total'] == 20
+    assert failed in result['errors']
+    by_id = {message['id']: message for message in result['messages']}
+    assert by_id[failed]['headers'] == {}
+    assert by_id[message_id(4)]['headers']['subject'] == 'Message 4'
+    assert all(sorted(message['queries']) == ['from:alice', 'subject:message'] for message in result['messages'])
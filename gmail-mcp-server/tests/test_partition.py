@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from gmail_mcp import partition
+from gmail_mcp.gmail_client import GmailClient
+from gmail_mcp.partition import GMAIL_EPOCH, PartitionedEnumerator
+
+from fakes import FakeAuth, FakeMailbox, make_message
+
+
+DAY = 86400
+
+
+@pytest.fixture
+def spread():
+    now = int(time.time())
+    dates = (
+        [GMAIL_EPOCH - 10 * DAY, 0]
+        + [GMAIL_EPOCH + n * 30 * DAY for n in range(150)]
+        # Mis-dated or scheduled mail well past "now"
+        + [now + 5 * DAY, now + 400 * DAY]
+    )
+    return FakeMailbox([make_message(index, date_ms=seconds * 1000) for index, seconds in enumerate(dates, 1)])
+
+
+def _enumerator(mailbox, **kwargs):
+    return PartitionedEnumerator(GmailClient(FakeAuth(mailbox)), calls_per_second=10000, **kwargs)
+
+
+def test_every_message_is_listed_once(spread, monkeypatch):
+    monkeypatch.setattr(partition, 'PAGE_SIZE', 10)
+    enumerator = _enumerator(spread, slice_size=20)
+    listed = list(enumerator.iter_ids())
+    assert sorted(listed) == sorted(spread.messages)
+    assert len(set(listed)) == len(listed)
+    assert enumerator.stats['splits'] > 0
+
+
+def test_last_slice_is_open_ended(spread, monkeypatch):
+    queries = []
+    client = GmailClient(FakeAuth(spread))
+    list_messages = client.list_messages
+
+    def record(**kwargs):
+        queries.append(kwargs['query'])
+        return list_messages(**kwargs)
+
+    client.list_messages = record
+    monkeypatch.setattr(partition, 'PAGE_SIZE', 10)
+    PartitionedEnumerator(client, slice_size=20, calls_per_second=10000).run()
+    open_ended = [query for query in queries if 'before:' not in query]
+    assert open_ended and all(query.startswith('after:') for query in open_ended)
+
+
+def test_split_keeps_the_open_end():
+    enumerator = PartitionedEnumerator(None, slice_size=10)
+    slices = enumerator._split(GMAIL_EPOCH, None, 100)
+    assert slices[0][0] == GMAIL_EPOCH and slices[-1][1] is None
+    assert all(left[1] == right[0] for left, right in zip(slices, slices[1:]))
+    assert enumerator._split(0, GMAIL_EPOCH, 100)[-1][1] == GMAIL_EPOCH
+
+
+def test_query_and_labels_are_kept(spread):
+    for message in list(spread.messages.values())[:5]:
+        message['labelIds'] = ['Label_1']
+    enumerator = _enumerator(spread, label_ids=['Label_1'])
+    assert len(enumerator.run()) == 5
+
+
+def test_stopping_early_closes_the_pool(spread, monkeypatch):
+    monkeypatch.setattr(partition, 'PAGE_SIZE', 10)
+    enumerator = _enumerator(spread, slice_size=20)
+    iterator = enumerator.iter_ids()
+    next(iterator)
+    iterator.close()
+    assert enumerator._closed.is_set()
@@ -0,0 +1,81 @@
+import pytest
+
+from gmail_mcp.pipeline import Pipeline
+
+from fakes import message_id
+
+
+ALL_IDS = [message_id(index) for index in range(1, 21)]
+
+
+def test_run_sync_collects_and_reports_progress(client):
+    reports = []
+    result = Pipeline(client).enumerate('subject:message').run_sync(progress=reports.append)
+    assert [item for item in result['items']] == ALL_IDS
+    assert result['stats']['enumerated'] == result['stats']['processed'] == 20
+    assert reports and reports[-1]['enumerated'] == 20
+    assert result['errors'] == {}
+
+
+def test_bounded_queues_hold_back_the_source(client):
+    pipeline = Pipeline(client, queue_size=2)
+    ahead = []
+
+    def slow(item):
+        ahead.append(pipeline.stats['enumerated'] - len(ahead))
+        return True
+
+    pipeline.ids(ALL_IDS).filter(slow).run_sync()
+    # The source can only run a full queue plus the item in hand ahead
+    assert max(ahead) <= 3
+
+
+def test_limit_stops_enumeration_early(client, mailbox):
+    result = Pipeline(client).enumerate('', page_size=5).limit(3).run_sync()
+    assert result['items'] == ALL_IDS[:3]
+    assert mailbox.calls['list'] <= 2
+
+
+def test_fetch_reports_failed_messages_and_keeps_going(client, mailbox):
+    mailbox.fail_gets.add(ALL_IDS[4])
+    result = Pipeline(client).ids(ALL_IDS).fetch(format='metadata', parse=True).run_sync()
+    assert len(result['items']) == 19
+    assert list(result['errors']) == [ALL_IDS[4]]
+    assert result['items'][0]['headers']['subject'] == 'Message 1'
+
+
+def test_label_action(client, mailbox):
+    result = Pipeline(client).ids(ALL_IDS[:5]).label(add_labels=['Work'], remove_labels=['INBOX']).run_sync()
+    assert result['items'] == ALL_IDS[:5]
+    assert all(mailbox.messages[gmail_id]['labelIds'] == ['Label_1'] for gmail_id in ALL_IDS[:5])
+    assert mailbox.messages[ALL_IDS[5]]['labelIds'] == ['INBOX']
+
+
+def test_trash_action_with_limit(client, mailbox):
+    result = Pipeline(client).enumerate('subject:message').limit(4).trash().run_sync()
+    assert result['stats']['processed'] == 4
+    trashed = [gmail_id for gmail_id, message in mailbox.messages.items() if message['labelIds'] == ['TRASH']]
+    assert sorted(trashed) == sorted(result['items']) and len(trashed) == 4
+
+
+def test_failing_stage_raises(client):
+    def broken(item):
+        if item == ALL_IDS[3]:
+            raise RuntimeError('predicate failed')
+        return True
+
+    with pytest.raises(RuntimeError, match='predicate failed'):
+        Pipeline(client, queue_size=2).ids(ALL_IDS).filter(broken).run_sync()
+
+
+def test_cancel_stops_the_source(client):
+    pipeline = Pipeline(client, queue_size=1)
+
+    def cancel_after_three(item):
+        if item == ALL_IDS[2]:
+            pipeline.cancel()
+        return True
+
+    result = pipeline.ids(ALL_IDS).filter(cancel_after_three).run_sync()
+    assert ALL_IDS[:3] == result['items'][:3]
+    assert len(result['items']) < len(ALL_IDS)
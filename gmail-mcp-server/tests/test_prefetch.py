@@ -0,0 +1,67 @@
+import threading
+import time
+
+from gmail_mcp.prefetch import PENDING_WAIT, Prefetcher
+
+from fakes import message_id
+
+
+def _drain(prefetcher: Prefetcher) -> None:
+    prefetcher._pool.submit(lambda: None).result()
+
+
+def test_default_prefetch_serves_content_and_metadata_reads(client, mailbox):
+    client.prefetcher = Prefetcher(client, depth=3)
+    ids = [message_id(index) for index in range(1, 4)]
+    assert client.prefetcher.schedule('message', ids) == 3
+    _drain(client.prefetcher)
+    gets = mailbox.calls['get']
+
+    assert client.get_message_content(ids[0])['body']['text'] == 'Body of message 1'
+    assert client.get_message(ids[1], format='metadata')['id'] == ids[1]
+    assert mailbox.calls['get'] == gets
+    assert client.prefetcher.stats()['hits'] == 2
+
+
+def test_metadata_prefetch_does_not_serve_full_reads(client, mailbox):
+    client.prefetcher = Prefetcher(client, depth=2, bodies=False)
+    ids = [message_id(1), message_id(2)]
+    client.prefetcher.schedule('message', ids)
+    _drain(client.prefetcher)
+
+    assert client.get_message(ids[0], format='metadata')['id'] == ids[0]
+    assert client.get_message_content(ids[1])['body']['text'] == 'Body of message 2'
+    stats = client.prefetcher.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+
+def test_read_does_not_wait_for_a_slow_prefetch(client):
+    release = threading.Event()
+    fetch = client.get_messages_batch
+
+    def slow_batch(*args, **kwargs):
+        release.wait(10)
+        return fetch(*args, **kwargs)
+
+    client.get_messages_batch = slow_batch
+    client.prefetcher = Prefetcher(client, depth=1)
+    client.prefetcher.schedule('message', [message_id(1)])
+    try:
+        started = time.monotonic()
+        assert client.get_message_content(message_id(1))['body']['text'] == 'Body of message 1'
+        assert time.monotonic() - started < PENDING_WAIT + 1
+    finally:
+        release.set()
+        _drain(client.prefetcher)
+    assert client.prefetcher.stats()['misses'] == 1
+
+
+def test_writes_drop_prefetched_items(client):
+    client.prefetcher = Prefetcher(client, depth=2)
+    client.prefetcher.schedule('message', [message_id(1), message_id(2)])
+    _drain(client.prefetcher)
+    client.prefetcher.clear()
+
+    client.get_message(message_id(1))
+    stats = client.prefetcher.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (0, 1, 0)
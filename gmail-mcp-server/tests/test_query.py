@@ -0,0 +1,77 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+from gmail_mcp.pipeline import Pipeline
+from gmail_mcp.query import MessageFilter
+
+from fakes import make_message
+
+
+def test_to_query_quotes_and_groups():
+    query = MessageFilter(**{
+        'from': ['alice@example.com', 'bob@example.com'],
+        'to': ['team@example.com'],
+        'subject': ['weekly report', 'say "hi"'],
+        'words': ['invoice'],
+        'labels': ['Work/Projects', 'To Do'],
+        'exclude_labels': ['Spam'],
+        'is': ['unread'],
+    }).to_query()
+    assert query == (
+        '{from:alice@example.com from:bob@example.com} to:team@example.com '
+        'subject:"weekly report" subject:"say hi" invoice '
+        'label:Work-Projects label:To-Do -label:Spam is:unread'
+    )
+
+
+def test_to_query_participants_dates_and_sizes():
+    query = MessageFilter(
+        participants=['carol@example.com'],
+        after=date(2024, 1, 2),
+        before=datetime(2024, 2, 1, tzinfo=timezone.utc),
+        has_attachment=False,
+        filename='report (final).pdf',
+        larger=1000,
+        raw='-in:chats',
+    ).to_query()
+    assert query == (
+        '{from:carol@example.com to:carol@example.com cc:carol@example.com bcc:carol@example.com} '
+        'after:2024/01/02 before:1706745600 -has:attachment filename:"report (final).pdf" larger:1000 -in:chats'
+    )
+    assert MessageFilter().to_query() == ''
+
+
+@pytest.fixture
+def listed(mailbox):
+    message = make_message(90, subject='Release notes 2.0', text='The build passed on Friday')
+    message['payload']['headers'].append({'name': 'List-Id', 'value': 'Releases <releases.example.com>'})
+    mailbox.add(message)
+    return message['id']
+
+
+@pytest.mark.parametrize('format', ['full', 'raw'])
+@pytest.mark.parametrize('fields, matches', [
+    ({'subject_pattern': r'release notes \d'}, True),
+    ({'subject_pattern': r'^draft'}, False),
+    ({'header_equals': {'List-Id': 'releases <RELEASES.example.com>'}}, True),
+    ({'header_equals': {'List-Id': 'other'}}, False),
+    ({'header_equals': {'X-Mailer': 'anything'}}, False),
+    ({'body_pattern': r'build passed'}, True),
+    ({'body_pattern': r'build failed'}, False),
+])
+def test_local_predicates_on_full_and_raw(client, listed, format, fields, matches):
+    predicate = MessageFilter(**fields).local_predicate()
+    assert predicate(client.get_message(listed, format=format)) is matches
+
+
+@pytest.mark.parametrize('format', ['metadata', 'full', 'raw'])
+def test_pipeline_checks_headers_outside_the_parsed_set(client, listed, format):
+    message_filter = MessageFilter(header_equals={'List-Id': 'Releases <releases.example.com>'})
+    result = (
+        Pipeline(client)
+        .enumerate(message_filter)
+        .fetch(format=format, parse=True)
+        .run_sync()
+    )
+    assert [item['id'] for item in result['items']] == [listed]
@@ -0,0 +1,51 @@
+import pytest
+from pydantic import Field, ValidationError
+
+from gmail_mcp.tools import BackgroundArgs, ToolArgs, ToolRegistry, registry
+
+
+class EchoArgs(ToolArgs):
+    text: str = Field(..., min_length=1, description="Text to echo")
+    repeat: int = Field(1, ge=1, description="How often")
+
+
+def test_schema_is_cached_and_plain():
+    local = ToolRegistry()
+
+    @local.register("echo", "Echo text", EchoArgs)
+    def echo(client, args):
+        return args.text * args.repeat
+
+    tools = local.list_tools()
+    assert local.list_tools() is tools
+    schema = tools[0].inputSchema
+    assert 'title' not in schema and 'title' not in schema['properties']['text']
+    assert schema['required'] == ['text']
+
+
+def test_validate_rejects_unknown_and_invalid_arguments():
+    local = ToolRegistry()
+    local.register("echo", "Echo text", EchoArgs)(lambda client, args: None)
+    spec = local.get("echo")
+    assert spec.validate({'text': 'hi', 'repeat': 2}).repeat == 2
+    with pytest.raises(ValidationError):
+        spec.validate({'text': 'hi', 'bogus': True})
+    with pytest.raises(ValidationError):
+        spec.validate({'text': ''})
+
+
+def test_duplicate_names_and_job_args_are_checked():
+    local = ToolRegistry()
+    local.register("echo", "Echo text", EchoArgs)(lambda client, args: None)
+    with pytest.raises(ValueError):
+        local.register("echo", "Again", EchoArgs)(lambda client, args: None)
+    with pytest.raises(TypeError):
+        local.register("job", "Not background", EchoArgs, kind='job')(lambda client, args, context: None)
+    local.register("job", "Background", BackgroundArgs, kind='job')(lambda client, args, context: None)
+    assert "job" in local and len(local) == 2
+
+
+def test_optional_fields_drop_null_variants():
+    schema = registry.get('gmail_list_messages').tool.inputSchema
+    assert schema['properties']['label_ids']['type'] == 'array'
+    assert 'anyOf' not in schema['properties']['page_token']
@@ -0,0 +1,35 @@
+from gmail_mcp.tools import registry
+
+from fakes import make_message
+
+
+def _call(client, name, **args):
+    spec = registry.get(name)
+    return spec.handler(client, spec.validate(args))
+
+
+def test_get_message_returns_summary_with_uris(client, mailbox):
+    message = make_message(80, text='x' * 5000, attachments=(('report.pdf', 'application/pdf'),))
+    mailbox.add(message)
+
+    result = _call(client, 'gmail_get_message', message_id=message['id'])
+    assert 'payload' not in result
+    assert result['uri'] == f"gmail://message/{message['id']}"
+    assert result['headers']['subject'] == 'Message 80'
+    [attachment] = result['attachments']
+    assert attachment['uri'] == f"gmail://attachment/{message['id']}/att-80-1"
+
+    metadata = _call(client, 'gmail_get_message', message_id=message['id'], format='metadata')
+    assert metadata['uri'] == result['uri'] and 'parts' not in metadata['payload']
+
+
+def test_get_thread_returns_summaries(client, mailbox):
+    thread_id = 'thread-1'
+    for index in (81, 82):
+        mailbox.add(make_message(index, text='Long body ' * 500, thread_id=thread_id))
+
+    result = _call(client, 'gmail_get_thread', thread_id=thread_id)
+    assert result['uri'] == 'gmail://thread/thread-1'
+    assert [m['headers']['subject'] for m in result['messages']] == ['Message 81', 'Message 82']
+    assert all('payload' not in m and m['uri'].startswith('gmail://message/') for m in result['messages'])
+    assert len(str(result)) < 2000
@@ -0,0 +1,44 @@
+import threading
+
+import pytest
+
+from gmail_mcp.singleflight import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_request():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    upstream = []
+
+    def fetch():
+        upstream.append(1)
+        started.set()
+        release.wait(5)
+        return {'labels': ['INBOX']}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do('key', fetch)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flights.do('key', fetch))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flights.stats()['calls'] < 4:
+        pass
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert len(upstream) == 1
+    assert results == [{'labels': ['INBOX']}] * 4
+    # Every caller gets its own copy
+    assert len({id(result) for result in results}) == 4
+    assert flights.stats() == {'calls': 4, 'upstream': 1, 'coalesced': 3, 'in_flight': 0}
+
+
+def test_errors_propagate_and_nothing_is_cached():
+    flights = SingleFlight()
+    with pytest.raises(RuntimeError):
+        flights.do('key', lambda: (_ for _ in ()).throw(RuntimeError('boom')))
+    assert flights.do('key', lambda: 1) == 1
+    assert flights.do('key', lambda: 2) == 2